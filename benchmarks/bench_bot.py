@@ -0,0 +1,174 @@
+"""
+Runs the bot offline against local stand-ins for the RSS feeds and Reddit, and reports its throughput, the latency of
+every stage of a pass and its peak memory.
+
+Usage:
+    python -m benchmarks.bench_bot [--feeds N] [--subreddits N] [--passes N] [--publish-rate FRACTION]
+                                   [--feed-latency SECONDS] [--reddit-latency SECONDS] [--fixtures DIRECTORY]
+                                   [--similarity {static,spacy}] [--vectors DIRECTORY] [--websub]
+
+Every feed is its own cycle, and every cycle is made due at the start of each pass, so a pass requests every feed
+once. Before each pass, the given fraction of the feeds publishes a new story. Recorded feeds can be replayed with
+--fixtures (see benchmarks/stand_ins.py), otherwise the feeds are generated.
+
+With --websub, the generated feeds advertise a local WebSub hub. The first pass requests every feed and subscribes to
+the hub, and on the later passes the hub pushes the feeds that published, and only the cycles they belong to are due.
+
+The titles are compared with stand-in static word vectors unless --similarity spacy or --vectors is given. The usual
+environment variables, such as FETCH_WORKERS, can be set to benchmark other settings. All feeds are served from the
+same local host, so FETCH_PER_HOST defaults to FETCH_WORKERS.
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import resource
+import socket
+import tempfile
+import time
+
+import numpy as np
+import yaml
+
+from .stand_ins import WORDS, FakeReddit, FeedServer, Hub, load_fixtures
+
+
+def write_stand_in_vectors(directory: str) -> None:
+    """Writes random word vectors centered on zero for the words of the generated headlines"""
+    from rss_script.utils.nlp import _word_key
+    keys = np.array([_word_key(word) for word in WORDS], dtype=np.uint64)
+    order = np.argsort(keys)
+    np.save(os.path.join(directory, "keys.npy"), keys[order])
+    np.save(os.path.join(directory, "rows.npy"), np.arange(len(WORDS), dtype=np.uint32)[order])
+    np.save(os.path.join(directory, "vectors.npy"),
+            np.random.default_rng(0).standard_normal((len(WORDS), 300)).astype(np.float32))
+
+
+def write_config(filename: str, server: FeedServer, feeds: int, subreddits: int) -> None:
+    """Writes a config file that spreads the feeds across the subreddits, one feed per cycle"""
+    config = [{'name': f'bench{sub}', 'cycles': []} for sub in range(subreddits)]
+    for feed in range(feeds):
+        cycle = {'feeds': [{'url': server.url(feed), 'block': ['sponsored']}], 'check_interval': 0}
+        if feed % 3 == 0:
+            cycle['flair'] = 'News'
+        config[feed % subreddits]['cycles'].append(cycle)
+    with open(filename, 'w') as file:
+        yaml.safe_dump(config, file)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feeds", type=int, default=1000, help="Number of RSS feeds")
+    parser.add_argument("--subreddits", type=int, default=50, help="Number of subreddits the feeds are spread across")
+    parser.add_argument("--passes", type=int, default=10, help="Number of passes over every feed")
+    parser.add_argument("--publish-rate", type=float, default=0.1,
+                        help="Fraction of the feeds that publish a new story before each pass")
+    parser.add_argument("--feed-latency", type=float, default=0.0, help="Seconds every feed response is delayed by")
+    parser.add_argument("--reddit-latency", type=float, default=0.0, help="Seconds every Reddit request takes")
+    parser.add_argument("--fixtures", default="", help="Directory of recorded feeds to replay")
+    parser.add_argument("--similarity", choices=("static", "spacy"), default="static",
+                        help="Engine used to compare titles")
+    parser.add_argument("--vectors", default="", help="Directory of vectors exported with rss_script.utils.nlp")
+    parser.add_argument("--websub", action="store_true", help="Push the feeds that publish from a local WebSub hub")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rss2reddit-bench-")
+    for name in ("USER_NAME", "PASSWORD", "CLIENT_ID", "CLIENT_SECRET"):
+        os.environ.setdefault(name, "bench")
+    os.environ["DISCORD_WEBHOOK_URL"] = ""
+    os.environ["SCHEDULE_JITTER"] = "0"
+    # Every pass requests every feed again, however close together the passes are
+    os.environ.setdefault("FEED_FETCH_WINDOW", "0")
+    os.environ.setdefault("FETCH_PER_HOST", os.getenv("FETCH_WORKERS", "16"))
+    os.environ["SIMILARITY_BACKEND"] = args.similarity
+    if args.similarity == "static":
+        if not args.vectors:
+            args.vectors = os.path.join(workdir, "vectors")
+            os.makedirs(args.vectors)
+            write_stand_in_vectors(args.vectors)
+        os.environ["STATIC_VECTORS_DIR"] = args.vectors
+    hub = Hub() if args.websub else None
+    if hub:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        os.environ["WEBSUB_PORT"] = str(port)
+        os.environ["WEBSUB_HOST"] = "127.0.0.1"
+        os.environ["WEBSUB_CALLBACK_URL"] = f"http://127.0.0.1:{port}"
+    from rss_script import RedditBot
+
+    server = FeedServer(args.feeds, args.feed_latency, load_fixtures(args.fixtures) if args.fixtures else None,
+                        hub.url() if hub else None)
+    reddit = FakeReddit(args.reddit_latency)
+    write_config(os.path.join(workdir, "config.yaml"), server, args.feeds, args.subreddits)
+    # Discord notices are printed when there is no webhook, which would drown the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        bot = RedditBot(False, os.path.join(workdir, "config.yaml"), os.path.join(workdir, "db.json"),
+                        os.path.join(workdir, "rss_script.log"), reddit=reddit)
+        startup = time.perf_counter() - start
+    for handler in bot.logger.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(logging.WARNING)
+    keys = [((sub_info['name'], index), (position, index))
+            for position, sub_info in enumerate(bot.sub_list) for index in range(len(sub_info['cycles']))]
+
+    durations = []
+    push_latencies = []
+    rng = random.Random(0)
+    for number in range(args.passes):
+        published = rng.sample(server.feeds, int(len(server.feeds) * args.publish_rate))
+        for feed in published:
+            feed.publish()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            if hub and number > 0:
+                # Only the pushed feeds' cycles are due, the other feeds are not requested
+                pushes = sum(hub.publish(server.url(feed.number), feed.body) for feed in published)
+                while len(bot.websub.queue) < pushes and time.perf_counter() - start < 10:
+                    time.sleep(0.01)
+            else:
+                for key, order in keys:
+                    bot.scheduler.schedule(key, 0, order)
+            bot.run_pass()
+            durations.append(time.perf_counter() - start)
+            if hub and number > 0:
+                push_latencies.append(durations[-1])
+        if hub and number == 0:
+            # The hub verifies the subscriptions requested at the end of the first pass in the background
+            deadline = time.perf_counter() + 10
+            while sum(map(len, hub.subscriptions.values())) < args.feeds and time.perf_counter() < deadline:
+                time.sleep(0.05)
+    server.close()
+
+    snapshot = bot.metrics.snapshot()
+    print(f"{args.feeds} feeds, {args.subreddits} subreddits, {args.passes} passes, "
+          f"publish rate {args.publish_rate}, startup {startup:.2f}s")
+    print(f"passes/sec {len(durations) / sum(durations):.3f}, "
+          f"feeds/sec {args.feeds * len(durations) / sum(durations):.0f}, "
+          f"pass p50 {np.percentile(durations, 50):.3f}s, p99 {np.percentile(durations, 99):.3f}s")
+    print(f"{'stage':<16}{'count':>9}{'total s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for timer in snapshot['timers']:
+        if timer['name'] == 'stage_seconds':
+            print(f"{timer['labels']['stage']:<16}{timer['count']:>9}{timer['sum']:>10.2f}{timer['p50'] * 1000:>10.2f}"
+                  f"{timer['p99'] * 1000:>10.2f}{timer['max'] * 1000:>10.2f}")
+    totals: dict[str, float] = {}
+    for counter in snapshot['counters']:
+        name = counter['name'] + ''.join(f"[{value}]" for key, value in counter['labels'].items() if key != 'subreddit')
+        totals[name] = totals.get(name, 0) + counter['value']
+    print(", ".join(f"{name} {value:g}" for name, value in sorted(totals.items())))
+    print(f"feed server: {server.requests} requests, {server.not_modified} not modified; "
+          f"reddit: {reddit.submissions} submissions, {reddit.auth.limits['used']} requests in the current window")
+    if hub:
+        hub.close()
+        print(f"websub: {sum(map(len, hub.subscriptions.values()))} subscriptions, {hub.pushes} pushes" +
+              (f", publish to end of pass p50 {np.percentile(push_latencies, 50):.3f}s, "
+               f"p99 {np.percentile(push_latencies, 99):.3f}s" if push_latencies else ""))
+    print(f"peak memory {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}MB")
+    print(f"working directory {workdir}")
+
+
+if __name__ == "__main__":
+    main()
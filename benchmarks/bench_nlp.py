@@ -0,0 +1,58 @@
+"""
+Measures the startup time and peak memory of the title similarity engines. Each engine is measured in a fresh
+process, from importing it to the first similarity result.
+
+Usage:
+    python -m benchmarks.bench_nlp [--model MODEL] [--vectors DIRECTORY]
+
+Engines:
+    legacy  The previous behaviour: the full spaCy pipeline loaded with every component enabled
+    spacy   The spaCy backend, with only the tokenizer and static word vectors
+    static  The memory-mapped vectors backend (only measured when --vectors is given)
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+MEASURE = """
+import json, resource, sys, time
+start = time.perf_counter()
+engine, model, vectors = sys.argv[1:4]
+if engine == "legacy":
+    import spacy
+    nlp = spacy.load(model)
+    similarity = nlp("Stocks fall as rates rise").similarity(nlp("Markets slide on rate fears"))
+else:
+    from rss_script.utils import nlp
+    nlp.configure_similarity(engine, model, vectors or None)
+    similarity = nlp.get_similarity("Stocks fall as rates rise", "Markets slide on rate fears")
+print(json.dumps({"seconds": time.perf_counter() - start, "similarity": similarity,
+                  "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def measure(engine: str, model: str, vectors: str) -> dict | None:
+    """Runs the measurement in a new process and returns its results, or None if the engine failed to load"""
+    result = subprocess.run([sys.executable, "-c", MEASURE, engine, model, vectors], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"{engine}: failed\n{result.stderr.strip().splitlines()[-1]}")
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="en_core_web_md", help="spaCy model to measure")
+    parser.add_argument("--vectors", default="", help="Directory of vectors exported with rss_script.utils.nlp")
+    args = parser.parse_args()
+    engines = ["legacy", "spacy"] + (["static"] if args.vectors else [])
+    print(f"{'engine':<10}{'startup s':>12}{'peak MB':>10}{'similarity':>12}")
+    for engine in engines:
+        result = measure(engine, args.model, args.vectors)
+        if result:
+            print(f"{engine:<10}{result['seconds']:>12.2f}{result['peak_mb']:>10.0f}{result['similarity']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compares the streaming find_newest_headline against the previous BeautifulSoup implementation.
+
+Usage:
+    python -m benchmarks.bench_rss_parser [FEED_FILE ...]
+
+Without arguments, large synthetic RSS and Atom feeds are generated. Recorded feeds can be passed as file paths to
+benchmark real-world data instead.
+"""
+import sys
+import timeit
+import tracemalloc
+from pprint import pformat
+
+from bs4 import BeautifulSoup
+
+from rss_script.utils.rss_parser import find_newest_headline
+
+
+def legacy_find_newest_headline(xml_data) -> tuple[str, str, str] | tuple[None, None, None]:
+    """The BeautifulSoup implementation that find_newest_headline replaced"""
+    soup = BeautifulSoup(xml_data, 'lxml-xml')
+    top_item = soup.find('item')
+    try:
+        title: str = top_item.title.get_text()
+        link: str = top_item.link.get_text()
+        guid: str = top_item.guid.get_text() if top_item.guid.get_text() != "" else link
+        return title, link, guid
+    except Exception as e:
+        print(f"Error parsing RSS feed: {e}")
+        print(f"XML Data:\n{pformat(soup)}\n")
+        return None, None, None
+
+
+def generate_rss(items: int, description_size: int) -> bytes:
+    """Generates an RSS 2.0 feed with the given number of items and description length"""
+    body = ''.join(
+        f"<item><title>Headline number {i}</title><link>https://example.com/news/{i}</link>"
+        f"<guid isPermaLink=\"false\">news-{i}</guid><pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate>"
+        f"<description><![CDATA[{'Lorem ipsum dolor sit amet. ' * (description_size // 28)}]]></description></item>"
+        for i in range(items))
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Bench</title>'
+            f'<link>https://example.com</link>{body}</channel></rss>').encode()
+
+
+def generate_atom(entries: int, content_size: int) -> bytes:
+    """Generates an Atom feed with the given number of entries and content length"""
+    body = ''.join(
+        f"<entry><title>Headline number {i}</title><link rel=\"alternate\" href=\"https://example.com/news/{i}\"/>"
+        f"<id>urn:news:{i}</id><updated>2024-01-01T00:00:00Z</updated>"
+        f"<content type=\"html\">{'Lorem ipsum dolor sit amet. ' * (content_size // 28)}</content></entry>"
+        for i in range(entries))
+    return (f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>Bench</title>'
+            f'{body}</feed>').encode()
+
+
+def measure(func, data: bytes, number: int) -> tuple[float, float]:
+    """Returns the average time in milliseconds and the peak traced memory in MB of one call"""
+    seconds = timeit.timeit(lambda: func(data), number=number) / number
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds * 1000, peak / 1024 / 1024
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        feeds = {path: open(path, 'rb').read() for path in sys.argv[1:]}
+    else:
+        feeds = {
+            'rss 50 items': generate_rss(50, 500),
+            'rss 500 items': generate_rss(500, 2000),
+            'rss 2000 items': generate_rss(2000, 2000),
+            'atom 500 entries': generate_atom(500, 2000),
+        }
+    print(f"{'feed':<20}{'size':>10}{'bs4 ms':>12}{'stream ms':>12}{'speedup':>10}{'bs4 MB':>10}{'stream MB':>11}")
+    for name, data in feeds.items():
+        number = 5
+        # The old implementation only understands RSS <item>, so it is skipped for Atom feeds
+        legacy = measure(legacy_find_newest_headline, data, number) if b'<item' in data else None
+        stream = measure(find_newest_headline, data, number)
+        size = f"{len(data) / 1024 / 1024:.1f}MB"
+        if legacy:
+            print(f"{name:<20}{size:>10}{legacy[0]:>12.2f}{stream[0]:>12.2f}{legacy[0] / stream[0]:>9.0f}x"
+                  f"{legacy[1]:>10.1f}{stream[1]:>11.2f}")
+        else:
+            print(f"{name:<20}{size:>10}{'-':>12}{stream[0]:>12.2f}{'-':>10}{'-':>10}{stream[1]:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
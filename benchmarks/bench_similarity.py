@@ -0,0 +1,146 @@
+"""
+Measures the recall and speedup of the MinHash/LSH prefilter of the duplicate title check. For each query title, the
+semantic similarity to every post of the corpus is calculated like the bot did before, and the pairs above the
+duplicate (0.8) and somewhat similar (0.75) thresholds are compared with the candidates the LSH index returns.
+
+Usage:
+    python -m benchmarks.bench_similarity [--titles FILE] [--posts N] [--queries N]
+                                          [--similarity {static,spacy}] [--vectors DIRECTORY]
+                                          [--bands-rows BANDSxROWS ...]
+
+--titles replays a recorded corpus of subreddit titles, one per line: the first --posts titles are the indexed posts
+and the following --queries titles are checked against them. Recorded titles need real vectors (--similarity spacy or
+--vectors). Otherwise a corpus is generated from a vocabulary of made-up words with Zipf frequencies and random
+vectors, where half the queries are rewordings of indexed titles and the other half are unrelated titles.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+THRESHOLDS = (0.8, 0.75)
+SYLLABLES = ("ba", "ko", "ri", "sen", "tal", "mo", "vek", "lu", "dan", "pir", "ose", "gra", "fin", "zu", "hel", "rom")
+
+
+def vocabulary(size: int) -> list[str]:
+    """Returns made-up words of two to four syllables, most frequent first"""
+    rng = random.Random(1)
+    words: dict[str, None] = {}
+    while len(words) < size:
+        words[''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))] = None
+    return list(words)
+
+
+def write_vectors(directory: str, words: list[str]) -> None:
+    """Writes random word vectors centered on zero, so unrelated titles are not similar"""
+    from rss_script.utils.nlp import _word_key
+    keys = np.array([_word_key(word) for word in words], dtype=np.uint64)
+    order = np.argsort(keys)
+    np.save(os.path.join(directory, "keys.npy"), keys[order])
+    np.save(os.path.join(directory, "rows.npy"), np.arange(len(words), dtype=np.uint32)[order])
+    np.save(os.path.join(directory, "vectors.npy"),
+            np.random.default_rng(0).standard_normal((len(words), 300)).astype(np.float32))
+
+
+def generated_corpus(words: list[str], posts: int, queries: int,
+                     rng: random.Random) -> tuple[list[str], list[str]]:
+    """
+    Generates titles of 6 to 12 words, and queries that are half rewordings of indexed titles, with words dropped,
+    replaced or moved, and half unrelated titles
+    """
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+    def title() -> str:
+        return ' '.join(rng.choices(words, weights, k=rng.randint(6, 12))).capitalize()
+
+    titles = [title() for _ in range(posts)]
+    checked = []
+    for number in range(queries):
+        if number % 2:
+            checked.append(title())
+            continue
+        reworded = rng.choice(titles).lower().split()
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randrange(len(reworded))
+            change = rng.choice(('drop', 'replace', 'move'))
+            if change == 'drop' and len(reworded) > 3:
+                del reworded[position]
+            elif change == 'replace':
+                reworded[position] = rng.choices(words, weights)[0]
+            else:
+                reworded.insert(rng.randrange(len(reworded)), reworded.pop(position))
+        checked.append(' '.join(reworded).capitalize())
+    return titles, checked
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", default="", help="File of recorded titles, one per line")
+    parser.add_argument("--posts", type=int, default=1000, help="Number of indexed posts")
+    parser.add_argument("--queries", type=int, default=500, help="Number of titles checked against the posts")
+    parser.add_argument("--similarity", choices=("static", "spacy"), default="static",
+                        help="Engine used to compare titles")
+    parser.add_argument("--vectors", default="", help="Directory of vectors exported with rss_script.utils.nlp")
+    parser.add_argument("--bands-rows", nargs="+", default=["16x4", "20x3", "32x2", "64x2"],
+                        help="LSH configurations to measure, as BANDSxROWS")
+    args = parser.parse_args()
+
+    words = vocabulary(5000)
+    if args.similarity == "static" and not args.vectors:
+        args.vectors = tempfile.mkdtemp(prefix="rss2reddit-vectors-")
+        write_vectors(args.vectors, words)
+    from rss_script.utils import MinHashLSH, TitleVectorCache, configure_similarity
+    configure_similarity(args.similarity, os.getenv("SPACY_MODEL", "en_core_web_md"), args.vectors or None)
+
+    rng = random.Random(0)
+    if args.titles:
+        with open(args.titles, encoding="utf-8") as file:
+            recorded = [line.strip() for line in file if line.strip()]
+        titles, queries = recorded[:args.posts], recorded[args.posts:args.posts + args.queries]
+    else:
+        titles, queries = generated_corpus(words, args.posts, args.queries, rng)
+    now = time.time()
+    posts = [SimpleNamespace(id=f"p{number}", title=title, created_utc=now) for number, title in enumerate(titles)]
+    by_id = {post.id: post for post in posts}
+    cache = TitleVectorCache(os.path.join(tempfile.mkdtemp(), "vectors.npz"))
+    cache.similarities(queries[0], posts)  # Vectorizes every post once, like the bot's cache after a refresh
+
+    start = time.perf_counter()
+    scores = [cache.similarities(query, posts) for query in queries]
+    full_seconds = time.perf_counter() - start
+    print(f"{len(posts)} posts, {len(queries)} queries, {args.similarity} similarity, "
+          f"all pairs {full_seconds / len(queries) * 1000:.2f}ms per query")
+    for threshold in THRESHOLDS:
+        print(f"pairs above {threshold}: {sum(int((score > threshold).sum()) for score in scores)}")
+    print(f"{'bands x rows':<14}{'recall 0.8':>12}{'recall 0.75':>13}{'candidates':>12}{'ms/query':>10}"
+          f"{'speedup':>9}")
+    for config in args.bands_rows:
+        bands, rows = (int(value) for value in config.lower().split("x"))
+        lsh = MinHashLSH(bands, rows)
+        for post in posts:
+            lsh.add(post.id, post.title)
+        start = time.perf_counter()
+        candidate_keys = []
+        for query in queries:
+            candidates = [by_id[key] for key in lsh.query(query)]
+            cache.similarities(query, candidates)
+            candidate_keys.append({post.id for post in candidates})
+        seconds = time.perf_counter() - start
+        found = {threshold: [0, 0] for threshold in THRESHOLDS}
+        for keys, score in zip(candidate_keys, scores):
+            for threshold in THRESHOLDS:
+                matches = [post.id for post, value in zip(posts, score) if value > threshold]
+                found[threshold][0] += sum(key in keys for key in matches)
+                found[threshold][1] += len(matches)
+        candidate_count = sum(map(len, candidate_keys))
+        recalls = [f"{found[t][0] / found[t][1]:.3f}" if found[t][1] else "n/a" for t in THRESHOLDS]
+        print(f"{config:<14}{recalls[0]:>12}{recalls[1]:>13}{candidate_count / len(queries):>12.1f}"
+              f"{seconds / len(queries) * 1000:>10.2f}{full_seconds / max(seconds, 1e-9):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Local stand-ins for the RSS feeds and the Reddit API, used to run the bot offline.
+
+FeedServer serves feed fixtures over HTTP with ETag and Last-Modified support and a configurable latency. A fixture
+is either a recorded feed file, served as is, or a directory of feed files recorded over time, which are replayed in
+order every time the feed publishes. Feeds without a fixture are generated and get a new item every time they publish.
+
+Hub is a WebSub hub that verifies subscriptions and pushes signed feeds to the subscribers when they publish. Generated
+feeds advertise it with <atom:link rel="hub"> when the FeedServer is given its url.
+
+FakeReddit implements the parts of praw used by the bot: subreddit listings with the before parameter, submissions,
+link flair templates and the rate limit information.
+"""
+import hashlib
+import hmac
+import itertools
+import os
+import secrets
+import threading
+import time
+import urllib.request
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlencode
+
+WORDS = ("market", "election", "storm", "league", "court", "vaccine", "budget", "strike", "merger", "launch",
+         "record", "protest", "summit", "outage", "recall", "drought", "rally", "verdict", "tariff", "ceasefire")
+
+
+def headline(feed: int, number: int) -> str:
+    """
+    Returns a synthetic headline of six of the stand-in words followed by the feed and story numbers. The words repeat
+    across feeds, such as feeds 100 apart publishing the same words, so many headlines are near-duplicate titles
+    """
+    words = [WORDS[(feed * 7 + number * (i + 3)) % len(WORDS)] for i in range(6)]
+    return f"{' '.join(words).capitalize()} {feed}-{number}"
+
+
+class Feed:
+    """
+    A feed served by the FeedServer
+
+    Attributes
+    ----------
+    snapshots : list
+        Recorded versions of the feed, oldest first, or an empty list if the feed is generated
+    position : int
+        Index of the snapshot currently served, or number of items published if the feed is generated
+    body : bytes
+        The XML document currently served
+    etag : str
+        ETag of the current body
+    last_modified : str
+        Last-Modified date of the current body
+    """
+
+    GENERATED_ITEMS = 20  # Number of items kept in a generated feed
+
+    def __init__(self, number: int, snapshots: list[bytes] | None = None, hub: str | None = None) -> None:
+        self.number = number
+        self.snapshots = snapshots or []
+        self.hub = hub
+        self.position = 0 if self.snapshots else self.GENERATED_ITEMS
+        self._render()
+
+    def publish(self) -> None:
+        """Moves to the next recorded snapshot, or adds a new item to a generated feed"""
+        if self.snapshots:
+            self.position = min(self.position + 1, len(self.snapshots) - 1)
+        else:
+            self.position += 1
+        self._render()
+
+    def _render(self) -> None:
+        if self.snapshots:
+            self.body = self.snapshots[self.position]
+        else:
+            items = ''.join(
+                f"<item><title>{headline(self.number, i)}</title>"
+                f"<link>https://news{self.number % 50}.example.com/{self.number}/{i}?utm_source=rss</link>"
+                f"<guid>feed-{self.number}-{i}</guid><description>{'Lorem ipsum dolor sit amet. ' * 20}</description>"
+                f"</item>" for i in range(self.position, max(self.position - self.GENERATED_ITEMS, 0), -1))
+            hub = f'<atom:link rel="hub" href="{self.hub}"/>' if self.hub else ''
+            self.body = (f'<?xml version="1.0" encoding="UTF-8"?>'
+                         f'<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+                         f'<title>Feed {self.number}</title><link>https://example.com</link>{hub}{items}'
+                         f'</channel></rss>').encode()
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+        self.last_modified = formatdate(usegmt=True)
+
+
+def load_fixtures(directory: str) -> list[list[bytes]]:
+    """
+    Loads the feed fixtures of a directory
+
+    Args:
+        directory: Directory of recorded feed files, and of directories of feed files recorded over time
+
+    Returns:
+        List of the snapshots of each fixture, in name order
+    """
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            snapshots = [open(os.path.join(path, file), 'rb').read() for file in sorted(os.listdir(path))]
+        else:
+            snapshots = [open(path, 'rb').read()]
+        if snapshots:
+            fixtures.append(snapshots)
+    return fixtures
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many concurrent connections are queued instead of being refused and retried a second later
+    request_queue_size = 1024
+
+
+class FeedServer:
+    """
+    Local HTTP server of the benchmark feeds. Every feed is served at http://127.0.0.1:<port>/feed/<number>.xml, so
+    all the feeds share the same host.
+
+    Attributes
+    ----------
+    feeds : list
+        The served feeds
+    latency : float
+        Number of seconds every response is delayed by
+    requests : int
+        Number of requests served
+    not_modified : int
+        Number of 304 responses served
+    """
+
+    def __init__(self, feed_count: int, latency: float = 0, fixtures: list[list[bytes]] | None = None,
+                 hub: str | None = None) -> None:
+        self.feeds = [Feed(number, fixtures[number % len(fixtures)] if fixtures else None, hub)
+                      for number in range(feed_count)]
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                try:
+                    feed = server.feeds[int(self.path.split('/')[-1].split('.')[0])]
+                except (ValueError, IndexError):
+                    self.send_error(404)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.requests += 1
+                    unchanged = self.headers.get('If-None-Match') == feed.etag
+                    server.not_modified += unchanged
+                self.send_response(304 if unchanged else 200)
+                self.send_header('ETag', feed.etag)
+                self.send_header('Last-Modified', feed.last_modified)
+                if unchanged:
+                    self.end_headers()
+                    return
+                self.send_header('Content-Type', 'application/rss+xml')
+                self.send_header('Content-Length', str(len(feed.body)))
+                self.end_headers()
+                self.wfile.write(feed.body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = _Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, number: int) -> str:
+        """Returns the url of a feed"""
+        return f"http://127.0.0.1:{self.server.server_port}/feed/{number}.xml"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Hub:
+    """
+    Local WebSub hub. Subscription requests are accepted and then verified with a challenge sent to the subscriber's
+    callback, like a real hub does. Published feeds are pushed to every verified subscriber of their topic, signed
+    with the subscriber's secret.
+
+    Attributes
+    ----------
+    subscriptions : dict
+        Dictionary mapping each topic to a dictionary of the secret of each verified callback
+    pushes : int
+        Number of pushes sent
+    """
+
+    def __init__(self) -> None:
+        self.subscriptions: dict[str, dict[str, str]] = {}
+        self.pushes = 0
+        self.lock = threading.Lock()
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get('Content-Length', '0')))
+                params = {name: values[0] for name, values in parse_qs(body.decode()).items()}
+                if params.get('hub.mode') != 'subscribe' or not params.get('hub.callback'):
+                    self.send_error(400)
+                    return
+                self.send_response(202)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                threading.Thread(target=hub._verify, args=(params,), daemon=True).start()
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = _Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self) -> str:
+        """Returns the url subscription requests are sent to"""
+        return f"http://127.0.0.1:{self.server.server_port}/"
+
+    def _verify(self, params: dict[str, str]) -> None:
+        """Sends the verification of intent of a subscription request, and adds the subscription if it is confirmed"""
+        challenge = secrets.token_hex(8)
+        query = urlencode({'hub.mode': 'subscribe', 'hub.topic': params['hub.topic'], 'hub.challenge': challenge,
+                           'hub.lease_seconds': params.get('hub.lease_seconds', '86400')})
+        try:
+            with urllib.request.urlopen(f"{params['hub.callback']}?{query}", timeout=10) as resp:
+                confirmed = resp.read().decode() == challenge
+        except OSError:
+            confirmed = False
+        if confirmed:
+            with self.lock:
+                self.subscriptions.setdefault(params['hub.topic'], {})[params['hub.callback']] = \
+                    params.get('hub.secret', '')
+
+    def publish(self, topic: str, body: bytes) -> int:
+        """
+        Pushes a feed to the subscribers of its topic
+
+        Returns:
+            The number of subscribers the feed was pushed to
+        """
+        with self.lock:
+            subscribers = list(self.subscriptions.get(topic, {}).items())
+        for callback, secret in subscribers:
+            signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+            request = urllib.request.Request(callback, data=body, headers={
+                'Content-Type': 'application/rss+xml', 'X-Hub-Signature': f'sha256={signature}'})
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+            self.pushes += 1
+        return len(subscribers)
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeSubreddit:
+    """Stand-in for a praw Subreddit that keeps its submissions in memory"""
+
+    def __init__(self, reddit: 'FakeReddit', name: str) -> None:
+        self.reddit = reddit
+        self.display_name = name
+        self.posts: list[SimpleNamespace] = []
+        templates = [{'flair_text': text, 'flair_template_id': f'{name}-{text}', 'flair_text_editable': False}
+                     for text in ('News', 'Politics', 'Sports')]
+        templates.append({'flair_text': '', 'flair_template_id': f'{name}-custom', 'flair_text_editable': True})
+        self.flair = SimpleNamespace(link_templates=SimpleNamespace(
+            user_selectable=lambda: self.reddit.request(iter(templates))))
+
+    def new(self, limit: int = 100, params: dict | None = None):
+        """Lists the newest submissions, only the ones newer than params['before'] if it is given"""
+        posts = self.posts[::-1]
+        if params and params.get('before'):
+            before = int(params['before'][3:], 36)
+            posts = [post for post in posts if int(post.id, 36) > before]
+        # Every page of 100 submissions is one request
+        for _ in range(max(1, -(-min(len(posts), limit) // 100))):
+            self.reddit.request(None)
+        return iter(posts[:limit])
+
+    def submit(self, title: str, url: str, resubmit: bool = True, flair_id: str | None = None,
+               flair_text: str | None = None) -> SimpleNamespace:
+        """Adds a submission to the subreddit"""
+        post = SimpleNamespace(id=format(next(self.reddit.ids), 'x'), title=title, url=url, created_utc=time.time(),
+                               permalink=f"/r/{self.display_name}/comments/{len(self.posts)}/")
+        self.posts.append(post)
+        with self.reddit.lock:
+            self.reddit.submissions += 1
+        return self.reddit.request(post)
+
+
+class FakeReddit:
+    """
+    Stand-in for praw.Reddit, with a per-request latency and a rate limit window like Reddit's
+
+    Attributes
+    ----------
+    latency : float
+        Number of seconds every request takes
+    submissions : int
+        Number of submissions made
+    auth : SimpleNamespace
+        Object whose limits dictionary mimics praw's rate limit information
+    """
+
+    WINDOW = 600  # Seconds in a rate limit window
+    QUOTA = 1000  # Requests allowed per window
+
+    def __init__(self, latency: float = 0) -> None:
+        self.latency = latency
+        self.subreddits: dict[str, FakeSubreddit] = {}
+        self.ids = itertools.count(36 ** 5)
+        self.submissions = 0
+        self.window_start = time.time()
+        self.auth = SimpleNamespace(limits={'remaining': None, 'reset_timestamp': None, 'used': None})
+        self.lock = threading.Lock()
+
+    def subreddit(self, name: str) -> FakeSubreddit:
+        with self.lock:
+            return self.subreddits.setdefault(name.lower(), FakeSubreddit(self, name))
+
+    def request(self, result):
+        """Counts a request towards the rate limit and waits for the latency, then returns the result"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.WINDOW or self.auth.limits['used'] is None:
+                self.window_start = now
+                self.auth.limits['used'] = 0
+            self.auth.limits['used'] += 1
+            self.auth.limits['remaining'] = max(0.0, float(self.QUOTA - self.auth.limits['used']))
+            self.auth.limits['reset_timestamp'] = self.window_start + self.WINDOW
+        return result
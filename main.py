@@ -1,11 +1,29 @@
 import argparse
 import os
-from rss_script import RedditBot
+from rss_script import RedditBot, Supervisor
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-t", "--testing", help="Testing mode toggle", action="store_true")
+    parser.add_argument("-c", "--config", default=os.getenv("CONFIG_FILE", "config.yaml"),
+                        help="Path of the config file")
+    parser.add_argument("-w", "--workers", type=int, default=int(os.getenv("WORKERS", "1")),
+                        help="Number of worker processes to split the subreddits across")
+    parser.add_argument("--shard-index", type=int, default=os.getenv("SHARD_INDEX"),
+                        help="Only handle the subreddits of this shard (from 0 to --shard-count - 1)")
+    parser.add_argument("--shard-count", type=int, default=os.getenv("SHARD_COUNT"),
+                        help="Number of shards the config is split into across several containers")
+    args = parser.parse_args()
+    if (args.shard_index is None) != (args.shard_count is None):
+        parser.error("--shard-index and --shard-count must be used together")
+    if args.shard_count is not None and args.workers > 1:
+        parser.error("--workers cannot be combined with --shard-index and --shard-count")
     os.makedirs(os.path.abspath("db"), exist_ok=True)
-    bot = RedditBot(parser.parse_args().testing, os.path.abspath("config.yaml"), os.path.abspath("db/db.json"),
-                    os.path.abspath("db/rss_script.log"))
+    if args.workers > 1:
+        bot = Supervisor(args.testing, os.path.abspath(args.config), os.path.abspath("db/db.json"),
+                         os.path.abspath("db/rss_script.log"), args.workers)
+    else:
+        bot = RedditBot(args.testing, os.path.abspath(args.config), os.path.abspath("db/db.json"),
+                        os.path.abspath("db/rss_script.log"),
+                        (args.shard_index, args.shard_count) if args.shard_count is not None else None)
     bot.run()
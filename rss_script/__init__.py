@@ -1 +1,2 @@
 from .reddit_bot import RedditBot
+from .supervisor import Supervisor
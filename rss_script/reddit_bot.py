@@ -1,13 +1,17 @@
 import math
+import os
 import sys
+import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from logging import Logger
-from signal import signal, SIGINT, SIGTERM
+from signal import signal, Signals, SIGINT, SIGTERM
 from pprint import pformat
+from typing import Any, Callable
+from urllib.parse import urlsplit
 
 import praw
-import requests
+from praw.exceptions import RedditAPIException
 
 from . import types, utils
 
@@ -20,232 +24,756 @@ class RedditBot:
     ----------
     testing : bool
         Boolean to determine if the bot is in testing mode. If True, the bot will not post to Reddit or update the
-        db.json file.
+        database.
+    shard : tuple[int, int] | None
+        (shard index, shard count) if the bot only handles the subreddits of one shard of the config, None otherwise
     credentials : dict
         Dictionary containing the credentials for the Reddit API
+    settings : dict
+        Dictionary containing the optional tuning settings, such as the number of concurrent RSS requests
     sub_list : list
         List of dictionaries containing the subreddits' information. Each dictionary contains 'name', the subreddit's
         name, and 'cycles', the list of RSS feeds to check. Each item in 'cycles' contains 'feeds', the list of RSS
         urls to check, 'check_interval', the time in seconds between each check, and optionally 'flair', the flair to
-        use when making Reddit posts of the RSS feed.
+        use when making Reddit posts of the RSS feed. If the bot is sharded, only the subreddits owned by its shard are
+        included.
+    config_file : str
+        The absolute path to the config file, which is reloaded when it changes
+    config_version : tuple
+        Modification time and size of the config file and the global blocklist file when they were last loaded
     db_file : str
         The absolute path to the database file
+    state : StateStore
+        State store that the database is loaded from and saved to. By default, it is a SQLite database next to the
+        db_file that only writes the entries that changed
     db : dict
-        Dictionary containing the database. This dictionary is loaded from and stored into the db_file
-    reddit : Reddit object
-        Reddit object from praw used to interact with the Reddit API
+        Dictionary containing the database. This dictionary is loaded from and stored into the state store
+    reddit_clients : RedditClients
+        Pool of the praw Reddit objects used to interact with the Reddit API, one per subreddit handled at once
+    http : HttpClient
+        Shared HTTP client with pooled connections used to make requests to the RSS feeds
+    title_vectors : TitleVectorCache
+        Persistent cache of the title vectors of recent Reddit posts, used to check for duplicate titles
+    post_indexes : dict
+        Dictionary mapping each subreddit's name to the SubredditIndex of its recent posts
+    scheduler : CycleScheduler
+        Priority queue of every subreddit's cycles ordered by their update time
+    feeds : FeedRegistry
+        Shared state of every RSS feed in the config, so a feed used by several subreddits is requested and parsed once
+        and keeps a single set of conditional request validators
+    websub : WebSubSubscriber | None
+        Subscriber to the WebSub hubs of the RSS feeds, whose pushed content is handled without polling the feeds, or
+        None if WEBSUB_CALLBACK_URL is not set
+    stopping : Event
+        Set by SIGINT and SIGTERM so the main loop saves the db and exits once the current pass is over
+    poller : AdaptivePoller
+        Picks when each RSS feed is requested next from how often it publishes and from its caching hints
+    fetch_cache : FetchCache
+        Cache of the newest headlines of each RSS feed, so responses whose body or first item did not change are not
+        parsed again
+    blocklists : dict
+        Dictionary mapping each (subreddit name, url) pair to the compiled blocklist of the feed, which includes the
+        global and subreddit blocklists
+    flair_cache : FlairTemplateCache
+        Cache of every subreddit's link flair templates, indexed by flair text
+    metrics : Metrics
+        Counters and timers of every stage of the bot's work, served on a local HTTP endpoint when METRICS_PORT is set
+    budget : RedditBudget
+        Tracker of the Reddit API quota that defers duplicate-check listings and flair lookups when it runs low
     USER_AGENT : str
         String used to identify the browser when making requests to the RSS feeds
+    NOTIFICATION_FLUSH_TIMEOUT : float
+        Maximum number of seconds to wait for queued Discord notifications to be sent when the bot exits
     """
 
     USER_AGENT = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
                   "Chrome/114.0.0.0 Safari/537.36")
+    NOTIFICATION_FLUSH_TIMEOUT = 5
 
-    def __init__(self, testing: bool, config_file: str, db_file: str, log_file: str) -> None:
+    def __init__(self, testing: bool, config_file: str, db_file: str, log_file: str,
+                 shard: tuple[int, int] | None = None, reddit: praw.Reddit | None = None) -> None:
         """
         Initializes the RedditBot object
 
         Args:
             testing: Boolean to determine if the bot is in testing mode. If True, the bot will not post to Reddit or
-                update the db.json file.
+                update the database.
             config_file: The absolute path to the config file
             db_file: The absolute path to the database file
+            log_file: The absolute path to the log file
+            shard: (Optional) (shard index, shard count) to only handle the subreddits owned by one shard of the config
+            reddit: (Optional) Reddit object to use in every thread instead of logging in with the credentials, which
+                must be thread-safe, such as a local stand-in for benchmarks
 
         Returns:
             None
         """
         # Initializes logger
-        self.logger: Logger = utils.configure_logger(log_file)
+        self.logger: Logger = utils.configure_logger(utils.shard_path(log_file, shard))
         # Sets testing mode
         self.testing = testing
         self.logger.info(f"Testing Mode: {'ON' if self.testing else 'OFF'}")
+        self.shard = shard
         # Loads config file and env variables, sets self.credentials and self.sub_list
         self.credentials = utils.load_credentials()
-        self.sub_list = utils.load_config(config_file)
+        self.settings = utils.load_settings()
+        self.metrics = utils.Metrics()
+        if self.settings['metrics_port']:
+            # Every shard serves its own metrics on the next port
+            port = self.settings['metrics_port'] + (self.shard[0] if self.shard else 0)
+            self.metrics.serve(port, self.settings['metrics_host'])
+            self.logger.info(f"Serving metrics on http://{self.settings['metrics_host']}:{port}/metrics")
+        self.http = utils.HttpClient(self.settings, self.USER_AGENT)
+        # The similarity engine is only loaded the first time a title is checked for duplicates
+        utils.configure_similarity(self.settings['similarity_backend'], self.settings['spacy_model'],
+                                   self.settings['static_vectors_dir'])
+        self.config_file = config_file
+        self.config_version = self._config_version()
+        try:
+            self.sub_list = utils.validate_config(utils.load_config(config_file))
+        except ValueError as e:
+            self.logger.error(f"Invalid config file: {str(e)}")
+            sys.exit(1)
+        if self.shard:
+            self.sub_list = utils.filter_shard(self.sub_list, *self.shard)
+            self.logger.info(f"Shard {self.shard[0]} of {self.shard[1]}: handling {len(self.sub_list)} subreddits")
         self.logger.debug(f"Config List:\n{pformat(self.sub_list)}\n")
+        self.global_blocklist = (utils.load_blocklist(self.settings['global_blocklist_file'])
+                                 if self.settings['global_blocklist_file'] else [])
+        self.blocklists = self._compile_blocklists()
 
         # Initializes db dictionary, sets self.db
         self.db_file = db_file
-        self.db: types.Database = utils.load_db(db_file)
+        self.state = utils.open_state_store(db_file, self.settings['state_backend'], self.shard)
+        owned = {sub_info['name'] for sub_info in self.sub_list} if self.shard else None
+        self.db: types.Database = self.state.load(owned)
         self._initialize_db()
+        self.feeds = utils.FeedRegistry(
+            self.state.load_feeds(utils.config_urls(self.sub_list) if self.shard else None),
+            self.settings['feed_fetch_window'])
+        self.feeds.adopt(self.db)
+        self.feeds.prune(self.sub_list)
+        self.health = utils.FeedHealth(
+            self.state.load_hosts(utils.config_hosts(self.sub_list) if self.shard else None),
+            self.settings['circuit_failure_threshold'], self.settings['circuit_backoff'],
+            self.settings['circuit_max_backoff'])
+        self.health.prune(self.sub_list)
+        self.websub = None
+        self.stopping = threading.Event()
+        if self.settings['websub_callback_url']:
+            shard_index = self.shard[0] if self.shard else 0
+            # Callback urls may hold other braces, so only the {shard} placeholder is replaced
+            callback_url = self.settings['websub_callback_url'].replace('{shard}', str(shard_index))
+            self.websub = utils.WebSubSubscriber(callback_url, self.settings['websub_lease_seconds'],
+                                                 self.settings['websub_fallback_interval'],
+                                                 self.settings['fetch_max_bytes'])
+            self.websub.register(self.feeds.feeds)
+            # Every shard receives its pushes on the next port
+            self.websub.serve(self.settings['websub_port'] + shard_index, self.settings['websub_host'])
+            self.logger.info(f"Receiving WebSub pushes on port {self.settings['websub_port'] + shard_index} for "
+                             f"{self.websub.callback_url}")
+        self.title_vectors = utils.TitleVectorCache(
+            utils.shard_path(os.path.join(os.path.dirname(db_file), 'title_vectors.npz'), self.shard))
+        self.post_indexes: dict[str, utils.SubredditIndex] = {}
+        self.scheduler = utils.CycleScheduler(self.settings['schedule_jitter'])
+        self.poller = utils.AdaptivePoller(self.settings['poll_min_interval'], self.settings['poll_max_interval'])
+        self.fetch_cache = utils.FetchCache(self.settings['backlog_size'] + 1)
+        self._initialize_scheduler()
         # Initializes reddit praw object
-        self.reddit = praw.Reddit(username=self.credentials['user'], password=self.credentials['password'],
-                                  client_id=self.credentials['client_id'],
-                                  client_secret=self.credentials['client_secret'],
-                                  user_agent="RSS2Reddit:v2.0 by /u/GeoWa")
+        self.reddit_clients = utils.RedditClients(
+            lambda: reddit or praw.Reddit(username=self.credentials['user'], password=self.credentials['password'],
+                                          client_id=self.credentials['client_id'],
+                                          client_secret=self.credentials['client_secret'],
+                                          user_agent="RSS2Reddit:v2.0 by /u/GeoWa"))
+        self.budget = utils.RedditBudget(self.reddit_clients, self.settings['reddit_listing_reserve'],
+                                         self.settings['reddit_flair_reserve'])
+        self.flair_cache = utils.FlairTemplateCache(self.settings['flair_cache_ttl'])
+        if self.settings['flair_prewarm']:
+            self._prewarm_flair_cache()
         # Sends Discord Notification
+        shard_text = f" (shard {self.shard[0]} of {self.shard[1]})" if self.shard else ""
         utils.send_discord_message(
-            f"Bot Started on {'Testing Mode' if self.testing else 'Normal Mode'} at {time.strftime('%Y-%m-%d %H:%M')}")
+            f"Bot Started{shard_text} on {'Testing Mode' if self.testing else 'Normal Mode'} at "
+            f"{time.strftime('%Y-%m-%d %H:%M')}", utils.Priority.HIGH)
         signal(SIGINT, self._handle_signal)
         signal(SIGTERM, self._handle_signal)
+        # SIGUSR1 does not exist on Windows
+        if hasattr(Signals, 'SIGUSR1'):
+            signal(Signals.SIGUSR1, self._dump_metrics)
+
+    def _prewarm_flair_cache(self) -> None:
+        """Fetches the flair templates of every subreddit that has a cycle with a flair in the config"""
+        for sub_info in self.sub_list:
+            if any('flair' in cycle for cycle in sub_info['cycles']):
+                try:
+                    with self.budget.track(sub_info['name'], self.budget.FLAIR):
+                        self.flair_cache.warm(self.reddit_clients.get().subreddit(sub_info['name']))
+                except Exception as e:
+                    self.logger.error(f"Error fetching the flairs of {sub_info['name']}: {str(e)}")
+        self.logger.debug(f"Pre-warmed the flair templates of {len(self.flair_cache.templates)} subreddits")
 
     def _handle_signal(self, _signum, _frame):
-        """Handles SIGINT and SIGTERM signals."""
+        """
+        Handles SIGINT and SIGTERM signals by asking the main loop to stop. The signal interrupts the main thread while
+        lane and fetch threads may still be changing the db, so the bot saves and exits once the current pass is over
+        """
+        self.logger.info("Stopping after the current pass...")
+        self.stopping.set()
+        if self.websub:
+            # Wakes up the wait for the next pass
+            self.websub.pushed.set()
+
+    def _shutdown(self) -> None:
+        """Saves the db, sends the queued notifications and exits"""
         utils.send_discord_message(
-            f"Bot has been terminated at {time.strftime('%Y-%m-%d %H:%M')}")
-        # Update db.json
+            f"Bot has been terminated at {time.strftime('%Y-%m-%d %H:%M')}", utils.Priority.HIGH)
+        # Update db
         if not self.testing:
-            self.logger.debug("Updating db.json...")
-            utils.update_db(self.db_file, self.db)
+            self.logger.debug("Updating db...")
+            self.state.save(self.db)
+            self.state.save_feeds(self.feeds.feeds)
+            self.state.save_hosts(self.health.hosts)
+            self.title_vectors.save()
+        self.state.close()
+        # Sends the queued notifications, without holding up the shutdown for long
+        utils.flush_discord_messages(self.NOTIFICATION_FLUSH_TIMEOUT)
         sys.exit(0)
 
+    def _dump_metrics(self, _signum, _frame):
+        """Handles SIGUSR1 signals by writing the metrics to metrics.json next to the database file"""
+        filename = utils.shard_path(os.path.join(os.path.dirname(self.db_file), 'metrics.json'), self.shard)
+        try:
+            self.metrics.dump(filename)
+            self.logger.info(f"Metrics written to {filename}")
+        except OSError as e:
+            self.logger.error(f"Error writing the metrics to {filename}: {str(e)}")
+
     def _initialize_db(self) -> None:
         """
         Initializes the database by adding any new subreddits and RSS feeds to the database
 
         Precondition:
-            self.db is initialized with values from db.json
+            self.db is initialized with values from the state store
         Returns:
             None
         """
         try:
             for sub_info in self.sub_list:
-                if sub_info['name'] not in self.db:
-                    self.db[sub_info['name']] = {
-                        'update_list': [{"update_time": 0, "update_index": 0, "listening": True}] * len(
-                            sub_info['cycles']), 'rss_sources': {}}
-                else:
-                    db_entry = self.db[sub_info['name']]
-                    if len(db_entry['update_list']) > len(sub_info['cycles']):
-                        db_entry['update_list'] = db_entry['update_list'][:len(sub_info['cycles'])]
-                    for index, item in enumerate(db_entry['update_list']):
-                        item['update_time'] = min(item['update_time'],
-                                                  int(time.time()) + sub_info['cycles'][index]['check_interval'])
-                        item['update_index'] = item['update_index'] if item['update_index'] < len(
-                            sub_info['cycles'][index]['feeds']) else 0
-                    total_urls = [feed['url'] for cycle in sub_info['cycles'] for feed in cycle['feeds']]
-                    new_rss_sources = {}
-                    for url in db_entry['rss_sources'].keys():
-                        if url in total_urls:
-                            new_rss_sources[url] = db_entry['rss_sources'][url]
-                    db_entry['rss_sources'] = new_rss_sources
+                self._initialize_sub(sub_info)
         except Exception as e:
             self.logger.error(f'Unable to read the db: {str(e)}')
-            self.logger.error("The file might be corrupted, try deleting db.json then try again.")
+            self.logger.error("The file might be corrupted, try deleting the files in the db folder then try again.")
             sys.exit(1)
 
+    def _initialize_sub(self, sub_info: types.SubredditConfig, cycles: set[int] | None = None) -> None:
+        """
+        Reconciles the database entry of a subreddit with its config. Update entries are added for new cycles and
+        removed for deleted ones, and the RSS sources that are no longer in the config are dropped.
+
+        Args:
+            sub_info: The config of the subreddit
+            cycles: (Optional) Indexes of the cycles whose update time and feed index are brought within their config.
+                Every cycle by default
+        """
+        db_entry = self.db.setdefault(sub_info['name'], {'update_list': [], 'rss_sources': {}})
+        update_list = db_entry['update_list'][:len(sub_info['cycles'])]
+        update_list.extend({"update_time": 0, "update_index": 0, "listening": True}
+                           for _ in sub_info['cycles'][len(update_list):])
+        db_entry['update_list'] = update_list
+        for index, item in enumerate(update_list):
+            if cycles is not None and index not in cycles:
+                continue
+            item['update_time'] = min(item['update_time'],
+                                      int(time.time()) + sub_info['cycles'][index]['check_interval'])
+            item['update_index'] = item['update_index'] if item['update_index'] < len(
+                sub_info['cycles'][index]['feeds']) else 0
+        total_urls = {feed['url'] for cycle in sub_info['cycles'] for feed in cycle['feeds']}
+        db_entry['rss_sources'] = {url: source for url, source in db_entry['rss_sources'].items() if url in total_urls}
+
+    def _initialize_scheduler(self) -> None:
+        """
+        Schedules every cycle of every subreddit at its update time from the database
+
+        Precondition:
+            self.db is initialized with an update entry for every cycle in self.sub_list
+        """
+        for position, sub_info in enumerate(self.sub_list):
+            for index, update_entry in enumerate(self.db[sub_info['name']]['update_list'][:len(sub_info['cycles'])]):
+                self.scheduler.schedule((sub_info['name'], index), update_entry['update_time'], (position, index))
+
     def run(self) -> None:
         """
-        Main program loop that checks the RSS feeds, updates the db.json file, then sleeps for a specified amount of
+        Main program loop that checks the RSS feeds, updates the db, then sleeps for a specified amount of
         time.
         """
-        while True:
+        while not self.stopping.is_set():
             try:
                 self.logger.info(f"[{time.strftime('%Y-%m-%d %H:%M')}] Checking RSS feeds...")
-                next_update = self._subreddits_loop()
-                # Update db.json
-                if not self.testing:
-                    self.logger.debug("Updating db.json...")
-                    utils.update_db(self.db_file, self.db)
+                next_update = self.run_pass()
                 # Wait until next update
+                if math.isinf(next_update):
+                    self.logger.info("No RSS feeds to check")
+                    next_update = time.time() + 3600
                 t = datetime.fromtimestamp(next_update).strftime('%Y-%m-%d %H:%M')
                 self.logger.info(f"Next update at {t}")
-                utils.until(next_update)
+                self._wait_until(next_update)
             except Exception as e:
                 self.logger.error(f"An error occurred: {str(e)}", exc_info=True)
+                utils.flush_discord_messages(self.NOTIFICATION_FLUSH_TIMEOUT)
                 sys.exit(1)
+        self._shutdown()
+
+    def _wait_until(self, timestamp: float) -> None:
+        """
+        Sleeps until the timestamp, reloading the config whenever the config file changes in the meantime. The wait
+        ends early if the new config adds or changes a cycle that is due sooner, when a WebSub hub pushes content, or
+        when the bot is asked to stop.
+
+        Args:
+            timestamp: Timestamp of the next due cycle
+        """
+        interval = self.settings['config_reload_interval']
+        while time.time() < timestamp and not self.stopping.is_set():
+            wait = max(0.0, timestamp - time.time())
+            if interval > 0:
+                wait = min(wait, interval)
+            if self.websub:
+                if self.websub.pushed.wait(wait):
+                    return
+            elif self.stopping.wait(wait):
+                return
+            if interval <= 0:
+                continue
+            version = self._config_version()
+            if version != self.config_version:
+                self.config_version = version
+                self._reload_config()
+                timestamp = min(timestamp, self.scheduler.next_time())
+
+    def _config_version(self) -> tuple:
+        """Returns the modification time and size of the config file and the global blocklist file"""
+        version = []
+        for filename in (self.config_file, self.settings['global_blocklist_file']):
+            try:
+                stat = os.stat(filename) if filename else None
+                version.append((stat.st_mtime_ns, stat.st_size) if stat else None)
+            except OSError:
+                version.append(None)
+        return tuple(version)
+
+    def _reload_config(self) -> None:
+        """
+        Reloads the config file and the global blocklist, and applies the differences to the running bot. Only the
+        cycles that were added or changed are rescheduled, so unchanged cycles keep their update time, and the feeds
+        still in the config keep their ETag, Last-Modified date, cached headlines and last_id. An invalid config is
+        reported and ignored.
+        """
+        try:
+            sub_list = utils.validate_config(utils.load_config(self.config_file))
+        except ValueError as e:
+            self.logger.error(f"Invalid config file, keeping the current config: {str(e)}")
+            utils.send_discord_message(f"Invalid config file, keeping the current config: {str(e)}",
+                                       utils.Priority.HIGH)
+            return
+        if self.shard:
+            sub_list = utils.filter_shard(sub_list, *self.shard)
+        old_subs = {sub_info['name']: sub_info for sub_info in self.sub_list}
+        new_subs = {sub_info['name']: sub_info for sub_info in sub_list}
+        removed = [name for name in old_subs if name not in new_subs]
+        added = [name for name in new_subs if name not in old_subs]
+        changed = [name for name in new_subs if name in old_subs and new_subs[name] != old_subs[name]]
+        for name in removed:
+            # The db entry is kept, like the entries of subreddits removed from the config before a restart
+            for index in range(len(old_subs[name]['cycles'])):
+                self.scheduler.remove((name, index))
+            self.post_indexes.pop(name, None)
+            self.flair_cache.invalidate(name)
+        missing = {name for name in added if name not in self.db}
+        if self.shard and missing:
+            # Subreddits that were in the config of this shard before are still in the shared store
+            self.db.update(self.state.load(missing))
+        if self.shard:
+            new_urls = utils.config_urls(sub_list) - self.feeds.feeds.keys()
+            if new_urls:
+                self.feeds.feeds.update(self.state.load_feeds(new_urls))
+            new_hosts = utils.config_hosts(sub_list) - self.health.hosts.keys()
+            if new_hosts:
+                self.health.hosts.update(self.state.load_hosts(new_hosts))
+        positions = {sub_info['name']: position for position, sub_info in enumerate(sub_list)}
+        for name in added + changed:
+            sub_info = new_subs[name]
+            old_cycles = old_subs[name]['cycles'] if name in old_subs else []
+            cycles = {index for index, cycle in enumerate(sub_info['cycles'])
+                      if index >= len(old_cycles) or cycle != old_cycles[index]}
+            self._initialize_sub(sub_info, None if name in added else cycles)
+            for index in range(len(sub_info['cycles']), len(old_cycles)):
+                self.scheduler.remove((name, index))
+            for index in sorted(cycles):
+                self.scheduler.schedule((name, index), self.db[name]['update_list'][index]['update_time'],
+                                        (positions[name], index))
+        self.sub_list = sub_list
+        self.feeds.prune(self.sub_list)
+        self.health.prune(self.sub_list)
+        if self.websub:
+            self.websub.register(self.feeds.feeds)
+        self.global_blocklist = (utils.load_blocklist(self.settings['global_blocklist_file'])
+                                 if self.settings['global_blocklist_file'] else [])
+        self.blocklists = self._compile_blocklists()
+        self.logger.info(f"Config reloaded: {len(added)} added, {len(changed)} changed, {len(removed)} removed "
+                         f"subreddits")
+        self.logger.debug(f"Config List:\n{pformat(self.sub_list)}\n")
+
+    def run_pass(self) -> float:
+        """
+        Checks the due RSS feeds once and updates the db
+
+        Returns:
+            The timestamp of the next due cycle, or math.inf if there is none
+        """
+        with self.metrics.time('pass_seconds'):
+            next_update = self._subreddits_loop()
+            # Update db
+            if not self.testing:
+                self.logger.debug("Updating db...")
+                with self.metrics.time('stage_seconds', stage='save'):
+                    self.state.save(self.db)
+                    self.state.save_feeds(self.feeds.feeds)
+                    self.state.save_hosts(self.health.hosts)
+                    self.title_vectors.save()
+        self.logger.debug(f"Flair cache: {self.flair_cache.stats()}")
+        self.logger.debug(self.budget.report())
+        if self.websub:
+            self._renew_websub()
+        offenders = self.fetch_cache.worst_offenders(self.feeds.feeds.items())
+        if offenders:
+            self.logger.debug("Feeds sending unchanged responses: " + ", ".join(
+                f"{url} ({wasted} unchanged, {hit_rate:.0%} cache hits)" for url, wasted, hit_rate in offenders))
+        unhealthy = self.health.worst_offenders(self.feeds.feeds.items())
+        if unhealthy:
+            self.logger.debug("Failing hosts and feeds: " + ", ".join(
+                f"{name} ({stats['failures']} failures in a row, last {stats['last_error']}"
+                + (f", {stats['latency'] * 1000:.0f}ms" if stats['latency'] is not None else "") + ")"
+                for name, stats in unhealthy))
+        return next_update
 
     def _subreddits_loop(self) -> float:
         """
-        Loops through all the subreddits and RSS feeds and checks for new entries
+        Pops the due cycles from the scheduler and checks their RSS feeds for new entries. Cycles with stories left in
+        their backlog post the next one instead of requesting their RSS feed. The RSS feeds of the other due cycles are
+        requested concurrently first, then the responses are handled. The Reddit work of up to REDDIT_WORKERS
+        subreddits runs at once, each with its own praw Reddit object, while the cycles of each subreddit are handled
+        one at a time in order of update time.
+        Each cycle is then rescheduled at its new update time plus a random jitter.
 
         Returns:
             The time in seconds until the next time the loop should run
         """
-        next_update = math.inf  # next_update is the time in seconds until the next update
-        for sub_info in self.sub_list:
-            self.logger.debug(f"Checking r/{sub_info['name']}...")
-            updates = self.db[sub_info['name']]['update_list']
-            sources = self.db[sub_info['name']]['rss_sources']
-            for index in range(len(sub_info['cycles'])):
-                current_feed = sub_info['cycles'][index]
-                update_entry = updates[index]
-                feed_entry = current_feed['feeds'][update_entry['update_index']]
-                # Update time has passed
-                if update_entry['update_time'] <= math.ceil(time.time()):
-                    next_update = min(self._handle_update(sub_info, sources, current_feed, update_entry, feed_entry),
-                                      next_update)
-                # Update time has not passed
-                else:
-                    next_update = min(update_entry['update_time'], next_update)
-        return next_update
+        positions = {sub_info['name']: position for position, sub_info in enumerate(self.sub_list)}
+        pushed = self._receive_pushes() if self.websub else {}
+        popped = []
+        for sub_name, index in self.scheduler.pop_due(math.ceil(time.time())):
+            self.logger.debug(f"Checking r/{sub_name} cycle {index}...")
+            sub_info = self.sub_list[positions[sub_name]]
+            popped.append((sub_info, sub_info['cycles'][index], self.db[sub_name]['update_list'][index],
+                           (positions[sub_name], index)))
+        backlogs = [(number, sub_info['name']) for number, (sub_info, _, update_entry, _) in enumerate(popped)
+                    if not update_entry['listening'] and update_entry.get('backlog')]
+        with self.metrics.time('stage_seconds', stage='reddit'):
+            posted = utils.run_in_lanes(backlogs, lambda number: self._leased(self._post_backlog, *popped[number][:3]),
+                                        self.settings['reddit_workers'])
+        due = []
+        orders = []
+        for number, (sub_info, current_feed, update_entry, order) in enumerate(popped):
+            if posted.get(number) is not None:
+                self._reschedule(sub_info['name'], order, update_entry, posted[number])
+                continue
+            feed_entry = current_feed['feeds'][update_entry['update_index']]
+            due.append((sub_info, self.db[sub_info['name']]['rss_sources'], current_feed, update_entry, feed_entry))
+            orders.append(order)
+        if self.stopping.is_set():
+            # The cycles that were not handled keep their update time in the db and are due again after a restart
+            return self.scheduler.next_time()
+        with self.metrics.time('stage_seconds', stage='fetch'):
+            headlines = self._fetch_feeds(due, pushed)
+        with self.metrics.time('stage_seconds', stage='reddit'):
+            new_updates = utils.run_in_lanes(
+                [(number, cycle[0]['name']) for number, cycle in enumerate(due)],
+                lambda number: self._leased(self._handle_update, *due[number], headlines[due[number][4]['url']]),
+                self.settings['reddit_workers'])
+        for number, ((sub_info, _, _, update_entry, _), order) in enumerate(zip(due, orders)):
+            self._reschedule(sub_info['name'], order, update_entry, new_updates[number])
+        return self.scheduler.next_time()
+
+    def _leased(self, function: Callable, *args) -> Any:
+        """Calls the function with a Reddit object leased to the current thread, see utils.RedditClients"""
+        with self.reddit_clients.lease():
+            return function(*args)
+
+    def _reschedule(self, sub_name: str, order: tuple[int, int], update_entry: types.UpdateEntry,
+                    new_update: float) -> None:
+        """
+        Puts a handled cycle back into the scheduler at its new update time, adding a random jitter
+
+        Args:
+            sub_name: The name of the subreddit
+            order: (position of the subreddit in the config, index of the cycle in the subreddit's config)
+            update_entry: DB entry containing the update time of the cycle
+            new_update: Timestamp returned by _handle_update or _post_backlog
+        """
+        update_entry['update_time'] = self.scheduler.add_jitter(new_update)
+        self.scheduler.schedule((sub_name, order[1]), update_entry['update_time'], order)
+
+    def _fetch_feeds(self, due: list[tuple], pushed: dict[str, list[tuple[str, str, str]]] | None = None
+                     ) -> dict[str, list[tuple[str, str, str]] | None]:
+        """
+        Requests the RSS feeds of all due cycles concurrently, limiting the number of requests made to each host. A
+        feed used by several due cycles is requested and parsed once, and feeds requested less than FEED_FETCH_WINDOW
+        seconds ago or whose content was just pushed are not requested again. Feeds that are backing off after
+        failures, or whose host's circuit is open, are not requested either (see utils.FeedHealth).
+
+        Args:
+            due: List of (sub_info, sources, current_feed, update_entry, feed_entry) tuples for the due cycles
+            pushed: (Optional) Dictionary mapping the urls of the feeds pushed by their WebSub hub to their headlines
+
+        Returns:
+            Dictionary mapping each url to the newest headlines of the RSS feed, newest first. When the feed did not
+            change or could not be requested, the cached headlines are used. The headlines are None if the feed could
+            not be parsed and no headlines are cached
+        """
+        urls = set()
+        for sub_info, sources, _, _, feed_entry in due:
+            url = feed_entry['url']
+            # New Entry
+            if url not in sources:
+                sources[url] = {'last_id': None}
+                self.logger.debug(f"Adding {url} to db...")
+            urls.add(url)
+        pushed = pushed or {}
+        tasks = [(url, url) for url in urls if url not in pushed and not self.feeds.is_fresh(url) and
+                 self.health.allows(url, self.feeds.state(url))]
+        if tasks:
+            self.logger.debug(f"Requesting {len(tasks)} RSS feeds for {len(due)} cycles...")
+        bodies = utils.fetch_concurrently(tasks, self._rss_request, self.settings['fetch_workers'],
+                                          self.settings['fetch_per_host'])
+        return {url: pushed[url] if url in pushed else self._parse_feed(url, bodies.get(url)) for url in urls}
+
+    def _receive_pushes(self) -> dict[str, list[tuple[str, str, str]]]:
+        """
+        Parses the content pushed by the WebSub hubs since the last pass, and makes the listening cycles of the pushed
+        feeds due now
+
+        Returns:
+            Dictionary mapping the url of each pushed feed to its newest headlines, newest first
+        """
+        pushed = {}
+        for url, body in self.websub.pushes():
+            if url not in self.feeds.feeds:
+                continue
+            self.metrics.inc('websub_pushes_total')
+            self.feeds.state(url)['fetched_at'] = time.time()
+            items = self._parse_feed(url, body)
+            if items:
+                pushed[url] = items
+        if pushed:
+            self.logger.debug(f"Received {len(pushed)} RSS feeds from their WebSub hubs")
+            now = int(time.time())
+            for position, sub_info in enumerate(self.sub_list):
+                for index, cycle in enumerate(sub_info['cycles']):
+                    update_entry = self.db[sub_info['name']]['update_list'][index]
+                    if update_entry['listening'] and cycle['feeds'][update_entry['update_index']]['url'] in pushed:
+                        self.scheduler.schedule((sub_info['name'], index), now, (position, index))
+        return pushed
+
+    def _renew_websub(self) -> None:
+        """Requests a subscription from the WebSub hub of every feed whose subscription is missing or expiring"""
+        urls = self.websub.due(self.feeds.feeds)
+        if not urls:
+            return
+        results = utils.fetch_concurrently(
+            [(url, self.feeds.state(url)['websub']['hub']) for url in urls],
+            lambda url: self.websub.subscribe(self.http.session, url, self.feeds.state(url), self.http.timeout),
+            self.settings['fetch_workers'], self.settings['fetch_per_host'])
+        for accepted in results.values():
+            self.metrics.inc('websub_subscriptions_total', result='accepted' if accepted else 'refused')
+        self.logger.debug(f"Requested {sum(results.values())} of {len(urls)} WebSub subscriptions")
+
+    def _next_poll(self, url: str) -> int:
+        """
+        Returns the timestamp of the next request to an RSS feed. Feeds with an active WebSub subscription are only
+        polled as a fallback, at most every WEBSUB_FALLBACK_INTERVAL seconds, and feeds that are failing or whose host's
+        circuit is open are not polled before they can be retried
+
+        Args:
+            url: The url of the RSS feed
+
+        Returns:
+            Timestamp of the next request to the RSS feed
+        """
+        feed_state = self.feeds.state(url)
+        next_time = self.poller.next_poll(feed_state)
+        if self.websub and self.websub.is_active(feed_state):
+            next_time = max(next_time, int(time.time() + self.websub.fallback_interval))
+        return max(next_time, math.ceil(self.health.retry_at(url, feed_state)))
+
+    def _parse_feed(self, url: str, response_body: bytes | None) -> list[tuple[str, str, str]] | None:
+        """
+        Reads the newest headlines of an RSS feed from its response, and records the stories that are new since the
+        previous response in the feed's polling statistics
+
+        Args:
+            url: The url of the RSS feed
+            response_body: The response body of the RSS feed, or None if there is no new data
+
+        Returns:
+            The newest headlines of the RSS feed, newest first, or None if the feed could not be parsed and no
+            headlines are cached
+        """
+        feed_state = self.feeds.state(url)
+        previous = self.fetch_cache.cached(feed_state)
+        if not response_body:
+            self.logger.debug(f"No new data from {url}")
+            return previous
+
+        def parse(body: bytes, limit: int) -> list[tuple[str, str, str]] | None:
+            self.poller.record_hints(feed_state, *utils.read_feed_hints(body))
+            if self.websub:
+                self.websub.discover(url, feed_state, *utils.find_hub_links(body))
+            return utils.find_new_headlines(body, None, limit)
+
+        with self.metrics.time('stage_seconds', stage='parse'):
+            items, result = self.fetch_cache.headlines(feed_state, response_body, parse)
+        self.metrics.inc('fetch_cache_total', result=result, host=urlsplit(url).hostname or '')
+        self.health.record_feed(feed_state, None if items is not None else 'parse')
+        if items is None:
+            self.metrics.inc('feed_errors_total', error='parse', host=urlsplit(url).hostname or '')
+        if items and previous:
+            guids = [guid for _, _, guid in items]
+            new_stories = guids.index(previous[0][2]) if previous[0][2] in guids else len(items)
+            if new_stories:
+                self.poller.record_stories(feed_state, new_stories)
+        return items
 
     def _handle_update(self, sub_info: types.SubredditConfig, sources: dict[str, types.RssSource],
-                       current_feed: types.Cycle, update_entry: types.UpdateEntry, feed_entry: types.Feed) -> float:
+                       current_feed: types.Cycle, update_entry: types.UpdateEntry, feed_entry: types.Feed,
+                       items: list[tuple[str, str, str]] | None) -> float:
         """
-        Updates a specific subreddit-RSS feed combination by making a request to the RSS feed, updating the db, and
+        Updates a specific subreddit-RSS feed combination using the headlines of the RSS feed, updating the db, and
         posting to Reddit if applicable.
 
         Args:
             sub_info: Config dictionary for the subreddit
-            sources: DB entry containing list of URL and update about the RSS feeds to check for the subreddit
+            sources: DB entry containing the last_id of the RSS feeds checked for the subreddit
             current_feed: DB entry containing a group of RSS feeds to check and the update interval
             update_entry: DB entry containing the update time, update index, and listening mode for the RSS feed group
-            url: The url of the RSS feed
+            feed_entry: Config dictionary for the RSS feed
+            items: The newest headlines of the RSS feed, newest first, or None if the feed could not be parsed
 
         Returns:
-            Timestamp of when this subreddit-RSS feed combination should next enter listening mode.
+            Timestamp of when this subreddit-RSS feed combination should next enter listening mode. If the feed could
+            not be read, this is when it can be retried
         """
         url = feed_entry['url']
-        # New Entry
-        if url not in sources:
-            sources[url] = {'last_modified': None, 'etag': None, 'last_id': None}
-            self.logger.debug(f"Adding {url} to db...")
-        # Get RSS Feed
-        response_text = self._rss_request(url, sub_info['name'])
-        if not response_text:
-            self.logger.debug(f"No new data from {url}, continuing to listen")
-            new_update = int(time.time()) + 1800  # Check 30 minutes later
-            update_entry.update({'update_time': new_update, 'listening': True})
-            return new_update
-        title, link, guid = utils.find_newest_headline(response_text)
         # Check for errors from RSSParser.py
-        if not title:
-            return math.inf
-        return self._handle_rss_response(sub_info, sources, current_feed, update_entry, feed_entry, title, link, guid)
+        if items is None:
+            new_update = self._next_poll(url)
+            self.logger.debug(f"Could not read {url}, retrying in {max(0, new_update - int(time.time()))}s")
+            return new_update
+        last_id = sources[url]['last_id'] if update_entry['listening'] else None
+        if last_id and last_id.strip() not in (guid for _, _, guid in items):
+            # More stories than the cached headlines were published, or the last one seen is gone. The stories already
+            # posted are caught by the duplicate check of their links
+            self.logger.debug(f"Last story seen is not among the newest headlines of {url}")
+        # Only the newest headline is needed to begin listening or to post from a feed that was never seen
+        headlines = utils.headlines_since(items, last_id, self.settings['backlog_size'] + 1)
+        return self._handle_rss_response(sub_info, sources, current_feed, update_entry, feed_entry, headlines)
 
-    def _rss_request(self, url: str, subreddit: str) -> str | None:
+    def _rss_request(self, url: str) -> bytes | None:
         """
-        Makes a request to the RSS feed and returns the response text if the request is successful
+        Makes a request to the RSS feed and returns the response body if the request is successful
 
         Args:
             url: The url of the RSS feed
-            subreddit: The name of the subreddit with the RSS entry
 
         Returns:
-            The response text of the RSS feed if the request is successful, None otherwise
+            The response body of the RSS feed if the request is successful, None otherwise
         """
+        feed_state = self.feeds.state(url)
+        start = time.perf_counter()
         try:
-            db_entry = self.db[subreddit]['rss_sources'][url]
-            resp = requests.get(url,
-                                headers={'User-Agent': self.USER_AGENT, 'If-Modified-Since': db_entry['last_modified'],
-                                         'If-None-Match': db_entry['etag']})
+            feed_state['fetched_at'] = time.time()
+            # A 304 response is only useful if the headlines of the previous response are cached
+            headers = {'If-Modified-Since': feed_state['last_modified'], 'If-None-Match': feed_state['etag']} \
+                if self.fetch_cache.cached(feed_state) else {}
+            with self.metrics.time('stage_seconds', stage='rss_request'):
+                resp = self.http.get(url, headers=headers)
+            self.metrics.inc('rss_responses_total', status=resp.status_code)
+            self.poller.record_response(feed_state, resp.headers)
+            self._record_health(url, feed_state, time.perf_counter() - start,
+                                None if resp.status_code in (200, 304) else utils.error_class(resp.status_code))
+            if resp.status_code == 304:
+                self.health.record_feed(feed_state)
+                self.fetch_cache.record(feed_state, self.fetch_cache.NOT_MODIFIED)
+                self.metrics.inc('fetch_cache_total', result=self.fetch_cache.NOT_MODIFIED,
+                                 host=urlsplit(url).hostname or '')
             if resp.status_code == 200:
-                db_entry['last_modified'] = resp.headers['Last-Modified'] if 'Last-Modified' in resp.headers else None
-                db_entry['etag'] = resp.headers['ETag'] if 'ETag' in resp.headers else None
-                return resp.text
+                self.metrics.inc('rss_bytes_total', len(resp.content))
+                feed_state['last_modified'] = resp.headers['Last-Modified'] if 'Last-Modified' in resp.headers \
+                    else None
+                feed_state['etag'] = resp.headers['ETag'] if 'ETag' in resp.headers else None
+                return resp.content
             else:
+                if resp.status_code != 304:
+                    self.logger.debug(f"Request to {url} returned status {resp.status_code}")
                 return None
         except Exception as e:
+            self.metrics.inc('rss_responses_total', status='error')
+            self._record_health(url, feed_state, time.perf_counter() - start, utils.error_class(e))
             self.logger.error(f'Error requesting {url}: {str(e)}')
             return None
 
+    def _record_health(self, url: str, feed_state: types.FeedState, latency: float, error: str | None) -> None:
+        """
+        Records the result of a request in the health of the feed and its host, and reports the host's circuit opening
+        or closing
+
+        Args:
+            url: The url of the RSS feed
+            feed_state: Shared state of the RSS feed
+            latency: Number of seconds the request took
+            error: Class of the error if the request failed (see utils.error_class), None otherwise
+        """
+        host = urlsplit(url).hostname or ''
+        if error:
+            self.metrics.inc('feed_errors_total', error=error, host=host)
+        circuit = self.health.record_request(url, feed_state, latency, error)
+        if circuit is None:
+            return
+        self.metrics.inc('circuit_transitions_total', state=circuit, host=host)
+        stats = self.health.host_stats(host)
+        if circuit == self.health.OPEN:
+            message = (f"Stopped requesting the feeds of {host} for {max(0, stats['retry_at'] - time.time()):.0f}s "
+                       f"after {stats['failures']} failures in a row (last: {stats['last_error']})")
+            self.logger.warning(message)
+            utils.send_discord_message(message, utils.Priority.LOW)
+        else:
+            self.logger.info(f"{host} is answering again, its feeds are requested normally")
+
     def _handle_rss_response(self, sub_info: types.SubredditConfig, sources: dict[str, types.RssSource],
                              current_feed: types.Cycle, update_entry: types.UpdateEntry,
-                             feed_entry: types.Feed, title: str, link: str, guid: str) -> int:
+                             feed_entry: types.Feed, headlines: list[tuple[str, str, str]]) -> int:
         """
         Handles the response from the RSS feed by updating the db, managing the listening mode, and posting to Reddit if
-        applicable.
+        applicable. When several stories were published since the last check, the oldest one is posted and the others
+        are added to the cycle's backlog, to be posted at the cycle's check interval.
 
         Args:
             sub_info: Config dictionary for the subreddit
             sources: DB entry containing list of URL and update about the RSS feeds to check for the subreddit
             current_feed: DB entry containing a group of RSS feeds to check and the update interval
             update_entry: DB entry containing the update time, update index, and listening mode for the RSS feed group
-            url: The url of the RSS feed
-            title: Title of the latest article from the RSS feed
-            link: Link to the latest article from the RSS feed
-            guid: GUID of the latest article from the RSS feed
+            feed_entry: Config dictionary for the RSS feed
+            headlines: (title, link, guid) of the articles from the RSS feed newer than the last one seen, newest
+                first. When the bot is not listening, it only contains the latest article
 
         Returns:
             Timestamp of when this subreddit-RSS feed combination should next enter listening mode.
@@ -254,37 +782,83 @@ class RedditBot:
         # Update db and post to Reddit
         if not update_entry['listening']:
             self.logger.debug(f"Began listening")
-            new_update = int(time.time()) + 1800  # Check 30 minutes later
-            sources[url]['last_id'] = guid
+            new_update = self._next_poll(url)
+            sources[url]['last_id'] = headlines[0][2]
             update_entry.update({'update_time': new_update, 'listening': True})
-        elif sources[url]['last_id'] == guid:
+        elif not headlines:
             self.logger.debug(f"No new stories from {url}")
-            new_update = int(time.time()) + 1800  # Check 30 minutes later
+            new_update = self._next_poll(url)
             update_entry.update({'update_time': new_update})
         else:
-            self.logger.debug(f"New story found! Checking for duplicates of {link}...")
-            if (self._check_blocklist(title, feed_entry.get('block', [])) or
-                    self._check_for_duplicates(title, link, self.reddit.subreddit(sub_info['name']))):
-                new_update = int(time.time()) + 1800  # Check 30 minutes later
-                sources[url]['last_id'] = guid
+            self.logger.debug(f"{len(headlines)} new stories found in {url}")
+            sources[url]['last_id'] = headlines[0][2]
+            backlog = update_entry.get('backlog', []) + [{'url': url, 'title': title, 'link': link, 'guid': guid}
+                                                         for title, link, guid in reversed(headlines)]
+            # Keeps the newest stories if there are more than the backlog can hold
+            update_entry['backlog'] = backlog[-(self.settings['backlog_size'] + 1):]
+            new_update = self._post_backlog(sub_info, current_feed, update_entry)
+            if new_update is None:
+                new_update = self._next_poll(url)
                 update_entry.update({'update_time': new_update, 'listening': True})
-            else:
-                self.logger.debug("No duplicates found, posting to Reddit...")
-                self._post_to_subreddit(sub_info['name'], title, link,
-                                        current_feed['flair'] if 'flair' in current_feed else None)
-                new_update = int(time.time()) + current_feed['check_interval']
-                sources[url]['last_id'] = guid
-                update_entry.update({'update_time': new_update,
-                                     'update_index': (update_entry['update_index'] + 1) % len(current_feed['feeds']),
-                                     'listening': False})
+        return new_update
+
+    def _post_backlog(self, sub_info: types.SubredditConfig, current_feed: types.Cycle,
+                      update_entry: types.UpdateEntry) -> int | None:
+        """
+        Posts the oldest story of the cycle's backlog to Reddit, skipping the stories that are blocked, duplicates, or
+        from feeds that were removed from the config
+
+        Args:
+            sub_info: Config dictionary for the subreddit
+            current_feed: DB entry containing a group of RSS feeds to check and the update interval
+            update_entry: DB entry containing the update time, update index, listening mode and backlog for the RSS
+                feed group
+
+        Returns:
+            Timestamp of when this subreddit-RSS feed combination should next enter listening mode, or None if no
+            story of the backlog was posted
+        """
+        feeds = {feed['url']: feed for feed in current_feed['feeds']}
+        backlog = update_entry.get('backlog', [])
+        new_update = None
+        while backlog and new_update is None:
+            entry = backlog.pop(0)
+            feed_entry = feeds.get(entry['url'])
+            if feed_entry is None:
+                continue
+            self.logger.debug(f"New story found! Checking for duplicates of {entry['link']}...")
+            with self.metrics.time('stage_seconds', stage='blocklist'):
+                blocked = self._check_blocklist(entry['title'], self.blocklists[(sub_info['name'], entry['url'])])
+            if blocked:
+                self.metrics.inc('blocklist_hits_total', subreddit=sub_info['name'])
+                continue
+            with self.metrics.time('stage_seconds', stage='duplicates'):
+                duplicate = self._check_for_duplicates(entry['title'], entry['link'],
+                                                       self.reddit_clients.get().subreddit(sub_info['name']))
+            if duplicate:
+                continue
+            self.logger.debug("No duplicates found, posting to Reddit...")
+            self._post_to_subreddit(sub_info['name'], entry['title'], entry['link'],
+                                    current_feed['flair'] if 'flair' in current_feed else None)
+            new_update = int(time.time()) + current_feed['check_interval']
+            update_entry.update({'update_time': new_update,
+                                 'update_index': (update_entry['update_index'] + 1) % len(current_feed['feeds']),
+                                 'listening': False})
+        if not backlog:
+            update_entry.pop('backlog', None)
         return new_update
 
     def _check_for_duplicates(self, title: str, link: str, subreddit: praw.reddit.Subreddit) -> bool:
         """
         Checks if the post is a duplicate by comparing the title and link to posts in the subreddit
-        from the last 24 hours (up to 1000 posts).
-        Links are checked for exact matches, titles are checked for similarity using a spaCy model.
-        The current threshold for similarity is 0.8.
+        from the last 24 hours (up to 1000 posts). The posts are kept in a local index of the subreddit that is
+        refreshed incrementally and shared by all feeds posting to the subreddit. When the Reddit API quota is low, the
+        index is not refreshed and the posts already indexed are used instead. The posts made by the bot are added to
+        the index as soon as they are submitted, so they are found before the index is listed again.
+        Links are checked for matching canonical urls (see utils.canonicalize_url), titles are checked for similarity
+        using the cached title vectors of the posts. When SIMILARITY_LSH_BANDS is set, only the posts whose title shares
+        enough words with the title to be a candidate of the index's MinHash LSH are compared. The current threshold
+        for similarity is 0.8.
 
         Args:
             title: The title of the post
@@ -295,48 +869,107 @@ class RedditBot:
             True if the post is a duplicate, False otherwise
         """
         try:
-            # Calculate the timestamp for the past 6 hours
-            past_timestamp = int((datetime.now() - timedelta(hours=24)).timestamp())
-            for post in subreddit.new(limit=1000):
-                if post.created_utc < past_timestamp:
-                    return False
-                if link == post.url or utils.remove_query_params(link) == post.url:
-                    utils.send_discord_message(f"Duplicate found:\n- {link}\n- https://www.reddit.com{post.permalink}")
-                    self.logger.debug(f"Duplicate found: {link} posted at https://www.reddit.com{post.permalink}")
-                    return True
-                similarity = utils.get_similarity(title, post.title)
+            sub_name = subreddit.display_name
+            index = self.post_indexes.get(sub_name)
+            if index is None:
+                bands, rows = self.settings['similarity_lsh_bands'], self.settings['similarity_lsh_rows']
+                index = self.post_indexes[sub_name] = utils.SubredditIndex(
+                    lsh=utils.MinHashLSH(bands, rows) if bands > 0 and rows > 0 else None)
+            # An index that was never listed is always refreshed, so duplicates are not missed entirely
+            if index.last_refresh and not self.budget.allows(self.budget.LISTING, sub_name):
+                self.logger.debug(f"Reddit quota is low, using the {len(index.posts)} indexed posts of r/{sub_name}")
+            else:
+                with self.budget.track(sub_name, self.budget.LISTING), \
+                        self.metrics.time('stage_seconds', stage='reddit_listing'):
+                    index.refresh(subreddit)
+            post = index.find_url(link)
+            if post:
+                self.metrics.inc('duplicates_total', subreddit=sub_name, match='url')
+                utils.send_discord_message(f"Duplicate found:\n- {link}\n- https://www.reddit.com{post.permalink}",
+                                           utils.Priority.LOW)
+                self.logger.debug(f"Duplicate found: {link} posted at https://www.reddit.com{post.permalink}")
+                return True
+            with self.metrics.time('stage_seconds', stage='similarity'):
+                posts = index.similar_posts(title)
+                similarities = self.title_vectors.similarities(title, posts)
+            self.metrics.inc('similarity_comparisons_total', len(posts), subreddit=sub_name)
+            for post, similarity in zip(posts, similarities):
                 if similarity > 0.8:
+                    self.metrics.inc('duplicates_total', subreddit=sub_name, match='title')
                     utils.send_discord_message(
                         f"Similar title found with a similarity of {similarity * 100:.2f}%: \n- {title} \n- {post.title}\n"
-                        f"Source: https://www.reddit.com{post.permalink}")
+                        f"Source: https://www.reddit.com{post.permalink}", utils.Priority.LOW)
                     self.logger.debug(
                         f"Similar title found: {title} and {post.title} with a similarity of {similarity}")
                     return True
                 if similarity > 0.75:
                     self.logger.debug(
                         f"Somewhat similar title found: {title} and {post.title} with a similarity of {similarity}")
+            return False
         except Exception as e:
             self.logger.error(f'Error checking for duplicates: {str(e)}')
             return False
 
-    def _check_blocklist(self, title: str, blocklist: list[str]) -> bool:
+    def _index_submission(self, sub_name: str, post_id: str, title: str, link: str) -> None:
+        """
+        Adds a post the bot just made to the index of the subreddit and to the title vectors, so the stories checked
+        before the index is listed again are compared with it
+
+        Args:
+            sub_name: The name of the subreddit the post was made in
+            post_id: The ID of the post
+            title: The title of the post
+            link: The url link of the post
+        """
+        index = self.post_indexes.get(sub_name)
+        if index is None:
+            return
+        try:
+            post = index.add_submission(post_id, title, link, f"/r/{sub_name}/comments/{post_id}/")
+            self.title_vectors.add([post])
+        except Exception as e:
+            self.logger.error(f'Error indexing the post {post_id} of {sub_name}: {str(e)}')
+
+    def _check_blocklist(self, title: str, blocklist: utils.Blocklist) -> bool:
         """
-        Checks if the title contains any of the words in the blocklist
+        Checks if the title contains any of the terms in the blocklist
 
         Args:
             title: The title of the post
-            blocklist: The list of words to check for in the title
+            blocklist: The compiled blocklist of the feed
 
         Returns:
-            True if the title contains any of the words in the blocklist, False otherwise
+            True if the title contains any of the terms in the blocklist, False otherwise
         """
-        lowercase_title = title.lower()
-        for word in blocklist:
-            if word.lower() in lowercase_title:
-                utils.send_discord_message(f"Blocklist word found: {word} in {title}")
-                self.logger.debug(f"Blocklist word found: {word} in {title}")
-                return True
-        return False
+        word = blocklist.match(title)
+        if word is None:
+            return False
+        utils.send_discord_message(f"Blocklist word found: {word} in {title}", utils.Priority.LOW)
+        self.logger.debug(f"Blocklist word found: {word} in {title}")
+        return True
+
+    def _compile_blocklists(self) -> dict[tuple[str, str], utils.Blocklist]:
+        """
+        Compiles the blocklist of every feed in the config, merging in the global and subreddit blocklists. Feeds with
+        the same lists share the same compiled blocklist
+
+        Returns:
+            Dictionary mapping each (subreddit name, url) pair to the compiled blocklist of the feed
+        """
+        global_list = (tuple(self.global_blocklist), self.settings['global_blocklist_mode'])
+        compiled: dict[tuple, utils.Blocklist] = {}
+        blocklists = {}
+        for sub_info in self.sub_list:
+            sub_list = (tuple(sub_info.get('block') or []), sub_info.get('block_mode', 'substring'))
+            for cycle in sub_info['cycles']:
+                for feed in cycle['feeds']:
+                    feed_list = (tuple(feed.get('block') or []), feed.get('block_mode', 'substring'))
+                    lists = (global_list, sub_list, feed_list)
+                    if lists not in compiled:
+                        compiled[lists] = utils.Blocklist(*lists)
+                    blocklists[(sub_info['name'], feed['url'])] = compiled[lists]
+        self.logger.debug(f"Compiled {len(compiled)} distinct blocklists for {len(blocklists)} feeds")
+        return blocklists
 
     def _post_to_subreddit(self, sub_name: str, title: str, link: str, flair_text: str | None = None) -> None:
         """
@@ -349,23 +982,32 @@ class RedditBot:
             flair_text: (Optional) The flair text to use for the post
         """
 
-        def post_with_flair() -> None:
+        def post_with_flair(retry: bool = True) -> None:
             """Posts to the subreddit with the given flair_text"""
-            # Find flair_id
-            flair_choices = list(subreddit.flair.link_templates.user_selectable())
-            flair = next((f for f in flair_choices if f["flair_text"] == flair_text), None)
+            try:
+                submit_with_flair()
+            except RedditAPIException as e:
+                # The cached flair_id may have been deleted, so fetch the templates again and retry once
+                if not retry or not any('FLAIR' in item.error_type.upper() for item in e.items):
+                    raise
+                self.logger.warning(f"Flair rejected by {sub_name}, refreshing its flair templates: {str(e)}")
+                self.flair_cache.invalidate(sub_name)
+                post_with_flair(retry=False)
+
+        def submit_with_flair() -> None:
+            """Finds the flair_id of the flair_text in the flair cache and submits the post with it"""
+            with self.budget.track(sub_name, self.budget.FLAIR):
+                flair, editable_flair = self.flair_cache.find(subreddit, flair_text,
+                                                              self.budget.allows(self.budget.FLAIR, sub_name))
             if flair:
-                if not self.testing:
-                    subreddit.submit(title=title, url=link, resubmit=False, flair_id=flair["flair_template_id"])
+                submit(flair_id=flair["flair_template_id"])
                 utils.send_discord_message(f"Posted {link} to r/{sub_name}")
                 self.logger.info(f"Posted to {sub_name} with preset flair {flair_text}")
                 return
             # Use editable flair if no pre-defined flair found
-            flair = next((f for f in flair_choices if f['flair_text_editable']), None)
+            flair = editable_flair
             if flair:
-                if not self.testing:
-                    subreddit.submit(title=title, url=link, resubmit=False, flair_id=flair["flair_template_id"],
-                                     flair_text=flair_text)
+                submit(flair_id=flair["flair_template_id"], flair_text=flair_text)
                 utils.send_discord_message(f"Posted {link} to r/{sub_name}")
                 self.logger.info(f"Posted to {sub_name} with custom flair {flair_text}")
                 return
@@ -375,14 +1017,23 @@ class RedditBot:
 
         def post_without_flair() -> None:
             """Posts to the subreddit without a flair"""
-            if not self.testing:
-                subreddit.submit(title=title, url=link, resubmit=False)
+            submit()
             utils.send_discord_message(f"Posted {link} to r/{sub_name}")
             self.logger.info(f"Posted to {sub_name}")
 
+        def submit(**flair) -> None:
+            """Submits the post unless the bot is in testing mode, counting the request towards the subreddit"""
+            if not self.testing:
+                with self.budget.track(sub_name, self.budget.SUBMIT), \
+                        self.metrics.time('stage_seconds', stage='submit'):
+                    submission = subreddit.submit(title=title, url=link, resubmit=False, **flair)
+                self._index_submission(sub_name, submission.id, title, link)
+            self.metrics.inc('posts_total', subreddit=sub_name)
+
         # Posts to subreddit
         try:
-            subreddit = self.reddit.subreddit(sub_name)
+            subreddit = self.reddit_clients.get().subreddit(sub_name)
             post_with_flair() if flair_text else post_without_flair()
         except Exception as e:
+            self.metrics.inc('post_errors_total', subreddit=sub_name)
             self.logger.error(f'Error posting to {sub_name}: {str(e)}')
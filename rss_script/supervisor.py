@@ -0,0 +1,137 @@
+import multiprocessing
+import sys
+import time
+from logging import Logger
+from signal import signal, SIGINT, SIGTERM
+
+from . import utils
+from .reddit_bot import RedditBot
+
+
+def _run_worker(testing: bool, config_file: str, db_file: str, log_file: str, shard: tuple[int, int]) -> None:
+    """Entry point of a worker process, which runs a RedditBot for one shard"""
+    RedditBot(testing, config_file, db_file, log_file, shard).run()
+
+
+class Supervisor:
+    """
+    Supervisor that splits the subreddits in the config file across several RedditBot worker processes. Subreddits are
+    assigned to workers by consistent hashing of their names, and every worker only loads and saves the state of its
+    own subreddits. Workers that exit are restarted with an exponential backoff. Since the worker of a subreddit only
+    depends on its name, workers reload the config file themselves when it changes, without being restarted.
+
+    Attributes
+    ----------
+    testing : bool
+        Boolean to determine if the workers are in testing mode
+    config_file : str
+        The absolute path to the config file
+    db_file : str
+        The absolute path to the database file
+    log_file : str
+        The absolute path to the supervisor's log file. Each worker logs to its own file next to it
+    workers : int
+        Number of worker processes
+    processes : dict
+        Dictionary mapping each shard index to its worker process
+    started_at : dict
+        Dictionary mapping each shard index to the timestamp its worker was last started at
+    failures : dict
+        Dictionary mapping each shard index to the number of times in a row its worker exited with an error
+    restart_at : dict
+        Dictionary mapping the shard index of each stopped worker to the timestamp it should be restarted at
+    """
+
+    POLL_INTERVAL = 5  # Seconds between checks of the workers
+    RESTART_DELAY = 15  # Seconds before restarting a failed worker, doubled after every consecutive failure
+    MAX_RESTART_DELAY = 600
+    STABLE_AFTER = 120  # Seconds a worker has to run before its failure count is reset
+    STOP_TIMEOUT = 30  # Seconds a worker has to save its state and exit before it is killed
+
+    def __init__(self, testing: bool, config_file: str, db_file: str, log_file: str, workers: int) -> None:
+        """
+        Initializes the Supervisor object
+
+        Args:
+            testing: Boolean to determine if the workers are in testing mode
+            config_file: The absolute path to the config file
+            db_file: The absolute path to the database file
+            log_file: The absolute path to the log file
+            workers: Number of worker processes
+        """
+        self.logger: Logger = utils.configure_logger(log_file)
+        self.testing = testing
+        self.config_file = config_file
+        self.db_file = db_file
+        self.log_file = log_file
+        self.workers = workers
+        # Workers are started with spawn so they do not inherit the supervisor's logger and open files
+        self.context = multiprocessing.get_context('spawn')
+        self.processes: dict[int, multiprocessing.Process] = {}
+        self.started_at: dict[int, float] = {}
+        self.failures: dict[int, int] = {shard: 0 for shard in range(workers)}
+        self.restart_at: dict[int, float] = {}
+        self.stopping = False
+
+    def _handle_signal(self, _signum, _frame):
+        """Handles SIGINT and SIGTERM signals by stopping the workers and exiting"""
+        self.stopping = True
+
+    def run(self) -> None:
+        """Starts the workers and supervises them until the supervisor is stopped"""
+        signal(SIGINT, self._handle_signal)
+        signal(SIGTERM, self._handle_signal)
+        # Migrates an existing db.json once, before the workers open the shared store
+        utils.open_state_store(self.db_file, utils.load_settings()['state_backend']).close()
+        self.logger.info(f"Starting {self.workers} workers...")
+        for shard in range(self.workers):
+            self._start(shard)
+        while True:
+            time.sleep(self.POLL_INTERVAL)
+            if self.stopping:
+                break
+            self._check_workers()
+        self.logger.info("Stopping the workers...")
+        self._stop_all()
+        utils.flush_discord_messages(5)
+        sys.exit(0)
+
+    def _start(self, shard: int) -> None:
+        """Starts the worker process of a shard"""
+        process = self.context.Process(target=_run_worker, name=f"rss2reddit-shard-{shard}",
+                                       args=(self.testing, self.config_file, self.db_file, self.log_file,
+                                             (shard, self.workers)))
+        process.start()
+        self.processes[shard] = process
+        self.started_at[shard] = time.time()
+        self.restart_at.pop(shard, None)
+
+    def _check_workers(self) -> None:
+        """Schedules the restart of workers that exited and restarts the ones whose backoff has passed"""
+        now = time.time()
+        for shard, process in self.processes.items():
+            if process.is_alive():
+                if now - self.started_at[shard] > self.STABLE_AFTER:
+                    self.failures[shard] = 0
+                continue
+            if shard not in self.restart_at:
+                self.failures[shard] += 1
+                delay = min(self.RESTART_DELAY * 2 ** (self.failures[shard] - 1), self.MAX_RESTART_DELAY)
+                self.logger.error(f"Worker {shard} exited with code {process.exitcode}, restarting in {delay}s...")
+                utils.send_discord_message(f"Worker {shard} exited with code {process.exitcode}, restarting in {delay}s",
+                                           utils.Priority.HIGH)
+                self.restart_at[shard] = now + delay
+            elif now >= self.restart_at[shard]:
+                self._start(shard)
+
+    def _stop_all(self) -> None:
+        """Asks every worker to save its state and exit, killing the ones that do not exit in time"""
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.time() + self.STOP_TIMEOUT
+        for process in self.processes.values():
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.kill()
+                process.join()
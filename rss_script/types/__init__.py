@@ -1,14 +1,26 @@
 from .config import Feed, Cycle, SubredditConfig
 from .credentials import Credentials
-from .database import UpdateEntry, RssSource, SubredditData, Database
+from .database import (BacklogEntry, UpdateEntry, PollStats, FetchCacheEntry, WebSubState, HealthStats, HostHealth,
+                       FeedState, RssSource, SubredditData, Database, Feeds, Hosts)
+from .settings import Settings
 
 __all__ = [
     'Feed',
     'Cycle',
     'SubredditConfig',
     'Credentials',
+    'BacklogEntry',
     'UpdateEntry',
+    'PollStats',
+    'FetchCacheEntry',
+    'WebSubState',
+    'HealthStats',
+    'HostHealth',
+    'FeedState',
     'RssSource',
     'SubredditData',
-    'Database'
+    'Database',
+    'Feeds',
+    'Hosts',
+    'Settings'
 ]
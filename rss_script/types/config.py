@@ -4,6 +4,7 @@ from typing import TypedDict, NotRequired, List
 class Feed(TypedDict):
     url: str
     block: NotRequired[List[str]]
+    block_mode: NotRequired[str]
 
 
 class Cycle(TypedDict):
@@ -15,3 +16,5 @@ class Cycle(TypedDict):
 class SubredditConfig(TypedDict):
     cycles: List[Cycle]
     name: str
+    block: NotRequired[List[str]]
+    block_mode: NotRequired[str]
@@ -1,16 +1,71 @@
-from typing import TypedDict, List, Dict, Optional
+from typing import TypedDict, List, Dict, Optional, NotRequired
+
+
+class BacklogEntry(TypedDict):
+    url: str
+    title: str
+    link: str
+    guid: str
 
 
 class UpdateEntry(TypedDict):
     update_time: int
     update_index: int
     listening: bool
+    backlog: NotRequired[List[BacklogEntry]]
 
 
-class RssSource(TypedDict):
+class PollStats(TypedDict):
+    first_seen: float
+    published: List[float]
+    interval: Optional[float]
+    not_before: float
+    ttl: Optional[int]
+    skip_hours: List[int]
+
+
+class FetchCacheEntry(TypedDict):
+    content_hash: Optional[str]
+    item_hash: Optional[str]
+    items: List[List[str]]
+    hits: Dict[str, int]
+
+
+class WebSubState(TypedDict):
+    hub: str
+    topic: str
+    secret: str
+    lease_expires: float
+    requested_at: float
+
+
+class HealthStats(TypedDict):
+    requests: int
+    failures: int
+    failed_at: float
+    last_error: Optional[str]
+    errors: Dict[str, int]
+    latency: Optional[float]
+
+
+class HostHealth(HealthStats):
+    circuit: str
+    opens: int
+    retry_at: float
+
+
+class FeedState(TypedDict):
     last_modified: Optional[str]
     etag: Optional[str]
-    last_id: str
+    fetched_at: float
+    poll: NotRequired[PollStats]
+    cache: NotRequired[FetchCacheEntry]
+    websub: NotRequired[WebSubState]
+    health: NotRequired[HealthStats]
+
+
+class RssSource(TypedDict):
+    last_id: Optional[str]
 
 
 class SubredditData(TypedDict):
@@ -19,3 +74,5 @@ class SubredditData(TypedDict):
 
 
 Database = Dict[str, SubredditData]
+Feeds = Dict[str, FeedState]
+Hosts = Dict[str, HostHealth]
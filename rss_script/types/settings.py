@@ -0,0 +1,41 @@
+from typing import TypedDict
+
+
+class Settings(TypedDict):
+    fetch_workers: int
+    fetch_per_host: int
+    fetch_timeout: float
+    fetch_connect_timeout: float
+    fetch_retries: int
+    fetch_backoff: float
+    fetch_backoff_max: float
+    fetch_max_bytes: int
+    circuit_failure_threshold: int
+    circuit_backoff: float
+    circuit_max_backoff: float
+    similarity_backend: str
+    similarity_lsh_bands: int
+    similarity_lsh_rows: int
+    spacy_model: str
+    static_vectors_dir: str | None
+    state_backend: str
+    schedule_jitter: float
+    flair_cache_ttl: float
+    flair_prewarm: bool
+    reddit_listing_reserve: int
+    reddit_flair_reserve: int
+    reddit_workers: int
+    backlog_size: int
+    poll_min_interval: float
+    poll_max_interval: float
+    metrics_port: int
+    metrics_host: str
+    global_blocklist_file: str | None
+    global_blocklist_mode: str
+    config_reload_interval: float
+    feed_fetch_window: float
+    websub_callback_url: str | None
+    websub_port: int
+    websub_host: str
+    websub_lease_seconds: int
+    websub_fallback_interval: float
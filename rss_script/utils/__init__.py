@@ -1,7 +1,26 @@
-from .file_manager import load_credentials, load_config, load_db, update_db
+from .blocklist import Blocklist
+from .feed_health import FeedHealth, config_hosts, error_class
+from .feed_registry import FeedRegistry, config_urls
+from .fetch_cache import FetchCache
+from .fetch_pool import fetch_concurrently, run_in_lanes
+from .file_manager import (load_credentials, load_settings, load_config, validate_config, load_blocklist, load_db,
+                           update_db)
+from .flair_cache import FlairTemplateCache
+from .http_client import HttpClient, ResponseTooLarge
 from .logger import configure_logger
-from .nlp import get_similarity
-from .notif import send_discord_message
+from .metrics import Metrics
+from .minhash import MinHashLSH
+from .nlp import configure_similarity, get_vectors
+from .notif import Priority, send_discord_message, flush_discord_messages
 from .pause import until
-from .rss_parser import find_newest_headline
-from .url_parser import remove_query_params
+from .polling import AdaptivePoller
+from .reddit_budget import RedditBudget
+from .reddit_clients import RedditClients
+from .rss_parser import find_new_headlines, headlines_since, iter_headlines, read_feed_hints, find_hub_links
+from .scheduler import CycleScheduler
+from .sharding import HashRing, filter_shard, shard_path
+from .state_store import StateStore, open_state_store
+from .subreddit_index import IndexedPost, SubredditIndex
+from .title_vectors import TitleVectorCache
+from .url_parser import canonicalize_url
+from .websub import WebSubSubscriber
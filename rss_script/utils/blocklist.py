@@ -0,0 +1,113 @@
+import re
+import unicodedata
+
+BLOCK_MODES = ('substring', 'word', 'regex')
+
+
+def normalize(text: str) -> str:
+    """Returns the text in Unicode NFKC form and case-folded, so lookalike characters and cases compare equal"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def _trie_pattern(terms: list[str], prune_prefixed: bool) -> str:
+    """
+    Builds a regex that matches any of the terms, with the terms arranged in a trie so the regex engine follows a
+    single path of characters instead of trying every term at each position
+
+    Args:
+        terms: The literal terms
+        prune_prefixed: If True, terms that start with another term are left out, since the shorter term matches
+            wherever they do
+
+    Returns:
+        The regex pattern
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        if prune_prefixed and '' in node:
+            return ''
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{pattern})?' if '' in node else pattern
+
+    return build(trie)
+
+
+class Blocklist:
+    """
+    Blocked terms of a feed compiled into a single regex, so a title is checked in one pass no matter how many terms
+    there are. Titles and terms are compared after Unicode NFKC normalization and case folding.
+
+    Terms are matched according to the mode of the list they come from:
+        substring: the term can appear anywhere in the title, like the previous blocklist, spaces around it included
+        word: the term must appear as whole words
+        regex: the term is a regular expression, matched case-insensitively
+
+    Attributes
+    ----------
+    size : int
+        Number of terms in the blocklist
+    pattern : re.Pattern | None
+        The compiled regex, or None if the blocklist is empty
+    """
+
+    def __init__(self, *lists: tuple[list[str], str]) -> None:
+        """
+        Initializes the Blocklist object by merging and compiling the lists
+
+        Args:
+            *lists: (terms, mode) tuples of the lists to merge, such as the global, subreddit and feed blocklists
+
+        Raises:
+            ValueError: If a mode is not one of substring, word or regex
+        """
+        terms: dict[str, set[str]] = {mode: set() for mode in BLOCK_MODES}
+        for words, mode in lists:
+            if mode not in BLOCK_MODES:
+                raise ValueError(f"Unknown block mode {mode!r}, expected one of {', '.join(BLOCK_MODES)}")
+            for word in words or []:
+                word = str(word)
+                if mode == 'regex':
+                    try:
+                        re.compile(word)
+                    except re.error as e:
+                        print(f"Skipping invalid blocklist regex {word!r}: {e}")
+                        continue
+                    terms[mode].add(word)
+                elif normalize(word).strip():
+                    # Substring terms keep their padding, so ' war ' does not match 'award'
+                    terms[mode].add(normalize(word).strip() if mode == 'word' else normalize(word))
+        self.size = sum(len(mode_terms) for mode_terms in terms.values())
+        alternatives = []
+        if terms['substring']:
+            alternatives.append(_trie_pattern(sorted(terms['substring']), prune_prefixed=True))
+        if terms['word']:
+            alternatives.append(rf"(?<!\w)(?:{_trie_pattern(sorted(terms['word']), prune_prefixed=False)})(?!\w)")
+        alternatives.extend(f'(?:{term})' for term in sorted(terms['regex']))
+        self.pattern = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+
+    def match(self, title: str) -> str | None:
+        """
+        Finds the first blocked term in the title
+
+        Args:
+            title: The title of the post
+
+        Returns:
+            The normalized text of the title that matched a blocked term, or None if no term matched
+        """
+        if self.pattern is None:
+            return None
+        found = self.pattern.search(normalize(title))
+        return found.group(0) if found else None
+
+    def __len__(self) -> int:
+        return self.size
@@ -0,0 +1,244 @@
+import threading
+import time
+from typing import Iterable
+from urllib.parse import urlsplit
+
+import requests
+
+from ..types import FeedState, HealthStats, HostHealth, Hosts, SubredditConfig
+from .feed_registry import config_urls
+from .http_client import ResponseTooLarge
+
+
+def error_class(error: BaseException | int) -> str:
+    """
+    Returns the class of a failed request, which is how its failures are counted
+
+    Args:
+        error: The exception raised by the request, or the HTTP status of an unsuccessful response
+
+    Returns:
+        timeout, connection, too_large, error, or http_<status>
+    """
+    if isinstance(error, int):
+        return f"http_{error}"
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.ConnectionError):
+        return 'connection'
+    if isinstance(error, ResponseTooLarge):
+        return 'too_large'
+    return 'error'
+
+
+def is_host_error(error: str) -> bool:
+    """Returns True if the error class means the host is down or overloaded, rather than a single feed is broken"""
+    return error in ('timeout', 'connection', 'http_429') or error.startswith('http_5')
+
+
+def host_of(url: str) -> str:
+    """Returns the host name of a url"""
+    return (urlsplit(url).hostname or '').lower()
+
+
+def config_hosts(sub_list: list[SubredditConfig]) -> set[str]:
+    """Returns the hosts of every feed in the config"""
+    return {host_of(url) for url in config_urls(sub_list)}
+
+
+class FeedHealth:
+    """
+    Tracks the health of every RSS feed and of every host serving them: the number of requests, the consecutive
+    failures, the failures per error class and the moving average latency. A feed that keeps failing waits longer and
+    longer before it is requested again, and every host has a circuit breaker, so a host that is down or overloaded
+    does not cost a full timeout per feed on every pass:
+        closed: the feeds of the host are requested normally
+        open: after failure_threshold consecutive timeouts, connection errors, 429 or 5xx responses from the host, its
+            feeds are not requested until retry_at. The wait doubles every time the circuit opens again
+        half_open: once retry_at has passed, a single feed of the host is requested as a probe. The circuit closes if
+            the probe succeeds and opens again if it fails
+
+    The health of the feeds is stored in their shared state, and the health of the hosts is persisted separately.
+
+    Attributes
+    ----------
+    hosts : dict
+        Dictionary mapping each host's name to its health
+    failure_threshold : int
+        Number of consecutive failures of a host that open its circuit
+    backoff : float
+        Number of seconds a circuit first stays open, and that a feed waits after its first failure
+    max_backoff : float
+        Maximum number of seconds a circuit stays open or a failing feed waits
+    """
+
+    ALPHA = 0.3  # Weight of the latest request in the moving average latency
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, hosts: Hosts, failure_threshold: int = 3, backoff: float = 5 * 60,
+                 max_backoff: float = 6 * 60 * 60) -> None:
+        """
+        Initializes the FeedHealth object
+
+        Args:
+            hosts: Dictionary mapping each host's name to its health, as loaded from the state store
+            failure_threshold: Number of consecutive failures of a host that open its circuit
+            backoff: Number of seconds a circuit first stays open, and that a feed waits after its first failure
+            max_backoff: Maximum number of seconds a circuit stays open or a failing feed waits
+        """
+        self.hosts = hosts
+        self.failure_threshold = max(1, failure_threshold)
+        self.backoff = backoff
+        self.max_backoff = max(backoff, max_backoff)
+        self.lock = threading.Lock()
+        for stats in self.hosts.values():
+            # A probe that was interrupted by a restart is sent again
+            if stats['circuit'] == self.HALF_OPEN:
+                stats['circuit'] = self.OPEN
+
+    @staticmethod
+    def _new_stats() -> HealthStats:
+        return HealthStats(requests=0, failures=0, failed_at=0, last_error=None, errors={}, latency=None)
+
+    def feed_stats(self, source: FeedState) -> HealthStats:
+        """Returns the health of a feed, adding an empty one if the feed has none yet"""
+        if 'health' not in source:
+            source['health'] = self._new_stats()
+        return source['health']
+
+    def host_stats(self, host: str) -> HostHealth:
+        """Returns the health of a host, adding an empty one if the host has none yet"""
+        if host not in self.hosts:
+            self.hosts[host] = HostHealth(**self._new_stats(), circuit=self.CLOSED, opens=0, retry_at=0)
+        return self.hosts[host]
+
+    def _delay(self, failures: int) -> float:
+        """Returns the number of seconds to wait after the given number of consecutive failures or openings"""
+        return min(self.max_backoff, self.backoff * 2 ** min(max(failures - 1, 0), 32))
+
+    def retry_at(self, url: str, source: FeedState) -> float:
+        """
+        Returns the earliest time the feed should be requested again because of its failures or its host's circuit,
+        which is 0 if the feed and its host are healthy
+        """
+        stats = source.get('health')
+        feed_retry = stats['failed_at'] + self._delay(stats['failures']) if stats and stats['failures'] else 0
+        host = self.hosts.get(host_of(url))
+        return max(feed_retry, host['retry_at'] if host and host['circuit'] != self.CLOSED else 0)
+
+    def allows(self, url: str, source: FeedState) -> bool:
+        """
+        Checks if a feed can be requested now. When the host's circuit is open and its wait is over, the feed is
+        allowed as the host's probe and the circuit becomes half open, so no other feed of the host is requested
+        until the probe's result is recorded
+
+        Args:
+            url: The url of the RSS feed
+            source: Shared state of the RSS feed
+
+        Returns:
+            True if the feed should be requested, False if it should be skipped
+        """
+        now = time.time()
+        stats = source.get('health')
+        if stats and stats['failures'] and stats['failed_at'] + self._delay(stats['failures']) > now:
+            return False
+        with self.lock:
+            host = self.hosts.get(host_of(url))
+            if host is None or host['circuit'] == self.CLOSED:
+                return True
+            if host['circuit'] == self.OPEN and host['retry_at'] <= now:
+                host['circuit'] = self.HALF_OPEN
+                return True
+            return False
+
+    def _record(self, stats: HealthStats, latency: float | None, error: str | None) -> None:
+        """Counts a request and its error, if any, in a feed's or host's health"""
+        stats['requests'] += 1
+        if latency is not None:
+            stats['latency'] = latency if stats['latency'] is None else \
+                self.ALPHA * latency + (1 - self.ALPHA) * stats['latency']
+        if error:
+            self._fail(stats, error)
+
+    @staticmethod
+    def _fail(stats: HealthStats, error: str) -> None:
+        """Counts a failure in a feed's or host's health"""
+        stats['failures'] += 1
+        stats['failed_at'] = time.time()
+        stats['last_error'] = error
+        stats['errors'][error] = stats['errors'].get(error, 0) + 1
+
+    def record_request(self, url: str, source: FeedState, latency: float, error: str | None = None) -> str | None:
+        """
+        Records the result of a request to a feed in the health of the feed and of its host. A successful response only
+        resets the host's failures, the feed's are reset once its content was read (see record_feed)
+
+        Args:
+            url: The url of the RSS feed
+            source: Shared state of the RSS feed
+            latency: Number of seconds the request took
+            error: (Optional) Class of the error if the request failed (see error_class), None if it succeeded
+
+        Returns:
+            OPEN or CLOSED if the host's circuit changed to that state, None otherwise
+        """
+        self._record(self.feed_stats(source), latency, error)
+        with self.lock:
+            host = self.host_stats(host_of(url))
+            if error and is_host_error(error):
+                self._record(host, latency, error)
+                if host['circuit'] == self.HALF_OPEN or (host['circuit'] == self.CLOSED and
+                                                         host['failures'] >= self.failure_threshold):
+                    host['opens'] += 1
+                    host['retry_at'] = time.time() + self._delay(host['opens'])
+                    host['circuit'] = self.OPEN
+                    return self.OPEN
+                return None
+            self._record(host, latency, None)
+            host['failures'] = 0
+            if host['circuit'] != self.CLOSED:
+                host.update(circuit=self.CLOSED, opens=0, retry_at=0)
+                return self.CLOSED
+        return None
+
+    def record_feed(self, source: FeedState, error: str | None = None) -> None:
+        """
+        Records whether the content of a feed could be read, resetting its failures if it could
+
+        Args:
+            source: Shared state of the RSS feed
+            error: (Optional) Class of the error, such as parse, if the content could not be read
+        """
+        stats = self.feed_stats(source)
+        if error:
+            self._fail(stats, error)
+        else:
+            stats['failures'] = 0
+
+    def worst_offenders(self, sources: Iterable[tuple[str, FeedState]],
+                        count: int = 5) -> list[tuple[str, HealthStats]]:
+        """
+        Finds the hosts and feeds with the most consecutive failures, the slowest first among equals
+
+        Args:
+            sources: (url, shared state) pairs of the RSS feeds
+            count: (Optional) Maximum number of hosts and feeds to return
+
+        Returns:
+            List of (host name or feed url, health) tuples, worst first
+        """
+        with self.lock:
+            offenders = [(host, stats) for host, stats in self.hosts.items() if stats['failures']]
+        offenders.extend((url, source['health']) for url, source in sources
+                         if 'health' in source and source['health']['failures'])
+        offenders.sort(key=lambda offender: (-offender[1]['failures'], -(offender[1]['latency'] or 0)))
+        return offenders[:count]
+
+    def prune(self, sub_list: list[SubredditConfig]) -> None:
+        """Removes the health of the hosts that serve no feed of the config anymore"""
+        hosts = config_hosts(sub_list)
+        with self.lock:
+            self.hosts = {host: stats for host, stats in self.hosts.items() if host in hosts}
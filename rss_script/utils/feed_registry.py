@@ -0,0 +1,72 @@
+import time
+
+from ..types import Database, FeedState, Feeds, SubredditConfig
+
+# Keys that were stored in every subreddit's RSS source before the feed state was shared
+LEGACY_KEYS = ('last_modified', 'etag', 'poll', 'cache')
+
+
+class FeedRegistry:
+    """
+    Registry of every RSS feed url in the config, with the state shared by all the subreddits and cycles that use the
+    feed: the conditional request validators, the polling statistics and the cached headlines. A feed used by several
+    subreddits is requested and parsed once, and its headlines are handed to every subreddit, which keeps its own
+    last_id and listening mode.
+
+    Attributes
+    ----------
+    feeds : dict
+        Dictionary mapping each feed's url to its state
+    fetch_window : float
+        Number of seconds after a request to a feed during which its cached headlines are used instead of
+        requesting it again for another subreddit
+    """
+
+    def __init__(self, feeds: Feeds, fetch_window: float = 60) -> None:
+        """
+        Initializes the FeedRegistry object
+
+        Args:
+            feeds: Dictionary mapping each feed's url to its state, as loaded from the state store
+            fetch_window: Number of seconds during which a feed is not requested again
+        """
+        self.feeds = feeds
+        self.fetch_window = fetch_window
+
+    def state(self, url: str) -> FeedState:
+        """Returns the state of a feed, adding an empty one if the feed has none yet"""
+        if url not in self.feeds:
+            self.feeds[url] = FeedState(last_modified=None, etag=None, fetched_at=0)
+        return self.feeds[url]
+
+    def is_fresh(self, url: str) -> bool:
+        """Returns True if the feed was requested less than fetch_window seconds ago"""
+        return url in self.feeds and time.time() - self.feeds[url]['fetched_at'] < self.fetch_window
+
+    def adopt(self, db: Database) -> None:
+        """
+        Moves the validators, polling statistics and cached headlines that older versions stored in every
+        subreddit's RSS source into the shared feed state. Feeds that already have a shared state keep it.
+
+        Args:
+            db: The database, whose RSS sources are left with only their last_id
+        """
+        for sub_data in db.values():
+            for url, source in sub_data['rss_sources'].items():
+                legacy = {key: source.pop(key) for key in LEGACY_KEYS if key in source}
+                if legacy and url not in self.feeds:
+                    self.feeds[url] = FeedState(last_modified=legacy.get('last_modified'), etag=legacy.get('etag'),
+                                                fetched_at=0)
+                    for key in ('poll', 'cache'):
+                        if key in legacy:
+                            self.feeds[url][key] = legacy[key]
+
+    def prune(self, sub_list: list[SubredditConfig]) -> None:
+        """Removes the state of the feeds that are not in the config anymore"""
+        urls = config_urls(sub_list)
+        self.feeds = {url: state for url, state in self.feeds.items() if url in urls}
+
+
+def config_urls(sub_list: list[SubredditConfig]) -> set[str]:
+    """Returns the urls of every feed in the config"""
+    return {feed['url'] for sub_info in sub_list for cycle in sub_info['cycles'] for feed in cycle['feeds']}
@@ -0,0 +1,127 @@
+import hashlib
+import re
+from typing import Callable, Iterable
+
+from ..types import FeedState, FetchCacheEntry
+
+# Start of the first RSS <item> or Atom <entry>, which does not match the <items> list of RSS 1.0 channels
+FIRST_ITEM_PATTERN = re.compile(rb'<(?:[\w.-]+:)?(item|entry)[\s/>]')
+
+Headline = tuple[str, str, str]
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _first_item_hash(body: bytes) -> str | None:
+    """Returns the hash of the bytes of the first <item> or <entry> of the feed, or None if there is none"""
+    start = FIRST_ITEM_PATTERN.search(body)
+    if not start:
+        return None
+    end = re.compile(rb'</(?:[\w.-]+:)?' + start.group(1) + rb'\s*>').search(body, start.end())
+    return _digest(body[start.start():end.end()]) if end else None
+
+
+class FetchCache:
+    """
+    Cache of the newest headlines of each RSS feed, keyed by a hash of the response body, so a feed that sends the same
+    document again is not parsed again. Many feeds ignore If-None-Match and If-Modified-Since and send a full response
+    every time, often with only a build date or tracking parameter changed in the channel header, so the headlines
+    are also reused when the bytes of the first <item> or <entry> did not change.
+
+    The cache entry of each feed is stored in its shared state, along with how many of its responses were answered by
+    each level of the cache, so the feeds that keep sending unchanged documents can be found.
+
+    Attributes
+    ----------
+    size : int
+        Number of headlines cached per feed, which is the most headlines a response is parsed for
+    """
+
+    NOT_MODIFIED = 'not_modified'  # The server answered 304 Not Modified
+    UNCHANGED = 'unchanged'  # The body was the same as the cached one
+    SAME_FIRST_ITEM = 'same_first_item'  # The body changed, but not its first item
+    CHANGED = 'changed'  # The body was parsed
+    RESULTS = (NOT_MODIFIED, UNCHANGED, SAME_FIRST_ITEM, CHANGED)
+
+    def __init__(self, size: int) -> None:
+        """
+        Initializes the FetchCache object
+
+        Args:
+            size: Number of headlines cached per feed
+        """
+        self.size = size
+
+    def entry(self, source: FeedState) -> FetchCacheEntry:
+        """Returns the cache entry of a feed, adding an empty one if the feed has none yet"""
+        if 'cache' not in source:
+            source['cache'] = FetchCacheEntry(content_hash=None, item_hash=None, items=[],
+                                              hits={result: 0 for result in self.RESULTS})
+        return source['cache']
+
+    def record(self, source: FeedState, result: str) -> None:
+        """Counts a response of the feed under one of the RESULTS"""
+        hits = self.entry(source)['hits']
+        hits[result] = hits.get(result, 0) + 1
+
+    def cached(self, source: FeedState) -> list[Headline] | None:
+        """Returns the cached headlines of a feed, newest first, or None if none are cached"""
+        items = self.entry(source)['items']
+        return [(title, link, guid) for title, link, guid in items] if items else None
+
+    def headlines(self, source: FeedState, body: bytes,
+                  parse: Callable[[bytes, int], list[Headline] | None]) -> tuple[list[Headline] | None, str]:
+        """
+        Returns the newest headlines of a response body, from the cache if the body or its first item did not change
+
+        Args:
+            source: Shared state of the RSS feed
+            body: The response body of the RSS feed
+            parse: Function called with the body and the number of headlines to return when the cache cannot be
+                used. It returns the headlines, newest first, or None if the body could not be parsed
+
+        Returns:
+            A tuple of (headlines or None, the result of the lookup, which is one of RESULTS)
+        """
+        entry = self.entry(source)
+        content_hash = _digest(body)
+        if entry['items'] and content_hash == entry['content_hash']:
+            result = self.UNCHANGED
+        else:
+            item_hash = _first_item_hash(body)
+            if entry['items'] and item_hash is not None and item_hash == entry['item_hash']:
+                result = self.SAME_FIRST_ITEM
+                entry['content_hash'] = content_hash
+            else:
+                result = self.CHANGED
+                items = parse(body, self.size)
+                # Documents that could not be parsed are not cached, so they are parsed again and reported every time
+                entry.update(content_hash=content_hash if items else None, item_hash=item_hash if items else None,
+                             items=[list(item) for item in items or []])
+                self.record(source, result)
+                return items, result
+        self.record(source, result)
+        return self.cached(source), result
+
+    def worst_offenders(self, sources: Iterable[tuple[str, FeedState]], count: int = 5) -> list[tuple[str, int, float]]:
+        """
+        Finds the feeds that sent the most full responses whose headlines were already cached, which are usually
+        servers that ignore conditional requests
+
+        Args:
+            sources: (url, shared state) pairs of the RSS feeds
+            count: (Optional) Maximum number of feeds to return
+
+        Returns:
+            List of (url, number of wasted full responses, share of the responses answered without parsing) tuples,
+            worst first
+        """
+        offenders = []
+        for url, source in sources:
+            hits = source.get('cache', {}).get('hits', {})
+            wasted = hits.get(self.UNCHANGED, 0) + hits.get(self.SAME_FIRST_ITEM, 0)
+            if wasted:
+                offenders.append((url, wasted, 1 - hits.get(self.CHANGED, 0) / sum(hits.values())))
+        return sorted(offenders, key=lambda offender: -offender[1])[:count]
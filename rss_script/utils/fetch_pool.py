@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from threading import BoundedSemaphore
+from typing import Callable, Hashable, TypeVar
+from urllib.parse import urlparse
+
+K = TypeVar('K', bound=Hashable)
+T = TypeVar('T')
+
+
+def fetch_concurrently(tasks: list[tuple[K, str]], fetch: Callable[[K], T], max_workers: int,
+                       max_per_host: int) -> dict[K, T]:
+    """
+    Runs the fetch function for every task in a bounded thread pool, allowing at most max_per_host requests to the
+    same host at once
+
+    Args:
+        tasks: List of (key, url) pairs. The key is passed to the fetch function and the url is used to find the host
+        fetch: Function that performs the request for a key and returns its result
+        max_workers: Maximum number of requests in flight across all hosts
+        max_per_host: Maximum number of requests in flight to a single host
+
+    Returns:
+        Dictionary mapping every key to the result of its fetch
+    """
+    if not tasks:
+        return {}
+    # Group tasks by host and interleave them so workers do not all queue up behind the same host's semaphore
+    by_host: dict[str, list[tuple[K, str]]] = {}
+    for key, url in tasks:
+        by_host.setdefault(urlparse(url).netloc.lower(), []).append((key, url))
+    host_limits = {host: BoundedSemaphore(max(1, max_per_host)) for host in by_host}
+    ordered = [task for group in zip_longest(*by_host.values()) for task in group if task is not None]
+
+    def run(key: K, url: str) -> T:
+        """Runs the fetch function while holding the host's semaphore"""
+        with host_limits[urlparse(url).netloc.lower()]:
+            return fetch(key)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks)))) as executor:
+        futures = {key: executor.submit(run, key, url) for key, url in ordered}
+        return {key: future.result() for key, future in futures.items()}
+
+
+def run_in_lanes(tasks: list[tuple[K, Hashable]], run: Callable[[K], T], max_workers: int) -> dict[K, T]:
+    """
+    Runs the function for every task in a bounded thread pool, with the tasks of the same lane run one at a time in
+    the order they are given, and the lanes run concurrently
+
+    Args:
+        tasks: List of (key, lane) pairs. The key is passed to the function and the lane groups the tasks that must
+            not run concurrently, such as the ones of the same subreddit
+        run: Function that runs the task of a key and returns its result
+        max_workers: Maximum number of lanes running at once. With 1, the tasks run in the calling thread in order
+
+    Returns:
+        Dictionary mapping every key to the result of its task
+    """
+    if max_workers <= 1 or len(tasks) <= 1:
+        return {key: run(key) for key, _ in tasks}
+    lanes: dict[Hashable, list[K]] = {}
+    for key, lane in tasks:
+        lanes.setdefault(lane, []).append(key)
+
+    def run_lane(keys: list[K]) -> list[tuple[K, T]]:
+        """Runs the tasks of a lane in order"""
+        return [(key, run(key)) for key in keys]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(lanes))) as executor:
+        futures = [executor.submit(run_lane, keys) for keys in lanes.values()]
+        return {key: result for future in futures for key, result in future.result()}
@@ -2,7 +2,7 @@ import json
 import os
 import yaml
 from dotenv import load_dotenv
-from ..types import SubredditConfig, Credentials, Database
+from ..types import SubredditConfig, Credentials, Database, Settings
 
 
 def load_credentials() -> Credentials:
@@ -21,6 +21,93 @@ def load_credentials() -> Credentials:
     )
 
 
+def _getenv_number(name: str, default: int | float) -> int | float:
+    """
+    Reads a numeric environment variable, falling back to the default if it is unset or invalid
+
+    Args:
+        name: Name of the environment variable
+        default: Value to use if the variable is unset or invalid. Its type determines the type of the result
+
+    Returns:
+        The value of the environment variable converted to the type of the default
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return type(default)(value)
+    except ValueError:
+        print(f'Invalid value for {name}: {value}, using default {default}')
+        return default
+
+
+def _getenv_bool(name: str, default: bool) -> bool:
+    """
+    Reads a boolean environment variable, falling back to the default if it is unset
+
+    Args:
+        name: Name of the environment variable
+        default: Value to use if the variable is unset
+
+    Returns:
+        True if the variable is set to 1, true, yes or on (in any case), False if it is set to anything else
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def load_settings() -> Settings:
+    """
+    Loads the optional tuning settings from the environment variables
+
+    Returns:
+        The settings from the environment variables, with defaults for any that are not specified
+    """
+    load_dotenv()
+    return Settings(
+        fetch_workers=_getenv_number('FETCH_WORKERS', 16),
+        fetch_per_host=_getenv_number('FETCH_PER_HOST', 2),
+        fetch_timeout=_getenv_number('FETCH_TIMEOUT', 30.0),
+        fetch_connect_timeout=_getenv_number('FETCH_CONNECT_TIMEOUT', 10.0),
+        fetch_retries=_getenv_number('FETCH_RETRIES', 3),
+        fetch_backoff=_getenv_number('FETCH_BACKOFF', 1.0),
+        fetch_backoff_max=_getenv_number('FETCH_BACKOFF_MAX', 60.0),
+        fetch_max_bytes=_getenv_number('FETCH_MAX_BYTES', 10 * 1024 * 1024),
+        circuit_failure_threshold=_getenv_number('CIRCUIT_FAILURE_THRESHOLD', 3),
+        circuit_backoff=_getenv_number('CIRCUIT_BACKOFF', 300.0),
+        circuit_max_backoff=_getenv_number('CIRCUIT_MAX_BACKOFF', 21600.0),
+        similarity_backend=os.getenv('SIMILARITY_BACKEND', 'spacy'),
+        similarity_lsh_bands=_getenv_number('SIMILARITY_LSH_BANDS', 0),
+        similarity_lsh_rows=_getenv_number('SIMILARITY_LSH_ROWS', 2),
+        spacy_model=os.getenv('SPACY_MODEL', 'en_core_web_md'),
+        static_vectors_dir=os.getenv('STATIC_VECTORS_DIR'),
+        state_backend=os.getenv('STATE_BACKEND', 'sqlite'),
+        schedule_jitter=_getenv_number('SCHEDULE_JITTER', 30.0),
+        flair_cache_ttl=_getenv_number('FLAIR_CACHE_TTL', 3600.0),
+        flair_prewarm=_getenv_bool('FLAIR_PREWARM', False),
+        reddit_listing_reserve=_getenv_number('REDDIT_LISTING_RESERVE', 100),
+        reddit_flair_reserve=_getenv_number('REDDIT_FLAIR_RESERVE', 20),
+        reddit_workers=_getenv_number('REDDIT_WORKERS', 4),
+        backlog_size=_getenv_number('BACKLOG_SIZE', 10),
+        poll_min_interval=_getenv_number('POLL_MIN_INTERVAL', 300.0),
+        poll_max_interval=_getenv_number('POLL_MAX_INTERVAL', 14400.0),
+        metrics_port=_getenv_number('METRICS_PORT', 0),
+        metrics_host=os.getenv('METRICS_HOST', '127.0.0.1'),
+        global_blocklist_file=os.getenv('GLOBAL_BLOCKLIST_FILE'),
+        global_blocklist_mode=os.getenv('GLOBAL_BLOCKLIST_MODE', 'substring'),
+        config_reload_interval=_getenv_number('CONFIG_RELOAD_INTERVAL', 10.0),
+        feed_fetch_window=_getenv_number('FEED_FETCH_WINDOW', 60.0),
+        websub_callback_url=os.getenv('WEBSUB_CALLBACK_URL'),
+        websub_port=_getenv_number('WEBSUB_PORT', 8081),
+        websub_host=os.getenv('WEBSUB_HOST', '0.0.0.0'),
+        websub_lease_seconds=_getenv_number('WEBSUB_LEASE_SECONDS', 10 * 24 * 60 * 60),
+        websub_fallback_interval=_getenv_number('WEBSUB_FALLBACK_INTERVAL', 6 * 60 * 60.0)
+    )
+
+
 def load_config(config_file: str) -> list[SubredditConfig]:
     """
     Loads the config file
@@ -39,6 +126,74 @@ def load_config(config_file: str) -> list[SubredditConfig]:
         print(f'Error loading {config_file}: {str(e)}')
 
 
+def validate_config(config) -> list[SubredditConfig]:
+    """
+    Checks that the config loaded from the config file has the structure the bot expects
+
+    Args:
+        config: The config loaded by load_config
+
+    Returns:
+        The config, unchanged
+
+    Raises:
+        ValueError: If the config is invalid, with a message describing the first problem found
+    """
+    from .blocklist import BLOCK_MODES
+
+    def check_blocklist(entry: dict, where: str) -> None:
+        if not isinstance(entry.get('block', []) or [], list):
+            raise ValueError(f"{where}: block must be a list")
+        if entry.get('block_mode', 'substring') not in BLOCK_MODES:
+            raise ValueError(f"{where}: block_mode must be one of {', '.join(BLOCK_MODES)}")
+
+    if not isinstance(config, list):
+        raise ValueError("The config must be a list of subreddits")
+    names = set()
+    for sub_info in config:
+        if not isinstance(sub_info, dict) or not isinstance(sub_info.get('name'), str) or not sub_info['name']:
+            raise ValueError(f"Every subreddit must have a name: {sub_info!r}")
+        where = f"r/{sub_info['name']}"
+        if sub_info['name'] in names:
+            raise ValueError(f"{where} is listed more than once")
+        names.add(sub_info['name'])
+        if not isinstance(sub_info.get('cycles'), list):
+            raise ValueError(f"{where}: cycles must be a list")
+        check_blocklist(sub_info, where)
+        for index, cycle in enumerate(sub_info['cycles']):
+            where = f"r/{sub_info['name']} cycle {index}"
+            if not isinstance(cycle, dict) or not isinstance(cycle.get('feeds'), list) or not cycle['feeds']:
+                raise ValueError(f"{where}: feeds must be a non-empty list")
+            interval = cycle.get('check_interval')
+            if not isinstance(interval, int) or isinstance(interval, bool) or interval < 0:
+                raise ValueError(f"{where}: check_interval must be a positive integer")
+            if 'flair' in cycle and not isinstance(cycle['flair'], str):
+                raise ValueError(f"{where}: flair must be text")
+            for feed in cycle['feeds']:
+                if not isinstance(feed, dict) or not isinstance(feed.get('url'), str) or not feed['url']:
+                    raise ValueError(f"{where}: every feed must have a url")
+                check_blocklist(feed, f"{where} {feed['url']}")
+    return config
+
+
+def load_blocklist(filename: str) -> list[str]:
+    """
+    Loads a blocklist file, which has one blocked term per line. Blank lines and lines starting with # are ignored
+
+    Args:
+        filename: Absolute path to the blocklist file
+
+    Returns:
+        The blocked terms, or an empty list if the file could not be read
+    """
+    try:
+        with open(filename, encoding='utf-8') as blocklist_file:
+            return [line.strip() for line in blocklist_file if line.strip() and not line.strip().startswith('#')]
+    except OSError as e:
+        print(f'Error loading {filename}: {str(e)}')
+        return []
+
+
 def load_db(filename: str) -> Database:
     """
     Loads the database file
@@ -60,7 +215,8 @@ def load_db(filename: str) -> Database:
 
 def update_db(filename: str, db: Database) -> None:
     """
-    Updates the database file
+    Updates the database file. The file is written under a temporary name first and then renamed, so an interrupted
+    write never leaves a corrupted database behind.
 
     Args:
         filename: Path to the database JSON file
@@ -73,5 +229,9 @@ def update_db(filename: str, db: Database) -> None:
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-    with open(filename, 'w') as file:
+    temp_file = f'{filename}.tmp'
+    with open(temp_file, 'w') as file:
         json.dump(db, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, filename)
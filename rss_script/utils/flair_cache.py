@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class FlairTemplateCache:
+    """
+    Per-subreddit cache of the user selectable link flair templates, indexed by flair text, so a submission does not
+    need an extra Reddit API request to find its flair_id
+
+    Attributes
+    ----------
+    ttl : float
+        Number of seconds a subreddit's templates are cached before they are fetched again
+    templates : dict
+        Dictionary mapping each subreddit's name to a tuple of (fetch timestamp, dictionary of templates by flair text,
+        first editable template or None)
+    hits : int
+        Number of lookups answered from the cache
+    misses : int
+        Number of lookups that had to fetch the templates from Reddit
+    """
+
+    def __init__(self, ttl: float = 60 * 60) -> None:
+        """
+        Initializes the FlairTemplateCache object
+
+        Args:
+            ttl: Number of seconds a subreddit's templates are cached before they are fetched again
+        """
+        self.ttl = ttl
+        self.templates: dict[str, tuple[float, dict[str, dict], dict | None]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def find(self, subreddit, flair_text: str, refresh: bool = True) -> tuple[dict | None, dict | None]:
+        """
+        Finds the template to use for a flair text, fetching the subreddit's templates if they are not cached
+
+        Args:
+            subreddit: The praw Subreddit object
+            flair_text: The flair text to look up
+            refresh: (Optional) If False, expired templates are used instead of being fetched again. Templates that
+                were never fetched are always fetched
+
+        Returns:
+            A tuple of (template with the flair text, first editable template). Either can be None if there is no
+            such template
+        """
+        name = subreddit.display_name.lower()
+        cached = self.templates.get(name)
+        hit = bool(cached) and (not refresh or time.time() - cached[0] < self.ttl)
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            cached = self.warm(subreddit)
+        _, by_text, editable = cached
+        return by_text.get(flair_text), editable
+
+    def warm(self, subreddit) -> tuple[float, dict[str, dict], dict | None]:
+        """
+        Fetches and caches the user selectable link flair templates of a subreddit
+
+        Args:
+            subreddit: The praw Subreddit object
+
+        Returns:
+            The cache entry of the subreddit
+        """
+        by_text: dict[str, dict] = {}
+        editable = None
+        for template in subreddit.flair.link_templates.user_selectable():
+            # Keep the first template with each text, like the previous linear search did
+            by_text.setdefault(template['flair_text'], template)
+            if editable is None and template['flair_text_editable']:
+                editable = template
+        entry = (time.time(), by_text, editable)
+        self.templates[subreddit.display_name.lower()] = entry
+        return entry
+
+    def invalidate(self, sub_name: str) -> None:
+        """Removes a subreddit's templates from the cache so they are fetched again on the next lookup"""
+        self.templates.pop(sub_name.lower(), None)
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of cache hits and misses"""
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,81 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from ..types import Settings
+
+
+class ResponseTooLarge(Exception):
+    """Raised when a response body is larger than the configured maximum size"""
+
+
+class HttpClient:
+    """
+    Shared HTTP client used to make requests to the RSS feeds. Connections are kept alive and pooled per host, requests
+    time out instead of hanging, and 429/5xx responses are retried with bounded exponential backoff that honors the
+    Retry-After header.
+
+    Attributes
+    ----------
+    session : requests.Session
+        Session holding the connection pools
+    timeout : tuple[float, float]
+        Connect and read timeouts in seconds
+    max_bytes : int
+        Maximum size of a (decompressed) response body in bytes
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, settings: Settings, user_agent: str) -> None:
+        """
+        Initializes the HttpClient object
+
+        Args:
+            settings: Tuning settings containing the timeouts, retry, pool and body size limits
+            user_agent: String used to identify the browser when making requests
+        """
+        self.timeout = (settings['fetch_connect_timeout'], settings['fetch_timeout'])
+        self.max_bytes = settings['fetch_max_bytes']
+        retry = Retry(total=settings['fetch_retries'], status_forcelist=self.RETRY_STATUSES,
+                      allowed_methods=frozenset(['GET', 'HEAD']), backoff_factor=settings['fetch_backoff'],
+                      backoff_max=settings['fetch_backoff_max'], retry_after_max=int(settings['fetch_backoff_max']),
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=settings['fetch_workers'], pool_maxsize=settings['fetch_per_host'],
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # urllib3 only advertises brotli/zstd when the optional decoders are installed
+        self.session.headers.update({'User-Agent': user_agent, 'Accept-Encoding': ACCEPT_ENCODING})
+
+    def get(self, url: str, headers: dict[str, str | None] | None = None) -> requests.Response:
+        """
+        Makes a GET request and reads the body, stopping early if it grows past the maximum size
+
+        Args:
+            url: The url to request
+            headers: (Optional) Extra request headers. Headers with a value of None are not sent
+
+        Returns:
+            The response, with its body already read into memory
+
+        Raises:
+            ResponseTooLarge: If the body is larger than the maximum size
+            requests.RequestException: If the request fails after all retries
+        """
+        headers = {k: v for k, v in (headers or {}).items() if v is not None}
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+            length = resp.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                raise ResponseTooLarge(f"{url} declared a body of {length} bytes (limit {self.max_bytes})")
+            chunks = []
+            size = 0
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise ResponseTooLarge(f"{url} sent more than {self.max_bytes} bytes")
+                chunks.append(chunk)
+            resp._content = b''.join(chunks)
+            return resp
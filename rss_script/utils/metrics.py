@@ -0,0 +1,190 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+PREFIX = 'rss2reddit_'
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SAMPLE_SIZE = 1024  # Number of recent durations kept per timer to compute the percentiles of the JSON dump
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class _Histogram:
+    """Bucket counts, sum and recent samples of the durations observed by one timer"""
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples: deque[float] = deque(maxlen=SAMPLE_SIZE)
+
+    def observe(self, seconds: float) -> None:
+        """Adds a duration to the histogram"""
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the duration below which the fraction of the recent samples fall"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value for the Prometheus text format"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    """Formats labels as {name="value",...}, or an empty string if there are none"""
+    pairs = labels + extra
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+class Metrics:
+    """
+    Thread-safe counters and timers of the bot's work, which can be served in the Prometheus text format and dumped
+    as JSON
+
+    Attributes
+    ----------
+    counters : dict
+        Dictionary mapping each counter's name to a dictionary of its value per set of labels
+    timers : dict
+        Dictionary mapping each timer's name to a dictionary of its histogram per set of labels
+    started_at : float
+        Timestamp of when the metrics started being collected
+    """
+
+    def __init__(self) -> None:
+        """Initializes the Metrics object"""
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.timers: dict[str, dict[Labels, _Histogram]] = {}
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self.server: ThreadingHTTPServer | None = None
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Increases a counter
+
+        Args:
+            name: Name of the counter, without the rss2reddit_ prefix
+            value: (Optional) Amount to increase the counter by
+            **labels: Labels of the counter, such as subreddit or status
+        """
+        key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """
+        Records a duration in a timer
+
+        Args:
+            name: Name of the timer, without the rss2reddit_ prefix
+            seconds: The duration in seconds
+            **labels: Labels of the timer, such as stage
+        """
+        key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+        with self.lock:
+            self.timers.setdefault(name, {}).setdefault(key, _Histogram()).observe(seconds)
+
+    @contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        """Context manager that records how long its body took in a timer, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """Returns every counter and timer in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self.timers.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ('+Inf',), histogram.buckets):
+                        cumulative += count
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', str(bound)),))} "
+                                     f"{cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> dict:
+        """Returns every counter and timer as a JSON serializable dictionary, with the percentiles of each timer"""
+        with self.lock:
+            return {
+                'started_at': self.started_at,
+                'uptime': time.time() - self.started_at,
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for name, series in sorted(self.counters.items())
+                             for labels, value in sorted(series.items())],
+                'timers': [{'name': name, 'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum,
+                            'max': histogram.max, 'p50': histogram.percentile(0.5),
+                            'p99': histogram.percentile(0.99)}
+                           for name, series in sorted(self.timers.items())
+                           for labels, histogram in sorted(series.items())]
+            }
+
+    def dump(self, filename: str) -> None:
+        """
+        Writes the snapshot of the metrics to a JSON file
+
+        Args:
+            filename: Absolute path to the JSON file
+        """
+        with open(filename, 'w') as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> None:
+        """
+        Serves the metrics on http://host:port/metrics from a background thread
+
+        Args:
+            port: Port to listen on
+            host: (Optional) Address to listen on. Only local connections are accepted by default
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split('?')[0] == '/metrics':
+                    body, content_type = metrics.render().encode(), 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path.split('?')[0] == '/metrics.json':
+                    body, content_type = json.dumps(metrics.snapshot()).encode(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                # Scrapes are too frequent to be worth logging
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
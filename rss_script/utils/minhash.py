@@ -0,0 +1,124 @@
+import re
+import zlib
+
+import numpy as np
+
+from .blocklist import normalize
+
+MERSENNE_PRIME = (1 << 31) - 1  # Modulus of the hash functions, which keeps their products within 64 bits
+
+
+def shingles(title: str, size: int = 1) -> set[int]:
+    """
+    Splits a title into the hashes of its shingles of consecutive words, after Unicode normalization, case folding and
+    removal of punctuation, so titles that differ by a few words or by their punctuation share most shingles
+
+    Args:
+        title: The title to split
+        size: (Optional) Number of words per shingle
+
+    Returns:
+        The set of 32-bit hashes of the shingles. A title with fewer words than size is a single shingle
+    """
+    words = re.findall(r'\w+', normalize(title))
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode())}
+    return {zlib.crc32(' '.join(words[start:start + size]).encode()) for start in range(len(words) - size + 1)}
+
+
+class MinHashLSH:
+    """
+    Locality-sensitive hashing index of titles, used to find the few indexed titles that could be near-duplicates of a
+    title before they are compared semantically. Each title gets a MinHash signature of its word shingles, and the
+    signature is cut into bands of rows. Titles that have the same rows in at least one band are candidates.
+
+    Two titles whose shingles have a Jaccard similarity of s are candidates with a probability of
+    1 - (1 - s^rows)^bands. More bands or fewer rows find more of the near-duplicates at the cost of more candidates to
+    compare, and the similarity at which half the pairs are found is about (1 / bands)^(1 / rows).
+
+    Attributes
+    ----------
+    bands : int
+        Number of bands of the signatures
+    rows : int
+        Number of hash values per band
+    shingle_size : int
+        Number of words per shingle
+    signatures : dict
+        Dictionary mapping each indexed key to its signature
+    """
+
+    def __init__(self, bands: int = 32, rows: int = 2, shingle_size: int = 1, seed: int = 0) -> None:
+        """
+        Initializes the MinHashLSH object
+
+        Args:
+            bands: (Optional) Number of bands of the signatures
+            rows: (Optional) Number of hash values per band
+            shingle_size: (Optional) Number of words per shingle
+            seed: (Optional) Seed of the hash functions. Signatures are only comparable with the same seed
+        """
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, bands * rows, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, bands * rows, dtype=np.uint64)
+        self.signatures: dict[str, np.ndarray] = {}
+        self._buckets: list[dict[bytes, set[str]]] = [{} for _ in range(bands)]
+
+    def signature(self, title: str) -> np.ndarray:
+        """Returns the MinHash signature of a title, with bands * rows values"""
+        hashes = np.fromiter(shingles(title, self.shingle_size), dtype=np.uint64)
+        return ((np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, key: str, title: str) -> None:
+        """
+        Indexes a title, replacing the title previously indexed under the same key
+
+        Args:
+            key: Unique key of the title, such as the fullname of the post
+            title: The title to index
+        """
+        self.remove(key)
+        signature = self.signature(title)
+        self.signatures[key] = signature
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        """Removes a title from the index, if it is indexed"""
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del buckets[band_key]
+
+    def query(self, title: str) -> set[str]:
+        """
+        Finds the indexed titles that could be near-duplicates of a title
+
+        Args:
+            title: The title to look up
+
+        Returns:
+            The keys of the candidate titles
+        """
+        candidates: set[str] = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(self.signature(title))):
+            candidates.update(buckets.get(band_key, ()))
+        return candidates
+
+    def clear(self) -> None:
+        """Removes every title from the index"""
+        self.signatures = {}
+        self._buckets = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
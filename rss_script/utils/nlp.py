@@ -1,10 +1,104 @@
-import spacy
+import hashlib
+import os
+import re
+import sys
+from threading import Lock
 
-try:
-    nlp = spacy.load("en_core_web_md")
-except OSError:  # If not present, download
-    spacy.cli.download("en_core_web_md")
-    nlp = spacy.load("en_core_web_md")
+import numpy as np
+
+# Pipeline components that are not needed to compute word vectors, excluded when loading the spaCy model
+UNUSED_COMPONENTS = ["tok2vec", "tagger", "morphologizer", "parser", "senter", "attribute_ruler", "lemmatizer", "ner"]
+TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)?|[^\w\s]")
+
+_backend = "spacy"
+_model = "en_core_web_md"
+_vectors_dir: str | None = None
+_engine = None
+_engine_lock = Lock()
+
+
+class SpacyVectors:
+    """Sentence vectors from a spaCy model loaded with only its tokenizer and static word vectors"""
+
+    def __init__(self, model: str) -> None:
+        """Loads the spaCy model, downloading it if it is not installed"""
+        import spacy
+        try:
+            self.nlp = spacy.load(model, exclude=UNUSED_COMPONENTS)
+        except OSError:  # If not present, download
+            spacy.cli.download(model)
+            self.nlp = spacy.load(model, exclude=UNUSED_COMPONENTS)
+
+    def get_vectors(self, sentences: list[str]) -> np.ndarray:
+        """Returns the average word vector of each sentence"""
+        vectors = [doc.vector for doc in self.nlp.pipe(sentences)]
+        return np.array(vectors, dtype=np.float32).reshape(len(sentences), -1)
+
+
+class StaticVectors:
+    """
+    Sentence vectors from memory-mapped word vector files created by export_static_vectors. Only the pages of the files
+    that are actually looked up are loaded into memory, so the memory footprint stays small and fixed.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Memory-maps the keys, rows and vectors files in the directory"""
+        self.keys = np.load(os.path.join(directory, "keys.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(directory, "rows.npy"), mmap_mode="r")
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+
+    def _row(self, word: str) -> int | None:
+        """Returns the row of the word's vector, trying the lowercase word if the word itself has no vector"""
+        for candidate in (word, word.lower()):
+            key = _word_key(candidate)
+            index = int(np.searchsorted(self.keys, key))
+            if index < len(self.keys) and self.keys[index] == key:
+                return int(self.rows[index])
+        return None
+
+    def get_vectors(self, sentences: list[str]) -> np.ndarray:
+        """Returns the average word vector of each sentence"""
+        result = np.zeros((len(sentences), self.vectors.shape[1]), dtype=np.float32)
+        for i, sentence in enumerate(sentences):
+            tokens = TOKEN_PATTERN.findall(sentence)
+            rows = [row for row in map(self._row, tokens) if row is not None]
+            # Like spaCy, words without a vector count as zero vectors in the average
+            if rows:
+                result[i] = self.vectors[sorted(rows)].sum(axis=0) / len(tokens)
+        return result
+
+
+def _word_key(word: str) -> np.uint64:
+    """Returns the stable 64-bit hash used to look up a word in the static vector files"""
+    return np.uint64(int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little"))
+
+
+def configure_similarity(backend: str = "spacy", model: str = "en_core_web_md",
+                         vectors_dir: str | None = None) -> None:
+    """
+    Selects the engine used to compute sentence vectors. The engine is loaded the first time it is used.
+
+    Args:
+        backend: "spacy" to use a spaCy model, or "static" to use memory-mapped vector files
+        model: Name of the spaCy model, used by the spacy backend
+        vectors_dir: Directory containing the files made by export_static_vectors, used by the static backend
+    """
+    global _backend, _model, _vectors_dir, _engine
+    if backend not in ("spacy", "static"):
+        raise ValueError(f"Unknown similarity backend: {backend}")
+    if backend == "static" and not vectors_dir:
+        raise ValueError("The static similarity backend needs a vectors directory")
+    with _engine_lock:
+        _backend, _model, _vectors_dir, _engine = backend, model, vectors_dir, None
+
+
+def _get_engine() -> SpacyVectors | StaticVectors:
+    """Returns the configured engine, loading it on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = StaticVectors(_vectors_dir) if _backend == "static" else SpacyVectors(_model)
+        return _engine
 
 
 def get_similarity(sentence1: str, sentence2: str) -> float:
@@ -18,6 +112,48 @@ def get_similarity(sentence1: str, sentence2: str) -> float:
     Returns:
         The similarity between the two sentences
     """
-    doc1 = nlp(sentence1)
-    doc2 = nlp(sentence2)
-    return doc1.similarity(doc2)
+    if sentence1 == sentence2:
+        return 1.0
+    vector1, vector2 = get_vectors([sentence1, sentence2])
+    norm = np.linalg.norm(vector1) * np.linalg.norm(vector2)
+    return float(vector1 @ vector2 / norm) if norm > 0 else 0.0
+
+
+def get_vectors(sentences: list[str]) -> np.ndarray:
+    """
+    Calculates the vector of each sentence, which is the average of its word vectors
+
+    Args:
+        sentences: The sentences to be converted to vectors
+
+    Returns:
+        A 2D float32 array with one row per sentence
+    """
+    return _get_engine().get_vectors(sentences)
+
+
+def export_static_vectors(model: str, directory: str) -> None:
+    """
+    Exports the word vectors of a spaCy model to the memory-mappable files used by the static backend
+
+    Args:
+        model: Name of the spaCy model to export
+        directory: Directory to write keys.npy, rows.npy and vectors.npy to
+    """
+    import spacy
+    vocab = spacy.load(model, exclude=UNUSED_COMPONENTS).vocab
+    keys, rows = [], []
+    for key, row in vocab.vectors.key2row.items():
+        if key in vocab.strings:
+            keys.append(_word_key(vocab.strings[key]))
+            rows.append(row)
+    order = np.argsort(np.array(keys, dtype=np.uint64))
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "keys.npy"), np.array(keys, dtype=np.uint64)[order])
+    np.save(os.path.join(directory, "rows.npy"), np.array(rows, dtype=np.uint32)[order])
+    np.save(os.path.join(directory, "vectors.npy"), np.asarray(vocab.vectors.data, dtype=np.float32))
+
+
+if __name__ == "__main__":
+    # Usage: python -m rss_script.utils.nlp OUTPUT_DIRECTORY [MODEL]
+    export_static_vectors(sys.argv[2] if len(sys.argv) > 2 else _model, sys.argv[1])
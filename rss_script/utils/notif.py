@@ -1,31 +1,151 @@
 import os
-from discordwebhook import Discord
+import queue
+import random
+import threading
+import time
+from enum import IntEnum
+
+import requests
 from dotenv import load_dotenv
 
 # Load the webhook url from the .env file
 load_dotenv()
 webhook_url = os.getenv('DISCORD_WEBHOOK_URL')
 
-# Create the discord object
-discord = Discord(url=webhook_url)
+MAX_CONTENT_LENGTH = 2000  # Discord's limit for the content of one message
+QUEUE_SIZE = 500
+BATCH_WINDOW = 2.0  # Seconds to wait for more messages to coalesce into the same post
+LOW_PRIORITY_SAMPLE_RATE = 0.25  # Fraction of low priority messages kept when the queue is more than half full
+
+
+class Priority(IntEnum):
+    LOW = 0  # Duplicate and blocklist notices, which can be sampled or dropped under backpressure
+    NORMAL = 1  # New posts
+    HIGH = 2  # Bot status messages, which are never sampled
+
 
+_queue: queue.Queue[str] = queue.Queue(maxsize=QUEUE_SIZE)
+_worker: threading.Thread | None = None
+_worker_lock = threading.Lock()
 
-def send_discord_message(message: str) -> None:
+
+def send_discord_message(message: str, priority: Priority = Priority.NORMAL) -> None:
     """
-    Sends a message to the discord webhook url
+    Queues a message to be sent to the discord webhook url by a background worker, without waiting for Discord.
+    Queued messages are coalesced into as few posts as possible.
 
     Args:
         message: The message to be sent to the discord webhook url
+        priority: (Optional) Priority of the message. Low priority messages are sampled when the queue is filling up
+            and dropped when it is full
 
     Returns:
         None
     """
     # Check if the webhook url is specified
-    if webhook_url:
+    if not webhook_url:
+        print("No webhook url found, skipping discord message")
+        return
+    _start_worker()
+    if priority == Priority.LOW and _queue.qsize() > QUEUE_SIZE // 2 and random.random() > LOW_PRIORITY_SAMPLE_RATE:
+        print("Discord queue is busy, dropped a low priority message")
+        return
+    try:
+        # Only higher priority messages wait for space in a full queue
+        _queue.put(message, block=priority > Priority.LOW, timeout=1)
+    except queue.Full:
+        print("Discord queue is full, dropped a message")
+
+
+def flush_discord_messages(timeout: float) -> None:
+    """
+    Waits until every queued message has been sent, or until the timeout has passed
+
+    Args:
+        timeout: Maximum number of seconds to wait
+
+    Returns:
+        None
+    """
+    if _worker is None:
+        return
+    deadline = time.time() + timeout
+    with _queue.all_tasks_done:
+        while _queue.unfinished_tasks and deadline > time.time():
+            _queue.all_tasks_done.wait(deadline - time.time())
+    if _queue.unfinished_tasks:
+        print(f"Gave up on {_queue.unfinished_tasks} discord messages")
+
+
+def _start_worker() -> None:
+    """Starts the background worker thread if it is not running"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name="discord-notifications", daemon=True)
+            _worker.start()
+
+
+def _run_worker() -> None:
+    """Takes messages off the queue, coalesces them into batches and posts them to the webhook"""
+    session = requests.Session()
+    while True:
+        messages = [_queue.get()]
+        length = len(messages[0])
+        deadline = time.time() + BATCH_WINDOW
+        # Keep adding messages while they fit into one post
+        while length < MAX_CONTENT_LENGTH and deadline > time.time():
+            try:
+                message = _queue.get(timeout=deadline - time.time())
+            except queue.Empty:
+                break
+            messages.append(message)
+            length += len(message) + 1
+        try:
+            for content in _batch(messages):
+                _post(session, content)
+        finally:
+            for _ in messages:
+                _queue.task_done()
+
+
+def _batch(messages: list[str]) -> list[str]:
+    """Joins the messages with newlines into contents no longer than MAX_CONTENT_LENGTH, truncating long messages"""
+    contents = []
+    for message in messages:
+        message = message if len(message) <= MAX_CONTENT_LENGTH else message[:MAX_CONTENT_LENGTH - 3] + "..."
+        if contents and len(contents[-1]) + 1 + len(message) <= MAX_CONTENT_LENGTH:
+            contents[-1] += "\n" + message
+        else:
+            contents.append(message)
+    return contents
+
+
+def _retry_after(resp: requests.Response) -> float:
+    """Returns the number of seconds Discord asked to wait, from the retry_after field or the Retry-After header"""
+    try:
+        return float(resp.json()['retry_after'])
+    except (ValueError, KeyError, TypeError):
         try:
-            discord.post(content=message)
+            return float(resp.headers.get('Retry-After', 1))
+        except ValueError:
+            return 1.0
+
+
+def _post(session: requests.Session, content: str) -> None:
+    """Posts one message to the webhook, waiting and retrying when Discord rate limits the webhook"""
+    for _ in range(5):
+        try:
+            resp = session.post(webhook_url, json={'content': content}, timeout=10)
+            if resp.status_code == 429:
+                retry_after = _retry_after(resp)
+                print(f"Discord rate limit reached, retrying in {retry_after}s")
+                time.sleep(retry_after)
+                continue
+            resp.raise_for_status()
             print("Sent discord notification")
+            return
         except Exception as e:
             print(f"Error sending discord notification: {str(e)}")
-    else:
-        print("No webhook url found, skipping discord message")
+            return
+    print("Gave up sending discord notification after being rate limited")
@@ -0,0 +1,135 @@
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping
+
+from ..types import FeedState, PollStats
+
+MAX_AGE_PATTERN = re.compile(r'(?:^|[,\s])max-age\s*=\s*"?(\d+)', re.IGNORECASE)
+
+
+class AdaptivePoller:
+    """
+    Learns how often each RSS feed publishes and picks when to request it next. The seconds between new stories are
+    averaged with an exponentially weighted moving average, and the feed is requested about twice per expected story,
+    within the configured bounds. Feeds that have not published for longer than usual are requested less often, and
+    the caching hints of the feed (Cache-Control max-age, Expires, <ttl> and <skipHours>) are honored.
+
+    Attributes
+    ----------
+    min_interval : float
+        Minimum number of seconds between two requests to a feed
+    max_interval : float
+        Maximum number of seconds between two requests to a feed
+    default_interval : float
+        Number of seconds between requests to a feed that has not published a new story yet, within the bounds
+    """
+
+    ALPHA = 0.3  # Weight of the latest time between stories in the moving average
+    HISTORY_SIZE = 20  # Number of publish timestamps kept per feed
+
+    def __init__(self, min_interval: float = 5 * 60, max_interval: float = 4 * 60 * 60,
+                 default_interval: float = 30 * 60) -> None:
+        """
+        Initializes the AdaptivePoller object
+
+        Args:
+            min_interval: Minimum number of seconds between two requests to a feed
+            max_interval: Maximum number of seconds between two requests to a feed
+            default_interval: Number of seconds between requests to a feed that has not published a new story yet
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.default_interval = default_interval
+
+    def stats(self, source: FeedState) -> PollStats:
+        """Returns the polling statistics of a feed, adding empty ones if the feed has none yet"""
+        if 'poll' not in source:
+            source['poll'] = PollStats(first_seen=time.time(), published=[], interval=None, not_before=0, ttl=None,
+                                       skip_hours=[])
+        # Response statuses were recorded by earlier versions but never used
+        source['poll'].pop('statuses', None)
+        return source['poll']
+
+    def record_response(self, source: FeedState, headers: Mapping[str, str]) -> None:
+        """
+        Records the earliest time the headers of a response from the feed allow the next request at
+
+        Args:
+            source: Shared state of the RSS feed
+            headers: Headers of the response
+        """
+        stats = self.stats(source)
+        now = time.time()
+        # Only the caching headers of the latest response apply
+        stats['not_before'] = 0
+        max_age = MAX_AGE_PATTERN.search(headers.get('Cache-Control', ''))
+        if max_age:
+            age = headers.get('Age', '0')
+            self._not_before(stats, now + int(max_age.group(1)) - (int(age) if age.isdigit() else 0))
+        elif headers.get('Expires'):
+            try:
+                self._not_before(stats, parsedate_to_datetime(headers['Expires']).timestamp())
+            except (TypeError, ValueError):
+                pass
+
+    def record_hints(self, source: FeedState, ttl: int | None, skip_hours: list[int]) -> None:
+        """
+        Records the polling hints read from the feed's channel
+
+        Args:
+            source: Shared state of the RSS feed
+            ttl: Number of minutes the channel can be cached, or None if it does not say
+            skip_hours: GMT hours during which the channel should not be requested
+        """
+        stats = self.stats(source)
+        stats['ttl'] = ttl
+        stats['skip_hours'] = skip_hours
+
+    def record_stories(self, source: FeedState, count: int) -> None:
+        """
+        Records that new stories were found in the feed, and updates the average time between stories. The stories
+        are assumed to have been published evenly since the previous story was found.
+
+        Args:
+            source: Shared state of the RSS feed
+            count: Number of new stories found
+        """
+        stats = self.stats(source)
+        now = time.time()
+        previous = stats['published'][-1] if stats['published'] else stats['first_seen']
+        gap = max(now - previous, 0) / count
+        for _ in range(count):
+            stats['interval'] = gap if stats['interval'] is None else \
+                self.ALPHA * gap + (1 - self.ALPHA) * stats['interval']
+        stats['published'] = (stats['published'] + [now])[-self.HISTORY_SIZE:]
+
+    def next_poll(self, source: FeedState) -> int:
+        """
+        Computes when the feed should be requested next
+
+        Args:
+            source: Shared state of the RSS feed
+
+        Returns:
+            Timestamp of the next request to the feed
+        """
+        stats = self.stats(source)
+        now = time.time()
+        if stats['interval'] is None:
+            # Feeds that never published since they were added slow down to the maximum interval after a while
+            interval = max(self.default_interval, (now - stats['first_seen']) / 2)
+        else:
+            since_last = now - stats['published'][-1]
+            interval = max(stats['interval'], since_last) / 2
+        if stats['ttl']:
+            interval = max(interval, stats['ttl'] * 60)
+        next_time = max(now + min(max(interval, self.min_interval), self.max_interval), stats['not_before'])
+        # Moves the request out of the skipped hours, unless the feed skips every hour
+        while len(set(stats['skip_hours'])) < 24 and time.gmtime(next_time).tm_hour in stats['skip_hours']:
+            next_time = (next_time // 3600 + 1) * 3600
+        return int(next_time)
+
+    def _not_before(self, stats: PollStats, timestamp: float) -> None:
+        """Delays the next request to the timestamp, but no more than max_interval from now"""
+        stats['not_before'] = max(stats['not_before'], min(timestamp, time.time() + self.max_interval))
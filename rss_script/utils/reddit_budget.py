@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+
+from .reddit_clients import RedditClients
+
+
+class RedditBudget:
+    """
+    Tracks the Reddit API quota from the X-Ratelimit headers that praw records on every response, and decides which
+    requests can be made now. Submissions are always allowed, while flair lookups and duplicate-check listings are
+    deferred when the remaining quota drops below their reserve, so praw never has to sleep until the quota resets
+    in the middle of a cycle.
+
+    Attributes
+    ----------
+    clients : RedditClients
+        Pool of the praw Reddit objects whose shared rate limit is tracked
+    reserves : dict
+        Dictionary mapping each kind of request to the number of requests that must remain in the current window for
+        that kind of request to be made
+    usage : dict
+        Dictionary mapping each subreddit's name to a dictionary of the number of requests made per kind of request
+    deferred : dict
+        Dictionary mapping each subreddit's name to a dictionary of the number of requests deferred per kind of request
+    """
+
+    SUBMIT = 'submit'
+    FLAIR = 'flair'
+    LISTING = 'listing'
+
+    def __init__(self, clients: RedditClients, listing_reserve: float = 100, flair_reserve: float = 20) -> None:
+        """
+        Initializes the RedditBudget object
+
+        Args:
+            clients: Pool of the praw Reddit objects whose shared rate limit is tracked
+            listing_reserve: Number of requests kept for submissions and flair lookups before listings are deferred
+            flair_reserve: Number of requests kept for submissions before flair lookups are deferred
+        """
+        self.clients = clients
+        self.reserves = {self.SUBMIT: 0, self.FLAIR: flair_reserve, self.LISTING: listing_reserve}
+        self.usage: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.deferred: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+
+    def limits(self) -> tuple[float | None, float | None, int | None]:
+        """Returns the (remaining, reset timestamp, used) values of the last response, all None before any request"""
+        limits = self.clients.limits()
+        return limits['remaining'], limits['reset_timestamp'], limits['used']
+
+    def allows(self, kind: str, sub_name: str | None = None) -> bool:
+        """
+        Checks if a request can be made without eating into the quota reserved for higher priority requests
+
+        Args:
+            kind: The kind of request, one of SUBMIT, FLAIR or LISTING
+            sub_name: (Optional) The name of the subreddit the request is for, used to count deferred requests
+
+        Returns:
+            True if the request can be made now, False if it should be deferred
+        """
+        remaining, reset_timestamp, _ = self.limits()
+        # Nothing is known before the first response, and the quota is refilled once the window has reset
+        if remaining is None or reset_timestamp is None or reset_timestamp <= time.time():
+            return True
+        if remaining > self.reserves[kind]:
+            return True
+        if sub_name:
+            with self.lock:
+                self.deferred[sub_name][kind] += 1
+        return False
+
+    @contextmanager
+    def track(self, sub_name: str, kind: str) -> Iterator[None]:
+        """
+        Context manager that counts the requests made inside it towards a subreddit's usage, from the change in the
+        number of used requests reported by Reddit. Requests made at the same time for other subreddits can be
+        counted too, so the usage per subreddit is approximate when several subreddits are handled at once
+
+        Args:
+            sub_name: The name of the subreddit the requests are for
+            kind: The kind of request, one of SUBMIT, FLAIR or LISTING
+        """
+        _, _, used_before = self.limits()
+        try:
+            yield
+        finally:
+            _, _, used_after = self.limits()
+            if used_after is not None:
+                # The used count starts again from zero when a new window begins
+                if used_before is None or used_after < used_before:
+                    used_before = 0
+                if used_after > used_before:
+                    with self.lock:
+                        self.usage[sub_name][kind] += used_after - used_before
+
+    def report(self) -> str:
+        """Returns a summary of the remaining quota and the requests made and deferred per subreddit"""
+        remaining, reset_timestamp, used = self.limits()
+        if remaining is None:
+            lines = ["Reddit quota: unknown"]
+        else:
+            reset_in = max(0, int(reset_timestamp - time.time()))
+            lines = [f"Reddit quota: {remaining:.0f} remaining, {used} used, resets in {reset_in}s"]
+        for sub_name in sorted(set(self.usage) | set(self.deferred)):
+            used_text = ", ".join(f"{kind} {count}" for kind, count in sorted(self.usage[sub_name].items()))
+            deferred_text = ", ".join(f"{kind} {count}" for kind, count in sorted(self.deferred[sub_name].items()))
+            lines.append(f"  r/{sub_name}: used {used_text or 'nothing'}"
+                         + (f", deferred {deferred_text}" if deferred_text else ""))
+        return "\n".join(lines)
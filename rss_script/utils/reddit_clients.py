@@ -0,0 +1,79 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+class RedditClients:
+    """
+    Pool of praw Reddit objects, so subreddits handled at the same time never share one. praw's Reddit objects, their
+    requests session and prawcore's rate limiter are not thread-safe, so every lane of Reddit work leases its own Reddit
+    object for the duration of a task. Reddit objects are reused by later tasks, so each one only logs in once, and
+    at most one Reddit object per concurrent lane is ever created.
+
+    Attributes
+    ----------
+    factory : Callable
+        Function that creates a new praw Reddit object
+    clients : list
+        Every Reddit object created, the first one being used by the main thread outside of leases
+    """
+
+    def __init__(self, factory: Callable[[], object]) -> None:
+        """
+        Initializes the RedditClients object, creating the first Reddit object
+
+        Args:
+            factory: Function that creates a new praw Reddit object. It may return the same object every time if that
+                object is thread-safe, such as a local stand-in for benchmarks
+        """
+        self.factory = factory
+        self.clients = [factory()]
+        self._idle = list(self.clients)
+        self._local = threading.local()
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Returns the Reddit object leased by the current thread, or the first Reddit object if it leased none"""
+        return getattr(self._local, 'client', None) or self.clients[0]
+
+    @contextmanager
+    def lease(self) -> Iterator[object]:
+        """
+        Context manager that leases an idle Reddit object to the current thread, creating one if every Reddit object is
+        leased. Inside it, get() returns the leased Reddit object. Nested leases reuse the outer one
+        """
+        client = getattr(self._local, 'client', None)
+        if client is not None:
+            yield client
+            return
+        with self.lock:
+            client = self._idle.pop() if self._idle else None
+        if client is None:
+            client = self.factory()
+            with self.lock:
+                if all(client is not other for other in self.clients):
+                    self.clients.append(client)
+        self._local.client = client
+        try:
+            yield client
+        finally:
+            self._local.client = None
+            with self.lock:
+                self._idle.append(client)
+
+    def limits(self) -> dict:
+        """
+        Returns the rate limit information of the Reddit object that received the latest response, which is the one
+        with the most requests used in the current window, since every Reddit object shares the account's quota
+
+        Returns:
+            Dictionary of remaining, reset_timestamp and used, like praw's auth.limits
+        """
+        with self.lock:
+            limits = [dict(client.auth.limits) for client in self.clients]
+        now = time.time()
+        current = [limit for limit in limits if limit['reset_timestamp'] and limit['reset_timestamp'] > now]
+        if current:
+            return max(current, key=lambda limit: limit['used'] or 0)
+        return max(limits, key=lambda limit: limit['reset_timestamp'] or 0)
@@ -1,25 +1,207 @@
-from bs4 import BeautifulSoup
-from pprint import pformat
+from typing import Iterator
 
+from lxml import etree
 
-def find_newest_headline(xml_data) -> tuple[str, str, str] | tuple[None, None, None]:
+ITEM_TAGS = ('item', 'entry')  # RSS <item> and Atom <entry>
+CHUNK_SIZE = 16 * 1024
+
+
+def _local_name(element: etree._Element) -> str:
+    """Returns the tag of the element without its namespace"""
+    return etree.QName(element).localname if isinstance(element.tag, str) else ''
+
+
+def _child(item: etree._Element, name: str) -> etree._Element | None:
+    """Returns the first direct child of the item with the given tag, ignoring namespaces"""
+    return next((child for child in item if _local_name(child) == name), None)
+
+
+def _text(element: etree._Element | None) -> str:
+    """Returns all the text inside the element, or an empty string if there is no element"""
+    return ''.join(element.itertext()).strip() if element is not None else ''
+
+
+def _atom_link(item: etree._Element) -> str:
+    """Returns the href of the alternate <link> of an Atom entry, falling back to the first <link> with an href"""
+    links = [child for child in item if _local_name(child) == 'link' and child.get('href')]
+    alternate = next((link for link in links if link.get('rel', 'alternate') == 'alternate'), None)
+    return (alternate if alternate is not None else links[0]).get('href').strip() if links else ''
+
+
+def _parse_item(item: etree._Element) -> tuple[str, str, str]:
     """
-    Parses the XML data and returns the title, link, and guid of the newest headline
+    Reads the title, link, and guid of an RSS <item> or Atom <entry>
 
     Args:
-        xml_data: XML data from the RSS feed to be parsed by BeautifulSoup
+        item: The fully parsed item element
 
     Returns:
-        A tuple of (title, link, guid) of the newest headline found in the XMl data
+        A tuple of (title, link, guid). The guid falls back to the link if the item has no guid or id
+    """
+    title = _text(_child(item, 'title'))
+    link = _text(_child(item, 'link')) or _atom_link(item)
+    guid = _text(_child(item, 'guid')) or _text(_child(item, 'id')) or link
+    return title, link, guid
+
+
+def iter_headlines(xml_data: bytes | str, last_id: str | None = None) -> Iterator[tuple[str, str, str]]:
     """
-    soup = BeautifulSoup(xml_data, 'lxml-xml')
-    top_item = soup.find('item')
+    Parses the XML data incrementally and yields the title, link, and guid of each headline, newest first. Parsing
+    stops as soon as the <item> (RSS) or <entry> (Atom) with the last_id guid is reached, so the older part of the
+    document is never read.
+
+    Args:
+        xml_data: XML data from the RSS or Atom feed
+        last_id: (Optional) Guid of the newest headline already seen. It and the headlines after it are not yielded
+
+    Yields:
+        A tuple of (title, link, guid) for each headline newer than last_id
+
+    Raises:
+        ValueError: If a headline is missing a title or link, or if the feed has no headlines at all
+    """
+    parser = etree.XMLPullParser(events=('end',), recover=True, resolve_entities=False)
+    found = False
+    for start in range(0, len(xml_data), CHUNK_SIZE):
+        parser.feed(xml_data[start:start + CHUNK_SIZE])
+        for _, element in parser.read_events():
+            if _local_name(element) in ITEM_TAGS:
+                found = True
+                title, link, guid = _parse_item(element)
+                if guid == last_id:
+                    return
+                if not title or not link:
+                    raise ValueError(f"<{_local_name(element)}> is missing a title or link")
+                yield title, link, guid
+                # Frees the finished item, since the whole document may be read
+                element.clear()
+    if not found:
+        raise ValueError("No <item> or <entry> found")
+
+
+def find_new_headlines(xml_data: bytes | str, last_id: str | None, limit: int) -> list[tuple[str, str, str]] | None:
+    """
+    Returns the headlines newer than last_id, newest first
+
+    Args:
+        xml_data: XML data from the RSS or Atom feed
+        last_id: Guid of the newest headline already seen, or None if no headline was seen yet
+        limit: Maximum number of headlines to return
+
+    Returns:
+        A list of (title, link, guid) tuples of at most limit headlines. It is empty if there is no new headline, and
+        None if the feed could not be parsed before any headline was found
+    """
+    headlines = []
     try:
-        title: str = top_item.title.get_text()
-        link: str = top_item.link.get_text()
-        guid: str = top_item.guid.get_text() if top_item.guid.get_text() != "" else link
-        return title, link, guid
+        for headline in iter_headlines(xml_data, last_id):
+            headlines.append(headline)
+            if len(headlines) >= limit:
+                break
     except Exception as e:
         print(f"Error parsing RSS feed: {e}")
-        print(f"XML Data:\n{pformat(soup)}\n")
-        return None, None, None
+        print(f"XML Data:\n{xml_data[:500]!r}\n")
+        # The headlines found before the error are still used
+        return headlines or None
+    return headlines
+
+
+def headlines_since(items: list[tuple[str, str, str]], last_id: str | None,
+                    limit: int) -> list[tuple[str, str, str]]:
+    """
+    Picks the headlines published since the last one seen, newest first
+
+    Args:
+        items: The newest headlines of the feed, newest first
+        last_id: Guid of the last headline seen, or None if no headline was seen yet. Surrounding whitespace is ignored,
+            since older versions stored guids without stripping it
+        limit: Maximum number of headlines returned when last_id is not among the items, which happens when more
+            stories were published than the items hold, or when the last story seen was deleted or its guid changed
+
+    Returns:
+        The headlines newer than last_id, or the newest limit headlines if last_id is not among the items, or only the
+        newest headline if no headline was seen yet
+    """
+    last_id = (last_id or '').strip()
+    if not last_id:
+        return items[:1]
+    guids = [guid for _, _, guid in items]
+    return items[:guids.index(last_id)] if last_id in guids else items[:limit]
+
+
+def find_newest_headline(xml_data: bytes | str) -> tuple[str, str, str] | tuple[None, None, None]:
+    """
+    Parses the XML data incrementally and returns the title, link, and guid of the newest headline. Parsing stops as
+    soon as the first <item> (RSS) or <entry> (Atom) is complete, so the rest of the document is never read.
+
+    Args:
+        xml_data: XML data from the RSS or Atom feed
+
+    Returns:
+        A tuple of (title, link, guid) of the newest headline found in the XML data
+    """
+    headlines = find_new_headlines(xml_data, None, 1)
+    return headlines[0] if headlines else (None, None, None)
+
+
+def read_feed_hints(xml_data: bytes | str) -> tuple[int | None, list[int]]:
+    """
+    Reads the polling hints of an RSS channel, which are the <ttl> and <skipHours> elements. Parsing stops at the
+    first <item> (RSS) or <entry> (Atom), so hints placed after the items are not read.
+
+    Args:
+        xml_data: XML data from the RSS or Atom feed
+
+    Returns:
+        A tuple of (number of minutes the channel can be cached or None, list of the GMT hours the channel should not
+        be requested in)
+    """
+    parser = etree.XMLPullParser(events=('end',), recover=True, resolve_entities=False)
+    ttl = None
+    skip_hours = []
+    try:
+        for start in range(0, len(xml_data), CHUNK_SIZE):
+            parser.feed(xml_data[start:start + CHUNK_SIZE])
+            for _, element in parser.read_events():
+                name = _local_name(element)
+                if name in ITEM_TAGS:
+                    return ttl, skip_hours
+                if name == 'ttl' and _text(element).isdigit():
+                    ttl = int(_text(element))
+                elif name == 'skipHours':
+                    skip_hours = [int(_text(hour)) for hour in element
+                                  if _local_name(hour) == 'hour' and _text(hour).isdigit() and int(_text(hour)) < 24]
+    except Exception as e:
+        print(f"Error reading the hints of the RSS feed: {e}")
+    return ttl, skip_hours
+
+
+def find_hub_links(xml_data: bytes | str) -> tuple[str | None, str | None]:
+    """
+    Reads the WebSub links of a feed, which are the <link rel="hub"> and <link rel="self"> elements of the RSS channel
+    (usually atom:link) or of the Atom feed. Parsing stops at the first <item> (RSS) or <entry> (Atom).
+
+    Args:
+        xml_data: XML data from the RSS or Atom feed
+
+    Returns:
+        A tuple of (url of the hub or None, url the feed is published under or None)
+    """
+    parser = etree.XMLPullParser(events=('end',), recover=True, resolve_entities=False)
+    hub = topic = None
+    try:
+        for start in range(0, len(xml_data), CHUNK_SIZE):
+            parser.feed(xml_data[start:start + CHUNK_SIZE])
+            for _, element in parser.read_events():
+                name = _local_name(element)
+                if name in ITEM_TAGS:
+                    return hub, topic
+                if name == 'link' and element.get('href'):
+                    rel = element.get('rel', '').split()
+                    if 'hub' in rel and hub is None:
+                        hub = element.get('href').strip()
+                    elif 'self' in rel and topic is None:
+                        topic = element.get('href').strip()
+    except Exception as e:
+        print(f"Error reading the WebSub links of the RSS feed: {e}")
+    return hub, topic
@@ -0,0 +1,79 @@
+import heapq
+import math
+import random
+
+
+class CycleScheduler:
+    """
+    Priority queue of the cycles of every subreddit, ordered by their update time. Only the cycles that are due are
+    popped, instead of rescanning every cycle on each wakeup. Rescheduling a cycle replaces its previous entry, which
+    is then skipped when it reaches the top of the heap.
+
+    Attributes
+    ----------
+    jitter : float
+        Maximum number of seconds of random delay added when a cycle is rescheduled, so cycles with the same interval
+        spread out instead of all firing in the same second
+    heap : list
+        Heap of (update_time, order, key) tuples
+    times : dict
+        Dictionary mapping each scheduled key to its current update time
+    """
+
+    def __init__(self, jitter: float = 0) -> None:
+        """
+        Initializes the CycleScheduler object
+
+        Args:
+            jitter: Maximum number of seconds of random delay added when a cycle is rescheduled
+        """
+        self.jitter = jitter
+        self.heap: list[tuple[float, tuple, tuple[str, int]]] = []
+        self.times: dict[tuple[str, int], float] = {}
+
+    def schedule(self, key: tuple[str, int], update_time: float, order: tuple = ()) -> None:
+        """
+        Schedules a cycle at the given time, replacing any previous time for it
+
+        Args:
+            key: (subreddit name, cycle index) of the cycle
+            update_time: Timestamp of when the cycle is due
+            order: Tie-breaker for cycles due at the same time, such as the cycle's position in the config
+        """
+        self.times[key] = update_time
+        heapq.heappush(self.heap, (update_time, order, key))
+
+    def add_jitter(self, update_time: float) -> float:
+        """Returns the update time delayed by a random number of seconds between 0 and jitter"""
+        if self.jitter <= 0 or math.isinf(update_time):
+            return update_time
+        return int(update_time + random.uniform(0, self.jitter))
+
+    def remove(self, key: tuple[str, int]) -> None:
+        """Unschedules a cycle. Its heap entry is discarded lazily"""
+        self.times.pop(key, None)
+
+    def pop_due(self, now: float) -> list[tuple[str, int]]:
+        """
+        Removes and returns every cycle whose update time has passed
+
+        Args:
+            now: The current timestamp
+
+        Returns:
+            List of (subreddit name, cycle index) keys, ordered by update time and then by order
+        """
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            update_time, _, key = heapq.heappop(self.heap)
+            # Skip entries that were replaced by a later call to schedule or removed
+            if self.times.get(key) == update_time:
+                del self.times[key]
+                due.append(key)
+        return due
+
+    def next_time(self) -> float:
+        """Returns the timestamp of the next due cycle, or math.inf if no cycle is scheduled"""
+        while self.heap and self.times.get(self.heap[0][2]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else math.inf
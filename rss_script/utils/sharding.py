@@ -0,0 +1,90 @@
+import bisect
+import hashlib
+import os
+
+from ..types import SubredditConfig
+
+
+def _hash(value: str) -> int:
+    """Returns a stable 64-bit hash of the value, which is the same in every process and on every machine"""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring that assigns subreddits to shards. Each shard owns many virtual points on the ring so the
+    subreddits are spread evenly, and changing the number of shards only moves the subreddits of the affected points.
+
+    Attributes
+    ----------
+    shard_count : int
+        Number of shards
+    points : list
+        Sorted hashes of the virtual points on the ring
+    owners : list
+        Shard index that owns the virtual point at the same position in points
+    """
+
+    def __init__(self, shard_count: int, replicas: int = 256) -> None:
+        """
+        Initializes the HashRing object
+
+        Args:
+            shard_count: Number of shards
+            replicas: Number of virtual points per shard
+        """
+        if shard_count < 1:
+            raise ValueError("The number of shards must be at least 1")
+        self.shard_count = shard_count
+        ring = sorted((_hash(f"shard-{shard}-{replica}"), shard)
+                      for shard in range(shard_count) for replica in range(replicas))
+        self.points = [point for point, _ in ring]
+        self.owners = [shard for _, shard in ring]
+
+    def shard_for(self, name: str) -> int:
+        """
+        Finds the shard that owns a subreddit
+
+        Args:
+            name: The name of the subreddit. Names are case-insensitive on Reddit, so they are lowercased
+
+        Returns:
+            The index of the shard that owns the subreddit
+        """
+        position = bisect.bisect(self.points, _hash(name.lower())) % len(self.points)
+        return self.owners[position]
+
+
+def filter_shard(sub_list: list[SubredditConfig], shard_index: int, shard_count: int) -> list[SubredditConfig]:
+    """
+    Keeps only the subreddits owned by a shard
+
+    Args:
+        sub_list: The subreddit configs from the config file
+        shard_index: Index of the shard, from 0 to shard_count - 1
+        shard_count: Number of shards
+
+    Returns:
+        The subreddit configs owned by the shard, in config order
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index {shard_index} is out of range for {shard_count} shards")
+    ring = HashRing(shard_count)
+    return [sub_info for sub_info in sub_list if ring.shard_for(sub_info['name']) == shard_index]
+
+
+def shard_path(path: str, shard: tuple[int, int] | None) -> str:
+    """
+    Adds the shard index to a file path, so every shard gets its own copy of the file
+
+    Args:
+        path: The path of the file
+        shard: (shard index, shard count), or None if the bot is not sharded
+
+    Returns:
+        The path with .shard-<index> inserted before the extension, or the path unchanged if there is no shard
+    """
+    if shard is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.shard-{shard[0]}{extension}"
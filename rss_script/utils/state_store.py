@@ -0,0 +1,370 @@
+import json
+import os
+import sqlite3
+
+from ..types import Database, Feeds, Hosts
+from .file_manager import load_db, update_db
+from .sharding import shard_path
+
+
+class StateStore:
+    """
+    Base class of the backends that persist the bot's database. Every backend loads and saves the same
+    types.Database dictionary, so the rest of the bot does not depend on how it is stored.
+    """
+
+    def load(self, subreddits: set[str] | None = None) -> Database:
+        """
+        Loads the database
+
+        Args:
+            subreddits: (Optional) Names of the subreddits to load. Other subreddits are neither loaded nor touched by
+                later saves, so several sharded bots can share one store
+
+        Returns:
+            The database
+        """
+        raise NotImplementedError
+
+    def save(self, db: Database) -> None:
+        """Persists the database"""
+        raise NotImplementedError
+
+    def load_feeds(self, urls: set[str] | None = None) -> Feeds:
+        """
+        Loads the state of the RSS feeds, which is shared by every subreddit that uses the feed
+
+        Args:
+            urls: (Optional) Urls of the feeds to load. Other feeds are neither loaded nor touched by later saves
+
+        Returns:
+            Dictionary mapping each feed's url to its state
+        """
+        raise NotImplementedError
+
+    def save_feeds(self, feeds: Feeds) -> None:
+        """Persists the state of the RSS feeds"""
+        raise NotImplementedError
+
+    def load_hosts(self, hosts: set[str] | None = None) -> Hosts:
+        """
+        Loads the health of the hosts serving the RSS feeds
+
+        Args:
+            hosts: (Optional) Names of the hosts to load. Other hosts are neither loaded nor touched by later saves
+
+        Returns:
+            Dictionary mapping each host's name to its health
+        """
+        raise NotImplementedError
+
+    def save_hosts(self, hosts: Hosts) -> None:
+        """Persists the health of the hosts serving the RSS feeds"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Releases any resources held by the backend"""
+
+
+class JsonStateStore(StateStore):
+    """
+    Stores the whole database in a single JSON file, which is rewritten on every save. The state of the RSS feeds and
+    the health of their hosts are stored in two more JSON files next to it.
+
+    Attributes
+    ----------
+    filename : str
+        The absolute path to the database JSON file
+    feeds_filename : str
+        The absolute path to the JSON file of the RSS feeds' state
+    hosts_filename : str
+        The absolute path to the JSON file of the hosts' health
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        root, extension = os.path.splitext(filename)
+        self.feeds_filename = f"{root}.feeds{extension}"
+        self.hosts_filename = f"{root}.hosts{extension}"
+
+    def load(self, subreddits: set[str] | None = None) -> Database:
+        db = load_db(self.filename)
+        return db if subreddits is None else {name: data for name, data in db.items() if name in subreddits}
+
+    def save(self, db: Database) -> None:
+        update_db(self.filename, db)
+
+    def load_feeds(self, urls: set[str] | None = None) -> Feeds:
+        if not os.path.exists(self.feeds_filename):
+            return {}
+        feeds = load_db(self.feeds_filename)
+        return feeds if urls is None else {url: state for url, state in feeds.items() if url in urls}
+
+    def save_feeds(self, feeds: Feeds) -> None:
+        update_db(self.feeds_filename, feeds)
+
+    def load_hosts(self, hosts: set[str] | None = None) -> Hosts:
+        if not os.path.exists(self.hosts_filename):
+            return {}
+        health = load_db(self.hosts_filename)
+        return health if hosts is None else {host: stats for host, stats in health.items() if host in hosts}
+
+    def save_hosts(self, hosts: Hosts) -> None:
+        update_db(self.hosts_filename, hosts)
+
+
+class SqliteStateStore(StateStore):
+    """
+    Stores the database in SQLite in WAL mode, with one row per update entry, RSS source, feed state and host. Only
+    the rows that changed since the last save are written, in a single transaction, so an interrupted save never
+    corrupts the database and the cost of a save does not grow with the number of feeds.
+
+    Sharded bots sharing the database may use the same feeds and hosts, so the feed states and host health are keyed
+    by shard as well: every shard only writes and deletes its own rows. A shard that has no row for a feed or host yet,
+    such as after the shard count changed, starts from the row most recently written by another shard. Once every
+    current shard has written its rows, the rows of the shard keys from before the change are deleted.
+
+    Attributes
+    ----------
+    filename : str
+        The absolute path to the SQLite database file
+    shard_key : str
+        Key of the shard in the feeds and hosts tables, such as 0/4, or an empty string if the bot is not sharded
+    shard_keys : list
+        Keys of every shard of the current shard count, or only the empty string if the bot is not sharded
+    connection : sqlite3.Connection
+        Connection to the SQLite database
+    snapshot : dict
+        Dictionary mapping the key of every persisted row to its serialized value, used to find changed rows
+    pruned_tables : set
+        Tables keyed by shard whose rows of stale shard keys were deleted
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS subreddits (
+            name TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS update_entries (
+            subreddit TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (subreddit, position)
+        );
+        CREATE TABLE IF NOT EXISTS rss_sources (
+            subreddit TEXT NOT NULL,
+            url TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (subreddit, url)
+        );
+        CREATE TABLE IF NOT EXISTS shard_feeds (
+            shard TEXT NOT NULL,
+            url TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (shard, url)
+        );
+        CREATE TABLE IF NOT EXISTS shard_hosts (
+            shard TEXT NOT NULL,
+            host TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (shard, host)
+        );
+    """
+    # Tables of the feed states and host health from before they were keyed by shard, and the tables replacing them
+    UNSHARDED_TABLES = {'feeds': 'shard_feeds', 'hosts': 'shard_hosts'}
+
+    def __init__(self, filename: str, shard: tuple[int, int] | None = None) -> None:
+        self.filename = filename
+        self.shard_key = f"{shard[0]}/{shard[1]}" if shard else ''
+        self.shard_keys = [f"{index}/{shard[1]}" for index in range(shard[1])] if shard else ['']
+        directory = os.path.dirname(filename)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        # Sharded bots may share the database, so wait for other processes' transactions instead of failing
+        self.connection = sqlite3.connect(filename, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self._migrate_unsharded_tables()
+        self.snapshot: dict[tuple, str | None] = {}
+        self.pruned_tables: set[str] = set()
+
+    def _migrate_unsharded_tables(self) -> None:
+        """Moves the rows of the tables that were not keyed by shard into the shard_feeds and shard_hosts tables"""
+        # Other shards may be migrating the same database, so the check and the move are a single transaction
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            for table, sharded_table in self.UNSHARDED_TABLES.items():
+                if self.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                           (table,)).fetchone():
+                    self.connection.execute(f"INSERT OR IGNORE INTO {sharded_table} SELECT '', * FROM {table}")
+                    self.connection.execute(f"DROP TABLE {table}")
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def load(self, subreddits: set[str] | None = None) -> Database:
+        db: Database = {}
+        for (name,) in self.connection.execute("SELECT name FROM subreddits"):
+            if subreddits is not None and name not in subreddits:
+                continue
+            db[name] = {'update_list': [], 'rss_sources': {}}
+            self.snapshot[('subreddits', name)] = None
+        for subreddit, position, data in self.connection.execute(
+                "SELECT subreddit, position, data FROM update_entries ORDER BY subreddit, position"):
+            if subreddits is not None and subreddit not in subreddits:
+                continue
+            db.setdefault(subreddit, {'update_list': [], 'rss_sources': {}})['update_list'].append(json.loads(data))
+            self.snapshot[('update_entries', subreddit, position)] = data
+        for subreddit, url, data in self.connection.execute("SELECT subreddit, url, data FROM rss_sources"):
+            if subreddits is not None and subreddit not in subreddits:
+                continue
+            db.setdefault(subreddit, {'update_list': [], 'rss_sources': {}})['rss_sources'][url] = json.loads(data)
+            self.snapshot[('rss_sources', subreddit, url)] = data
+        return db
+
+    def save(self, db: Database) -> None:
+        self._write(self._rows(db), ('subreddits', 'update_entries', 'rss_sources'))
+
+    def load_feeds(self, urls: set[str] | None = None) -> Feeds:
+        return self._load_shard_rows('shard_feeds', 'url', urls)
+
+    def save_feeds(self, feeds: Feeds) -> None:
+        self._write({('shard_feeds', self.shard_key, url): json.dumps(state, sort_keys=True)
+                     for url, state in feeds.items()}, ('shard_feeds',))
+        self._prune_stale_shards('shard_feeds')
+
+    def load_hosts(self, hosts: set[str] | None = None) -> Hosts:
+        return self._load_shard_rows('shard_hosts', 'host', hosts)
+
+    def save_hosts(self, hosts: Hosts) -> None:
+        self._write({('shard_hosts', self.shard_key, host): json.dumps(stats, sort_keys=True)
+                     for host, stats in hosts.items()}, ('shard_hosts',))
+        self._prune_stale_shards('shard_hosts')
+
+    def _load_shard_rows(self, table: str, column: str, keys: set[str] | None) -> dict:
+        """
+        Loads the rows of the shard from a table keyed by shard. Keys the shard has no row for are loaded from the row
+        most recently written by another shard, which the shard writes as its own on its next save
+
+        Args:
+            table: shard_feeds or shard_hosts
+            column: Name of the column of the table's key, url or host
+            keys: Keys of the rows to load, or None to load every key
+
+        Returns:
+            Dictionary mapping each key to its deserialized row
+        """
+        own: dict[str, str] = {}
+        others: dict[str, str] = {}
+        # REPLACE gives the row a new rowid, so later rows were written more recently
+        for shard, key, data in self.connection.execute(f"SELECT shard, {column}, data FROM {table} ORDER BY rowid"):
+            if keys is not None and key not in keys:
+                continue
+            (own if shard == self.shard_key else others)[key] = data
+        for key, data in own.items():
+            self.snapshot[(table, self.shard_key, key)] = data
+        return {key: json.loads(data) for key, data in {**others, **own}.items()}
+
+    def _prune_stale_shards(self, table: str) -> None:
+        """
+        Deletes the rows of a table keyed by shard whose shard key is not one of the current shards, such as the rows
+        written before the shard count changed. They seed the shards that have no row of their own yet, so they are
+        only deleted once every current shard has written its rows
+
+        Args:
+            table: shard_feeds or shard_hosts
+        """
+        if table in self.pruned_tables:
+            return
+        placeholders = ', '.join('?' * len(self.shard_keys))
+        with self.connection:
+            written = self.connection.execute(f"SELECT COUNT(DISTINCT shard) FROM {table} WHERE shard IN "
+                                              f"({placeholders})", self.shard_keys).fetchone()[0]
+            if written < len(self.shard_keys):
+                return
+            self.connection.execute(f"DELETE FROM {table} WHERE shard NOT IN ({placeholders})", self.shard_keys)
+        self.pruned_tables.add(table)
+
+    def _write(self, rows: dict[tuple, str | None], tables: tuple[str, ...]) -> None:
+        """Writes the rows that changed since the last write and deletes the rows of the tables that were removed"""
+        changed = [(key, data) for key, data in rows.items() if key not in self.snapshot or
+                   self.snapshot[key] != data]
+        removed = [key for key in self.snapshot if key[0] in tables and key not in rows]
+        if not changed and not removed:
+            return
+        with self.connection:
+            for key in removed:
+                table, *primary_key = key
+                if table == 'subreddits':
+                    self.connection.execute("DELETE FROM subreddits WHERE name = ?", primary_key)
+                elif table == 'update_entries':
+                    self.connection.execute("DELETE FROM update_entries WHERE subreddit = ? AND position = ?",
+                                            primary_key)
+                elif table == 'shard_feeds':
+                    self.connection.execute("DELETE FROM shard_feeds WHERE shard = ? AND url = ?", primary_key)
+                elif table == 'shard_hosts':
+                    self.connection.execute("DELETE FROM shard_hosts WHERE shard = ? AND host = ?", primary_key)
+                else:
+                    self.connection.execute("DELETE FROM rss_sources WHERE subreddit = ? AND url = ?", primary_key)
+            for key, data in changed:
+                table, *primary_key = key
+                if table == 'subreddits':
+                    self.connection.execute("INSERT OR IGNORE INTO subreddits (name) VALUES (?)", primary_key)
+                else:
+                    placeholders = ', '.join('?' * (len(primary_key) + 1))
+                    self.connection.execute(f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})",
+                                            (*primary_key, data))
+        for key in removed:
+            del self.snapshot[key]
+        self.snapshot.update(changed)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    @staticmethod
+    def _rows(db: Database) -> dict[tuple, str | None]:
+        """Flattens the database into a dictionary mapping each row's key to its serialized value"""
+        rows: dict[tuple, str | None] = {}
+        for subreddit, data in db.items():
+            rows[('subreddits', subreddit)] = None
+            for position, entry in enumerate(data['update_list']):
+                rows[('update_entries', subreddit, position)] = json.dumps(entry, sort_keys=True)
+            for url, source in data['rss_sources'].items():
+                rows[('rss_sources', subreddit, url)] = json.dumps(source, sort_keys=True)
+        return rows
+
+
+def open_state_store(db_file: str, backend: str = 'sqlite', shard: tuple[int, int] | None = None) -> StateStore:
+    """
+    Opens the state store for the database. The first time the SQLite backend is used, an existing JSON database is
+    migrated into it and renamed with a .migrated suffix.
+
+    Args:
+        db_file: The absolute path to the database JSON file. The SQLite database is stored next to it with a
+            .sqlite3 extension
+        backend: "sqlite" or "json"
+        shard: (Optional) (shard index, shard count) of a sharded bot. Shards share the SQLite database, since each
+            one only writes the rows of its own subreddits and its own feed and host rows, but each shard gets its own
+            JSON file
+
+    Returns:
+        The opened state store
+    """
+    if backend == 'json':
+        return JsonStateStore(shard_path(db_file, shard))
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown state backend: {backend}")
+    sqlite_file = f"{os.path.splitext(db_file)[0]}.sqlite3"
+    if not os.path.exists(sqlite_file) and os.path.exists(db_file):
+        print(f'Migrating {db_file} to {sqlite_file}...')
+        # Build the database under a temporary name so an interrupted migration is simply retried
+        temp_file = f"{sqlite_file}.tmp"
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        temp_store = SqliteStateStore(temp_file)
+        temp_store.save(load_db(db_file))
+        temp_store.close()
+        os.replace(temp_file, sqlite_file)
+        os.replace(db_file, f"{db_file}.migrated")
+    return SqliteStateStore(sqlite_file, shard)
@@ -0,0 +1,166 @@
+import time
+from typing import NamedTuple
+
+from .minhash import MinHashLSH
+from .url_parser import canonicalize_url
+
+
+class IndexedPost(NamedTuple):
+    id: str
+    url: str
+    normalized_url: str
+    title: str
+    created_utc: float
+    permalink: str
+
+
+class SubredditIndex:
+    """
+    Rolling index of the recent posts in a subreddit. It is shared by every feed that posts to the subreddit and is
+    refreshed incrementally by listing a single page of the newest posts and adding the ones not indexed yet.
+
+    Attributes
+    ----------
+    max_age : int
+        Number of seconds after a post's creation that it is kept in the index
+    full_refresh_interval : int
+        Number of seconds between full relistings, which also drop posts that were deleted or removed
+    min_refresh_interval : int
+        Number of seconds during which the index is considered fresh and is not refreshed again
+    posts : dict
+        Dictionary mapping each post's fullname to its IndexedPost
+    urls : dict
+        Dictionary mapping each post's canonical url key to its fullname
+    lsh : MinHashLSH | None
+        LSH index of the post titles by fullname, used to only compare a title with the posts that could be
+        near-duplicates of it, or None to compare it with every post
+    """
+
+    PAGE_SIZE = 100  # Largest number of posts Reddit returns in a single listing request
+
+    def __init__(self, max_age: int = 24 * 60 * 60, full_refresh_interval: int = 60 * 60,
+                 min_refresh_interval: int = 60, lsh: MinHashLSH | None = None) -> None:
+        """
+        Initializes the SubredditIndex object
+
+        Args:
+            max_age: Number of seconds after a post's creation that it is kept in the index
+            full_refresh_interval: Number of seconds between full relistings of the subreddit
+            min_refresh_interval: Number of seconds during which the index is not refreshed again
+            lsh: (Optional) Empty LSH index of the post titles, or None to compare titles with every post
+        """
+        self.max_age = max_age
+        self.full_refresh_interval = full_refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.posts: dict[str, IndexedPost] = {}
+        self.urls: dict[str, str] = {}
+        self.last_refresh = 0.0
+        self.last_full_refresh = 0.0
+        self.lsh = lsh
+
+    def refresh(self, subreddit) -> None:
+        """
+        Brings the index up to date. Only the newest page of posts is listed, unless the index is empty, a full
+        relisting is due, or the page is full of posts made since the last refresh, so there may be more of them.
+        The page is not anchored on an indexed post, which would return nothing once that post is deleted or removed.
+
+        Args:
+            subreddit: The praw Subreddit object to list the posts of
+        """
+        now = time.time()
+        if now - self.last_refresh < self.min_refresh_interval:
+            return
+        if self.posts and now - self.last_full_refresh < self.full_refresh_interval:
+            page = list(subreddit.new(limit=self.PAGE_SIZE))
+            # A full page of posts made since the last refresh may not reach the indexed ones
+            if len(page) < self.PAGE_SIZE or page[-1].created_utc <= self.last_refresh:
+                for post in page:
+                    if f"t3_{post.id}" not in self.posts and post.created_utc >= now - self.max_age:
+                        self._add(post)
+                self._evict(now)
+                self.last_refresh = now
+                return
+        self.posts = {}
+        self.urls = {}
+        if self.lsh is not None:
+            self.lsh.clear()
+        for post in subreddit.new(limit=1000):
+            if post.created_utc < now - self.max_age:
+                break
+            self._add(post)
+        self.last_refresh = self.last_full_refresh = now
+
+    def find_url(self, link: str) -> IndexedPost | None:
+        """
+        Finds a post that links to the same page, comparing the canonical keys of the urls so different urls of the
+        same page, such as its http, www., mobile, AMP or tracking versions, match
+
+        Args:
+            link: The url to look up
+
+        Returns:
+            The indexed post with the same page if there is one, None otherwise
+        """
+        fullname = self.urls.get(canonicalize_url(link))
+        return self.posts.get(fullname) if fullname else None
+
+    def recent_posts(self) -> list[IndexedPost]:
+        """Returns the indexed posts, newest first"""
+        return sorted(self.posts.values(), key=lambda post: post.created_utc, reverse=True)
+
+    def similar_posts(self, title: str) -> list[IndexedPost]:
+        """
+        Finds the posts whose title could be a near-duplicate of the title, which are the candidates of the LSH index,
+        or every post if the index has none
+
+        Args:
+            title: The title to look up
+
+        Returns:
+            The candidate posts, newest first
+        """
+        if self.lsh is None:
+            return self.recent_posts()
+        candidates = [self.posts[fullname] for fullname in self.lsh.query(title) if fullname in self.posts]
+        return sorted(candidates, key=lambda post: post.created_utc, reverse=True)
+
+    def add_submission(self, post_id: str, title: str, url: str, permalink: str) -> IndexedPost:
+        """
+        Adds a post the bot just made, so the next checks find it before the index is listed again
+
+        Args:
+            post_id: The ID of the post, without the t3_ prefix
+            title: The title of the post
+            url: The url link of the post
+            permalink: The permalink of the post
+
+        Returns:
+            The indexed post
+        """
+        indexed = IndexedPost(post_id, url, canonicalize_url(url), title, time.time(), permalink)
+        fullname = f"t3_{post_id}"
+        self.posts[fullname] = indexed
+        self.urls[indexed.normalized_url] = fullname
+        if self.lsh is not None:
+            self.lsh.add(fullname, title)
+        return indexed
+
+    def _add(self, post) -> None:
+        """Adds a praw Submission to the index"""
+        indexed = IndexedPost(post.id, post.url, canonicalize_url(post.url), post.title, post.created_utc,
+                              post.permalink)
+        fullname = f"t3_{post.id}"
+        self.posts[fullname] = indexed
+        self.urls[indexed.normalized_url] = fullname
+        if self.lsh is not None:
+            self.lsh.add(fullname, post.title)
+
+    def _evict(self, now: float) -> None:
+        """Removes posts older than max_age and their urls from the index"""
+        cutoff = now - self.max_age
+        if self.lsh is not None:
+            for fullname, post in self.posts.items():
+                if post.created_utc < cutoff:
+                    self.lsh.remove(fullname)
+        self.posts = {fullname: post for fullname, post in self.posts.items() if post.created_utc >= cutoff}
+        self.urls = {url: fullname for url, fullname in self.urls.items() if fullname in self.posts}
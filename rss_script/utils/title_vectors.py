@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from .nlp import get_vectors
+
+
+class TitleVectorCache:
+    """
+    Persistent cache of Reddit post title vectors keyed by post ID, used to compare a candidate title against every
+    recent post with a single matrix operation instead of running the NLP pipeline on each pair of titles. It is shared
+    by every subreddit, so the titles of subreddits handled at the same time are compared one at a time
+
+    Attributes
+    ----------
+    filename : str
+        The absolute path to the file the vectors are saved to
+    max_age : int
+        Number of seconds after a post's creation that its vector is kept
+    entries : dict
+        Dictionary mapping each post ID to a tuple of (created_utc, title vector)
+    dirty : bool
+        Whether vectors were added or evicted since the file was last loaded or saved
+    """
+
+    def __init__(self, filename: str, max_age: int = 24 * 60 * 60) -> None:
+        """
+        Initializes the TitleVectorCache object, loading any vectors saved by a previous run
+
+        Args:
+            filename: The absolute path to the file the vectors are saved to
+            max_age: Number of seconds after a post's creation that its vector is kept
+        """
+        self.filename = filename
+        self.max_age = max_age
+        self.entries: dict[str, tuple[float, np.ndarray]] = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        try:
+            with np.load(filename) as data:
+                for post_id, created, vector in zip(data['ids'], data['created'], data['vectors']):
+                    self.entries[str(post_id)] = (float(created), vector)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f'Error loading {filename}: {str(e)}')
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the vectors of posts older than max_age"""
+        cutoff = time.time() - self.max_age
+        count = len(self.entries)
+        self.entries = {post_id: entry for post_id, entry in self.entries.items() if entry[0] >= cutoff}
+        self.dirty = self.dirty or len(self.entries) != count
+
+    def similarities(self, title: str, posts: list) -> np.ndarray:
+        """
+        Calculates the cosine similarity between the title and the title of every post. Vectors of posts that are not
+        cached yet are calculated in one batch and cached.
+
+        Args:
+            title: The title to compare
+            posts: List of praw Submission objects (or anything with id, title and created_utc attributes)
+
+        Returns:
+            A 1D array with the similarity of the title to each post, in the same order as posts
+        """
+        if not posts:
+            return np.zeros(0, dtype=np.float32)
+        with self.lock:
+            return self._similarities(title, posts)
+
+    def add(self, posts: list) -> None:
+        """
+        Calculates and caches the vectors of posts that are not cached yet, such as the posts the bot just made
+
+        Args:
+            posts: List of praw Submission objects (or anything with id, title and created_utc attributes)
+        """
+        with self.lock:
+            self._add([post for post in posts if post.id not in self.entries])
+
+    def _add(self, posts: list) -> None:
+        if posts:
+            for post, post_vector in zip(posts, get_vectors([post.title for post in posts])):
+                self.entries[post.id] = (post.created_utc, post_vector)
+            self.dirty = True
+
+    def _similarities(self, title: str, posts: list) -> np.ndarray:
+        vector = get_vectors([title])[0]
+        # Vectors with a different shape were made by a different model and have to be recalculated
+        self._add([post for post in posts if post.id not in self.entries or
+                   self.entries[post.id][1].shape != vector.shape])
+        matrix = np.stack([self.entries[post.id][1] for post in posts])
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(norms > 0, matrix @ vector / norms, 0.0)
+        # Identical titles are always a match, even if none of their words have vectors
+        scores[[i for i, post in enumerate(posts) if post.title == title]] = 1.0
+        return scores
+
+    def save(self) -> None:
+        """Saves the cached vectors to the file, replacing it atomically, unless no vector was added or evicted"""
+        with self.lock:
+            self._save()
+
+    def _save(self) -> None:
+        self.evict()
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.filename)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        ids = list(self.entries.keys())
+        vectors = [vector for _, vector in self.entries.values()]
+        temp_file = f'{self.filename}.tmp'
+        with open(temp_file, 'wb') as file:
+            np.savez(file, ids=np.array(ids, dtype=str), created=np.array([c for c, _ in self.entries.values()]),
+                     vectors=np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32))
+        os.replace(temp_file, self.filename)
+        self.dirty = False
@@ -1,16 +1,132 @@
-from urllib.parse import urlparse, urlunparse
+import re
+from functools import lru_cache
+from typing import Callable, NamedTuple
+from urllib.parse import parse_qsl, urlencode, urlparse
 
+CANONICAL_CACHE_SIZE = 16384  # Number of canonicalized urls memoized
+MAX_REDIRECTS = 3  # Number of nested redirector links followed
+# Subdomains that serve the same pages as the main site, such as mobile and AMP versions
+MIRROR_PREFIXES = re.compile(r'^(?:www\d*|m|mobile|amp)\.(?=.+\..+)')
+# Path suffixes of the AMP versions of pages, and default documents of directories
+PATH_SUFFIXES = re.compile(r'(?:/amp|\.amp|/index\.html?|/index\.php)$')
+# Query parameters added by analytics, ad and newsletter tools to track where a visit came from. They are removed
+# from the urls of every domain, and every other parameter is kept unless the domain has a rule listing the kept ones
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'gclsrc', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'twclid', 'ttclid', 'li_fat_id',
+    'igshid', 'igsh', 'mc_cid', 'mc_eid', 'mkt_tok', '_hsenc', '_hsmi', '_ga', '_gl', '_openstat', 'oly_anon_id',
+    'oly_enc_id', 'vero_id', 'wt_mc', 'wt.mc_id', 's_cid', 'cmpid', 'icid', 'ncid', 'ocid', 'smid', 'sr_share',
+    'spm', 'ref', 'ref_src', 'ref_url', 'referrer', '__twitter_impression'})
+# Prefixes of tracking parameter families, such as utm_source and utm_medium
+TRACKING_PREFIXES = ('utm_', 'hsa_', 'pk_', 'mtm_')
 
-def remove_query_params(url: str) -> str:
+
+class DomainRule(NamedTuple):
+    """
+    How the urls of a domain are canonicalized. The rule of a domain also applies to its subdomains.
+
+    Attributes
+    ----------
+    kept_params : frozenset | None
+        Query parameters that identify the page, every other parameter being removed, or None to keep every parameter
+        except the tracking ones
+    redirect_params : tuple
+        Query parameters that can hold the target url, for redirector links. The target is canonicalized instead
+    rewrite : Callable | None
+        Function that takes the host and path and returns the url of the canonical page, which is canonicalized
+        instead, or None if the rule does not apply to the path
+    """
+    kept_params: frozenset[str] | None = None
+    redirect_params: tuple[str, ...] = ()
+    rewrite: Callable[[str, str], str | None] | None = None
+
+
+def _youtube(host: str, path: str) -> str | None:
+    """Rewrites youtu.be/<id> and youtube.com/shorts/<id> links to youtube.com/watch?v=<id>"""
+    parts = path.strip('/').split('/')
+    if host == 'youtu.be' and parts[0]:
+        return f"https://youtube.com/watch?v={parts[0]}"
+    if len(parts) == 2 and parts[0] in ('shorts', 'embed', 'live'):
+        return f"https://youtube.com/watch?v={parts[1]}"
+    return None
+
+
+def _amp_cache(_host: str, path: str) -> str | None:
+    """Rewrites <site>.cdn.ampproject.org/c/s/<site>/<path> links to <site>/<path>"""
+    match = re.match(r'^/(?:[a-z]/)*(?:s/)?([^/]+\.[^/]+)(/.*)?$', path)
+    return f"https://{match.group(1)}{match.group(2) or ''}" if match else None
+
+
+DOMAIN_RULES: dict[str, DomainRule] = {
+    'youtube.com': DomainRule(frozenset({'v'}), rewrite=_youtube),
+    'youtu.be': DomainRule(frozenset(), rewrite=_youtube),
+    'cdn.ampproject.org': DomainRule(rewrite=_amp_cache),
+    'news.ycombinator.com': DomainRule(frozenset({'id'})),
+    'facebook.com': DomainRule(frozenset({'story_fbid', 'id', 'v', 'fbid'})),
+    'l.facebook.com': DomainRule(redirect_params=('u',)),
+    'lm.facebook.com': DomainRule(redirect_params=('u',)),
+    'google.com': DomainRule(frozenset({'q'}), redirect_params=('url', 'q')),
+    'out.reddit.com': DomainRule(redirect_params=('url',)),
+    'bing.com': DomainRule(frozenset({'q'}), redirect_params=('url',)),
+}
+
+
+def _is_tracking_param(name: str) -> bool:
+    """Returns True if the query parameter only tracks where a visit came from"""
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def _domain_rule(host: str) -> DomainRule:
+    """Returns the rule of the host or of its closest parent domain, or the default rule"""
+    labels = host.split('.')
+    for start in range(len(labels) - 1):
+        rule = DOMAIN_RULES.get('.'.join(labels[start:]))
+        if rule:
+            return rule
+    return DomainRule()
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonicalize_url(url: str, redirects: int = MAX_REDIRECTS) -> str:
     """
-    Removes the query parameters from a URL
+    Normalizes a URL into a key that is the same for the different urls of a page. The scheme, mirror subdomains
+    (www., m., amp.), default ports, fragments, AMP suffixes and trailing slashes are removed, redirector links are
+    replaced by their target, and tracking query parameters (utm_*, fbclid, gclid, ...) are removed, or only the
+    parameters that identify the page are kept for the domains that have a rule listing them. The query parameters that
+    are kept are sorted.
+    Shortened links, such as bit.ly ones, would need a request to be resolved and are left as they are.
 
     Args:
-        url: The URL remove the query parameters from
+        url: The URL to canonicalize
+        redirects: (Optional) Number of nested redirector links and rewrites that can still be followed
 
     Returns:
-        The URL with the query parameters removed
+        The canonical key of the URL, such as example.com/news/story?id=1. It is not a valid URL
     """
-    parsed_url = urlparse(url)
-    cleaned_url = urlunparse((parsed_url.scheme, parsed_url.netloc, parsed_url.path, None, None, None))
-    return cleaned_url
+    parsed_url = urlparse(url.strip())
+    if parsed_url.scheme not in ('http', 'https', ''):
+        return url.strip()
+    if not parsed_url.netloc and parsed_url.path and not parsed_url.scheme:
+        # Links without a scheme, such as example.com/news
+        parsed_url = urlparse('//' + url.strip())
+    host = (parsed_url.hostname or '').rstrip('.')
+    rule = _domain_rule(host)
+    params = parse_qsl(parsed_url.query, keep_blank_values=True)
+    if rule.redirect_params and redirects > 0:
+        target = next((value for name, value in params
+                       if name in rule.redirect_params and urlparse(value).netloc), None)
+        if target:
+            return canonicalize_url(target, redirects - 1)
+    rewritten = rule.rewrite(host, parsed_url.path) if rule.rewrite and redirects > 0 else None
+    if rewritten:
+        return canonicalize_url(rewritten, redirects - 1)
+    query = [(name, value) for name, value in params
+             if (name.lower() in rule.kept_params if rule.kept_params is not None else not _is_tracking_param(name))]
+    host = MIRROR_PREFIXES.sub('', host)
+    try:
+        if parsed_url.port and parsed_url.port not in (80, 443):
+            host = f"{host}:{parsed_url.port}"
+    except ValueError:
+        pass
+    path = PATH_SUFFIXES.sub('', re.sub(r'/{2,}', '/', parsed_url.path).rstrip('/')).rstrip('/')
+    return host + path + ('?' + urlencode(sorted(query)) if query else '')
@@ -0,0 +1,249 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from ..types import FeedState, Feeds, WebSubState
+
+# Hash functions allowed in the X-Hub-Signature header of pushed content
+SIGNATURE_METHODS = {'sha1': hashlib.sha1, 'sha256': hashlib.sha256, 'sha384': hashlib.sha384,
+                     'sha512': hashlib.sha512}
+
+
+class WebSubSubscriber:
+    """
+    Subscribes to the WebSub (PubSubHubbub) hubs advertised by the RSS feeds, and receives the content the hubs push
+    on a local HTTP callback server. Each feed gets its own callback url and secret, and pushed content is only
+    accepted with a valid HMAC signature. Feeds with an active subscription only need to be polled as a fallback.
+
+    Subscriptions are requested and renewed by the bot with subscribe. Subscriptions of feeds that leave the config
+    are not renewed, and content pushed for them is refused so the hub drops them.
+
+    Attributes
+    ----------
+    callback_url : str
+        Public url of the callback server, which the hubs send their requests to. Each feed's callback is a path
+        below it
+    lease_seconds : int
+        Number of seconds of subscription requested from the hubs
+    fallback_interval : float
+        Minimum number of seconds between requests to a feed whose subscription is active
+    max_bytes : int
+        Maximum size of pushed content in bytes
+    subscriptions : dict
+        Dictionary mapping each callback id to the (url, WebSub state) of its feed
+    pushed : threading.Event
+        Event set when content is pushed, so the bot can wake up to handle it
+    """
+
+    RENEW_BEFORE = 24 * 60 * 60  # Seconds before the lease expires that the subscription is renewed
+    RETRY_INTERVAL = 60 * 60  # Seconds before a subscription that was not verified is requested again
+
+    def __init__(self, callback_url: str, lease_seconds: int = 10 * 24 * 60 * 60,
+                 fallback_interval: float = 6 * 60 * 60, max_bytes: int = 10 * 1024 * 1024) -> None:
+        """
+        Initializes the WebSubSubscriber object
+
+        Args:
+            callback_url: Public url of the callback server
+            lease_seconds: Number of seconds of subscription requested from the hubs
+            fallback_interval: Minimum number of seconds between requests to a feed whose subscription is active
+            max_bytes: Maximum size of pushed content in bytes
+        """
+        self.callback_url = callback_url.rstrip('/')
+        self.lease_seconds = lease_seconds
+        self.fallback_interval = fallback_interval
+        self.max_bytes = max_bytes
+        self.subscriptions: dict[str, tuple[str, WebSubState]] = {}
+        self.pushed = threading.Event()
+        self.lock = threading.Lock()
+        self.queue: list[tuple[str, bytes]] = []
+        self.server: ThreadingHTTPServer | None = None
+
+    @staticmethod
+    def callback_id(url: str) -> str:
+        """Returns the id of the feed's callback url"""
+        return hashlib.blake2b(url.encode(), digest_size=8).hexdigest()
+
+    def register(self, feeds: Feeds) -> None:
+        """Replaces the subscriptions with the ones stored in the state of the feeds"""
+        with self.lock:
+            self.subscriptions = {self.callback_id(url): (url, state['websub'])
+                                  for url, state in feeds.items() if 'websub' in state}
+
+    def discover(self, url: str, state: FeedState, hub: str | None, topic: str | None) -> None:
+        """
+        Records the hub advertised by a feed. A new subscription is requested when the hub or topic changes, and
+        the subscription is dropped when the feed stops advertising a hub.
+
+        Args:
+            url: The url of the RSS feed
+            state: Shared state of the RSS feed
+            hub: The url of the hub, or None if the feed does not advertise one
+            topic: The url the feed is published under, or None to use the url of the feed
+        """
+        websub = state.get('websub')
+        if not hub:
+            if websub:
+                del state['websub']
+                with self.lock:
+                    self.subscriptions.pop(self.callback_id(url), None)
+            return
+        topic = topic or url
+        if websub and websub['hub'] == hub and websub['topic'] == topic:
+            return
+        state['websub'] = WebSubState(hub=hub, topic=topic, secret=secrets.token_hex(20), lease_expires=0,
+                                      requested_at=0)
+        with self.lock:
+            self.subscriptions[self.callback_id(url)] = (url, state['websub'])
+
+    def is_active(self, state: FeedState) -> bool:
+        """Returns True if the feed has a verified subscription that has not expired"""
+        return 'websub' in state and state['websub']['lease_expires'] > time.time()
+
+    def due(self, feeds: Feeds) -> list[str]:
+        """Returns the urls of the feeds whose subscription should be requested or renewed"""
+        now = time.time()
+        return [url for url, state in feeds.items() if 'websub' in state and
+                state['websub']['lease_expires'] - now < self.RENEW_BEFORE and
+                now - state['websub']['requested_at'] > self.RETRY_INTERVAL]
+
+    def subscribe(self, session, url: str, state: FeedState, timeout: float | tuple[float, float]) -> bool:
+        """
+        Asks the hub of a feed for a subscription. The hub then verifies the request on the callback server
+
+        Args:
+            session: The requests Session used to send the request
+            url: The url of the RSS feed
+            state: Shared state of the RSS feed
+            timeout: Timeout of the request in seconds
+
+        Returns:
+            True if the hub accepted the request, False otherwise
+        """
+        websub = state['websub']
+        websub['requested_at'] = time.time()
+        try:
+            resp = session.post(websub['hub'], timeout=timeout, data={
+                'hub.mode': 'subscribe', 'hub.topic': websub['topic'], 'hub.callback': self.callback(url),
+                'hub.secret': websub['secret'], 'hub.lease_seconds': str(self.lease_seconds)})
+        except Exception as e:
+            print(f"Error subscribing to {url} on {websub['hub']}: {e}")
+            return False
+        if resp.status_code not in (202, 204):
+            print(f"{websub['hub']} refused the subscription to {url} with status {resp.status_code}")
+            return False
+        return True
+
+    def callback(self, url: str) -> str:
+        """Returns the callback url of a feed"""
+        return f"{self.callback_url}/{self.callback_id(url)}"
+
+    def pushes(self) -> list[tuple[str, bytes]]:
+        """Returns and clears the (url, content) pairs pushed since the last call, oldest first"""
+        with self.lock:
+            queue, self.queue = self.queue, []
+            self.pushed.clear()
+        return queue
+
+    def _verify(self, callback_id: str, params: dict[str, str]) -> str | None:
+        """
+        Answers a verification of intent from a hub
+
+        Args:
+            callback_id: The id of the callback url the request was sent to
+            params: The query parameters of the request
+
+        Returns:
+            The challenge to echo back if the request is confirmed, None otherwise
+        """
+        mode = params.get('hub.mode')
+        with self.lock:
+            subscription = self.subscriptions.get(callback_id)
+        if mode == 'denied':
+            if subscription:
+                subscription[1]['lease_expires'] = 0
+                print(f"The hub denied the subscription to {subscription[0]}: {params.get('hub.reason', '')}")
+            return None
+        if mode == 'unsubscribe':
+            # Only feeds that are not wanted anymore are unsubscribed, so third parties cannot remove subscriptions
+            return params.get('hub.challenge') if subscription is None else None
+        if mode != 'subscribe' or subscription is None or params.get('hub.topic') != subscription[1]['topic']:
+            return None
+        lease = params.get('hub.lease_seconds', '')
+        subscription[1]['lease_expires'] = time.time() + (int(lease) if lease.isdigit() else self.lease_seconds)
+        return params.get('hub.challenge')
+
+    def _receive(self, callback_id: str, body: bytes, signature: str | None) -> bool:
+        """
+        Queues content pushed by a hub if its signature is valid
+
+        Args:
+            callback_id: The id of the callback url the content was pushed to
+            body: The pushed content
+            signature: The X-Hub-Signature header, as method=hex digest
+
+        Returns:
+            False if the callback belongs to no subscription, True otherwise, even if the content was ignored
+        """
+        with self.lock:
+            subscription = self.subscriptions.get(callback_id)
+        if subscription is None:
+            return False
+        url, websub = subscription
+        method, _, digest = (signature or '').partition('=')
+        if method not in SIGNATURE_METHODS or not hmac.compare_digest(
+                hmac.new(websub['secret'].encode(), body, SIGNATURE_METHODS[method]).hexdigest(), digest):
+            print(f"Ignoring content pushed for {url} with an invalid signature")
+            return True
+        with self.lock:
+            self.queue.append((url, body))
+            self.pushed.set()
+        return True
+
+    def serve(self, port: int, host: str = '0.0.0.0') -> None:
+        """
+        Runs the callback server on http://host:port from a background thread
+
+        Args:
+            port: Port to listen on
+            host: (Optional) Address to listen on. The hubs have to be able to reach it, directly or through a proxy
+        """
+        subscriber = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                parts = urlsplit(self.path)
+                params = {name: values[0] for name, values in parse_qs(parts.query).items()}
+                challenge = subscriber._verify(parts.path.rstrip('/').rsplit('/', 1)[-1], params)
+                if challenge is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(challenge.encode())))
+                self.end_headers()
+                self.wfile.write(challenge.encode())
+
+            def do_POST(self) -> None:
+                length = self.headers.get('Content-Length', '')
+                if not length.isdigit() or int(length) > subscriber.max_bytes:
+                    self.send_error(413 if length.isdigit() else 411)
+                    return
+                body = self.rfile.read(int(length))
+                callback_id = urlsplit(self.path).path.rstrip('/').rsplit('/', 1)[-1]
+                # 410 Gone tells the hub to drop subscriptions the bot does not know anymore
+                self.send_response(202 if subscriber._receive(callback_id, body,
+                                                              self.headers.get('X-Hub-Signature')) else 410)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="websub-callback", daemon=True).start()
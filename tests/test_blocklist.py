@@ -0,0 +1,59 @@
+import pytest
+
+from rss_script.utils.blocklist import Blocklist
+
+
+def test_substring_terms_match_anywhere_in_the_title():
+    blocklist = Blocklist((['war'], 'substring'))
+    assert blocklist.match("Studio wins award") == "war"
+    assert blocklist.match("Peace talks resume") is None
+
+
+def test_padded_substring_terms_keep_their_padding():
+    blocklist = Blocklist(([' war '], 'substring'))
+    assert blocklist.match("Studio wins award") is None
+    assert blocklist.match("Trade war escalates") == " war "
+
+
+def test_word_terms_only_match_whole_words():
+    blocklist = Blocklist(([' war ', 'trade deal'], 'word'))
+    assert blocklist.match("Studio wins award") is None
+    assert blocklist.match("War, again") == "war"
+    assert blocklist.match("Trade deal signed") == "trade deal"
+
+
+def test_regex_terms_match_case_insensitively():
+    blocklist = Blocklist(([r'\bsale\s+\d+%'], 'regex'))
+    assert blocklist.match("SALE 50% off everything") == "sale 50%"
+    assert blocklist.match("Salesforce earnings") is None
+
+
+def test_invalid_regex_terms_are_skipped():
+    blocklist = Blocklist((['(unclosed', 'ok'], 'regex'))
+    assert len(blocklist) == 1
+    assert blocklist.match("It is ok") == "ok"
+
+
+def test_titles_and_terms_are_normalized():
+    blocklist = Blocklist((['ＣＡＦÉ'], 'substring'))
+    assert blocklist.match("New café opens") == "café"
+
+
+def test_lists_of_every_mode_are_merged():
+    blocklist = Blocklist((['crypto'], 'substring'), (['ad'], 'word'), ([r'\d+ tips'], 'regex'))
+    assert len(blocklist) == 3
+    assert blocklist.match("Cryptocurrency falls") == "crypto"
+    assert blocklist.match("Read this ad now") == "ad"
+    assert blocklist.match("Read this adventure") is None
+    assert blocklist.match("10 tips for summer") == "10 tips"
+
+
+def test_blank_terms_are_ignored():
+    blocklist = Blocklist(([' ', ''], 'substring'), (['  '], 'word'))
+    assert len(blocklist) == 0
+    assert blocklist.match("Anything") is None
+
+
+def test_unknown_modes_are_rejected():
+    with pytest.raises(ValueError):
+        Blocklist((['war'], 'fuzzy'))
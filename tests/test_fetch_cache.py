@@ -0,0 +1,54 @@
+from rss_script.utils.fetch_cache import FetchCache
+
+
+def feed(build_date, *guids):
+    items = "".join(f"<item><title>Story {guid}</title><link>https://example.com/{guid}</link><guid>{guid}</guid>"
+                    f"</item>" for guid in guids)
+    return f"<rss><channel><lastBuildDate>{build_date}</lastBuildDate>{items}</channel></rss>".encode()
+
+
+class CountingParser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, body, limit):
+        self.calls += 1
+        return [(f"Story {guid}", f"https://example.com/{guid}", guid) for guid in ("g2", "g1")][:limit]
+
+
+def test_the_same_body_is_not_parsed_again():
+    cache, source, parse = FetchCache(10), {}, CountingParser()
+    first, result = cache.headlines(source, feed("Mon", "g2", "g1"), parse)
+    assert result == FetchCache.CHANGED
+    again, result = cache.headlines(source, feed("Mon", "g2", "g1"), parse)
+    assert result == FetchCache.UNCHANGED
+    assert again == first
+    assert parse.calls == 1
+
+
+def test_a_body_with_the_same_first_item_is_not_parsed_again():
+    cache, source, parse = FetchCache(10), {}, CountingParser()
+    first, _ = cache.headlines(source, feed("Mon", "g2", "g1"), parse)
+    again, result = cache.headlines(source, feed("Tue", "g2", "g1"), parse)
+    assert result == FetchCache.SAME_FIRST_ITEM
+    assert again == first
+    assert parse.calls == 1
+    # The new body is now the cached one
+    assert cache.headlines(source, feed("Tue", "g2", "g1"), parse)[1] == FetchCache.UNCHANGED
+    assert source['cache']['hits'] == {FetchCache.NOT_MODIFIED: 0, FetchCache.UNCHANGED: 1,
+                                       FetchCache.SAME_FIRST_ITEM: 1, FetchCache.CHANGED: 1}
+
+
+def test_a_new_first_item_is_parsed():
+    cache, source, parse = FetchCache(10), {}, CountingParser()
+    cache.headlines(source, feed("Mon", "g1"), parse)
+    assert cache.headlines(source, feed("Tue", "g2", "g1"), parse)[1] == FetchCache.CHANGED
+    assert parse.calls == 2
+
+
+def test_unparsed_bodies_are_not_cached():
+    cache, source = FetchCache(10), {}
+    assert cache.headlines(source, feed("Mon", "g1"), lambda body, limit: None) == (None, FetchCache.CHANGED)
+    parse = CountingParser()
+    assert cache.headlines(source, feed("Mon", "g1"), parse)[1] == FetchCache.CHANGED
+    assert parse.calls == 1
@@ -0,0 +1,30 @@
+from rss_script.utils.rss_parser import find_new_headlines, headlines_since
+
+ITEMS = [(f"Story {number}", f"https://example.com/{number}", f"guid-{number}") for number in range(11, 0, -1)]
+
+
+def test_headlines_since_returns_the_headlines_newer_than_the_last_one_seen():
+    assert headlines_since(ITEMS, "guid-8", 11) == ITEMS[:3]
+    assert headlines_since(ITEMS, "guid-11", 11) == []
+
+
+def test_headlines_since_ignores_whitespace_around_the_last_id():
+    assert headlines_since(ITEMS, "\n  guid-10 \n", 11) == ITEMS[:1]
+
+
+def test_headlines_since_only_returns_the_newest_headline_of_a_feed_never_seen():
+    assert headlines_since(ITEMS, None, 11) == ITEMS[:1]
+    assert headlines_since(ITEMS, "", 11) == ITEMS[:1]
+
+
+def test_headlines_since_queues_the_newest_headlines_when_the_last_id_is_missing():
+    # More stories were published than the cached headlines hold
+    assert headlines_since(ITEMS, "guid-0", 11) == ITEMS
+    assert headlines_since(ITEMS, "guid-0", 5) == ITEMS[:5]
+
+
+def test_find_new_headlines_stops_at_the_last_id_and_the_limit():
+    feed = "<rss><channel>" + "".join(f"<item><title>{title}</title><link>{link}</link><guid>{guid}</guid></item>"
+                                      for title, link, guid in ITEMS) + "</channel></rss>"
+    assert find_new_headlines(feed, "guid-9", 11) == ITEMS[:2]
+    assert find_new_headlines(feed, None, 4) == ITEMS[:4]
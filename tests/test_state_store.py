@@ -0,0 +1,90 @@
+import json
+import os
+import sqlite3
+
+from rss_script.utils.state_store import SqliteStateStore, open_state_store
+
+DB = {
+    'news': {
+        'update_list': [{'update_time': 100, 'update_index': 0, 'listening': True}],
+        'rss_sources': {'https://example.com/rss': {'last_id': 'g1'}},
+    },
+    'world': {'update_list': [], 'rss_sources': {}},
+}
+
+
+def shard_rows(filename, table):
+    with sqlite3.connect(filename) as connection:
+        return sorted(connection.execute(f"SELECT shard, {'url' if table == 'shard_feeds' else 'host'} FROM {table}"))
+
+
+def test_stale_shard_rows_seed_new_shards_then_are_pruned(tmp_path):
+    filename = str(tmp_path / "db.sqlite3")
+    unsharded = SqliteStateStore(filename)
+    unsharded.save_feeds({'https://a.example.com/rss': {'etag': 'a'}, 'https://b.example.com/rss': {'etag': 'b'}})
+    unsharded.save_hosts({'a.example.com': {'failures': 1}})
+    unsharded.close()
+
+    first = SqliteStateStore(filename, (0, 2))
+    second = SqliteStateStore(filename, (1, 2))
+    assert first.load_feeds({'https://a.example.com/rss'}) == {'https://a.example.com/rss': {'etag': 'a'}}
+    first.save_feeds({'https://a.example.com/rss': {'etag': 'a'}})
+    # The second shard has not written its rows yet, so the unsharded rows are kept to seed it
+    assert ('', 'https://b.example.com/rss') in shard_rows(filename, 'shard_feeds')
+
+    assert second.load_feeds({'https://b.example.com/rss'}) == {'https://b.example.com/rss': {'etag': 'b'}}
+    second.save_feeds({'https://b.example.com/rss': {'etag': 'b2'}})
+    assert shard_rows(filename, 'shard_feeds') == [('0/2', 'https://a.example.com/rss'),
+                                                   ('1/2', 'https://b.example.com/rss')]
+    assert shard_rows(filename, 'shard_hosts') == [('', 'a.example.com')]
+
+    first.save_hosts(first.load_hosts())
+    second.save_hosts(second.load_hosts())
+    assert shard_rows(filename, 'shard_hosts') == [('0/2', 'a.example.com'), ('1/2', 'a.example.com')]
+    first.close()
+    second.close()
+
+
+def test_the_json_database_is_migrated_to_sqlite(tmp_path):
+    db_file = str(tmp_path / "db.json")
+    with open(db_file, 'w') as file:
+        json.dump(DB, file)
+
+    store = open_state_store(db_file)
+    assert store.load() == DB
+    assert store.load({'news'}) == {'news': DB['news']}
+    store.close()
+    assert os.path.exists(tmp_path / "db.sqlite3")
+    assert not os.path.exists(db_file)
+    assert os.path.exists(f"{db_file}.migrated")
+    assert not os.path.exists(tmp_path / "db.sqlite3.tmp")
+
+
+def test_the_migrated_database_is_not_overwritten(tmp_path):
+    db_file = str(tmp_path / "db.json")
+    with open(db_file, 'w') as file:
+        json.dump(DB, file)
+    store = open_state_store(db_file)
+    store.load()
+    store.save({'news': DB['news']})
+    store.close()
+    # A db.json restored from a backup does not replace the SQLite database
+    with open(db_file, 'w') as file:
+        json.dump({}, file)
+
+    store = open_state_store(db_file)
+    assert store.load() == {'news': DB['news']}
+    store.close()
+    assert os.path.exists(db_file)
+
+
+def test_an_interrupted_migration_is_retried(tmp_path):
+    db_file = str(tmp_path / "db.json")
+    with open(db_file, 'w') as file:
+        json.dump(DB, file)
+    with open(tmp_path / "db.sqlite3.tmp", 'w') as file:
+        file.write("partial")
+
+    store = open_state_store(db_file)
+    assert store.load() == DB
+    store.close()
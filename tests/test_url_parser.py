@@ -0,0 +1,43 @@
+import pytest
+
+from rss_script.utils.url_parser import canonicalize_url
+
+
+@pytest.mark.parametrize("first, second", [
+    ("https://site.com/news.php?sid=5", "https://site.com/news.php?sid=6"),
+    ("https://store.example.com/item?sku=1", "https://store.example.com/item?sku=2"),
+    ("https://example.com/search?q=storm", "https://example.com/search?q=flood"),
+    ("https://example.com/?p=1", "https://example.com/?p=2"),
+])
+def test_different_pages_keep_their_query(first, second):
+    assert canonicalize_url(first) != canonicalize_url(second)
+
+
+@pytest.mark.parametrize("url", [
+    "https://site.com/news.php?sid=5&utm_source=rss&utm_medium=feed",
+    "http://www.site.com/news.php?fbclid=abc&sid=5",
+    "https://m.site.com/news.php?sid=5&gclid=1&mc_cid=2&mc_eid=3",
+    "https://site.com/news.php/?ref=homepage&sid=5#comments",
+    "https://site.com/news.php?UTM_Campaign=x&sid=5",
+])
+def test_tracking_params_are_removed(url):
+    assert canonicalize_url(url) == "site.com/news.php?sid=5"
+
+
+def test_kept_params_are_sorted():
+    assert canonicalize_url("https://example.com/page?b=2&a=1") == canonicalize_url("https://example.com/page?a=1&b=2")
+
+
+def test_domain_rules_keep_only_listed_params():
+    assert canonicalize_url("https://www.youtube.com/watch?v=abc&list=xyz&t=10") == "youtube.com/watch?v=abc"
+    assert canonicalize_url("https://youtu.be/abc?si=share") == "youtube.com/watch?v=abc"
+    assert canonicalize_url("https://news.ycombinator.com/item?id=1&utm_source=x") == "news.ycombinator.com/item?id=1"
+
+
+def test_redirector_links_are_replaced_by_their_target():
+    link = "https://www.google.com/url?q=https%3A%2F%2Fsite.com%2Fnews.php%3Fsid%3D5%26utm_source%3Dx&sa=D"
+    assert canonicalize_url(link) == "site.com/news.php?sid=5"
+
+
+def test_mirror_hosts_and_amp_suffixes_are_removed():
+    assert canonicalize_url("https://www.example.com/news/story/amp/") == "example.com/news/story"